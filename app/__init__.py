@@ -2,19 +2,29 @@ from datetime import timedelta
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables at import, not in create_app: the waste entry
+# storage layout (COMPACT_WASTE_STORAGE) is fixed when app.models is imported,
+# which scripts like seed.py do before creating the app
 load_dotenv()
 
 # Initialize extensions
 db = SQLAlchemy()
-migrate = Migrate()
 jwt = JWTManager()
 
 
+def init_migrate(app):
+    """
+    Attach Flask-Migrate. Only `flask db` needs it, and importing Alembic is
+    the single largest cost of starting the app, so serving processes started
+    with FAST_STARTUP skip it.
+    """
+    from flask_migrate import Migrate
+    Migrate(app, db)
+
+
 def create_app(test_config=None):
     # Create and configure the app
     app = Flask(__name__, instance_relative_config=True)
@@ -28,9 +38,25 @@ def create_app(test_config=None):
             SQLALCHEMY_TRACK_MODIFICATIONS=False,
             JWT_SECRET_KEY=os.environ.get('JWT_SECRET_KEY', 'dev-jwt-key'),
             JWT_ACCESS_TOKEN_EXPIRES=timedelta(hours=1),
+            JWT_REFRESH_TOKEN_EXPIRES=timedelta(days=int(os.environ.get('REFRESH_TOKEN_DAYS', 30))),
             JWT_TOKEN_LOCATION=["headers"],
             JWT_HEADER_NAME="Authorization",
             JWT_HEADER_TYPE="Bearer",
+            REVOCATION_REFRESH_SECONDS=int(os.environ.get('REVOCATION_REFRESH_SECONDS', 5)),
+            ADMISSION_MAX_IN_FLIGHT=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 64)),
+            ADMISSION_RETRY_AFTER=int(os.environ.get('ADMISSION_RETRY_AFTER', 1)),
+            ANOMALY_Z_THRESHOLD=float(os.environ.get('ANOMALY_Z_THRESHOLD', 4.0)),
+            ANOMALY_MIN_SAMPLES=int(os.environ.get('ANOMALY_MIN_SAMPLES', 30)),
+            EVENT_BROKER=os.environ.get('EVENT_BROKER'),
+            EVENT_MAX_SUBSCRIBERS=int(os.environ.get('EVENT_MAX_SUBSCRIBERS', 100)),
+            STREAM_HEARTBEAT_SECONDS=float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15)),
+            REQUEST_COALESCING=os.environ.get('REQUEST_COALESCING', 'true') == 'true',
+            AUDIT_BATCH_SIZE=int(os.environ.get('AUDIT_BATCH_SIZE', 200)),
+            AUDIT_FLUSH_INTERVAL=float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0)),
+            REPORT_SCHEDULER_ENABLED=os.environ.get('REPORT_SCHEDULER_ENABLED') == 'true',
+            REPORT_SCHEDULE=os.environ.get('REPORT_SCHEDULE', '*/15 * * * *'),
+            REPORT_SNAPSHOT_MAX_AGE=int(os.environ.get('REPORT_SNAPSHOT_MAX_AGE', 900)),
+            FAST_STARTUP=os.environ.get('FAST_STARTUP') == 'true',
         )
     else:
         # Load the test config if passed in
@@ -38,8 +64,33 @@ def create_app(test_config=None):
 
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
     jwt.init_app(app)
+    if not app.config.get('FAST_STARTUP'):
+        init_migrate(app)
+
+    from app.utils.sharding import init_sharding
+    init_sharding(app)
+
+    from app.services.revocation import init_revocation
+    init_revocation(app)
+
+    from app.utils.admission import init_admission
+    init_admission(app)
+
+    from app.utils.budgets import init_budgets
+    init_budgets(app)
+
+    from app.utils.coalescing import init_coalescing
+    init_coalescing(app)
+
+    from app.services.anomalies import init_anomaly_detection
+    init_anomaly_detection(app)
+
+    from app.utils.events import init_events
+    init_events(app)
+
+    from app.services.audit import init_audit
+    init_audit(app)
 
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -48,6 +99,8 @@ def create_app(test_config=None):
     from app.routes.users import users_bp
     from app.routes.roles import roles_bp
     from app.routes.permissions import permissions_bp
+    from app.routes.metrics import metrics_bp
+    from app.routes.audit import audit_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(waste_bp, url_prefix='/api/waste')
@@ -55,6 +108,30 @@ def create_app(test_config=None):
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(roles_bp, url_prefix='/api/roles')
     app.register_blueprint(permissions_bp, url_prefix='/api/permissions')
+    app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+    app.register_blueprint(audit_bp, url_prefix='/api/audit')
+
+    # Register CLI commands
+    from app.cli import (
+        anomalies_cli, reports_cli, search_cli, shards_cli, storage_cli, sync_cli, teams_cli,
+        tokens_cli
+    )
+    app.cli.add_command(anomalies_cli)
+    app.cli.add_command(storage_cli)
+    app.cli.add_command(teams_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(shards_cli)
+    app.cli.add_command(sync_cli)
+    app.cli.add_command(tokens_cli)
+
+    # Precompute periodic reports in-process when enabled; multi-worker
+    # deployments should run `flask reports worker` once instead
+    if app.config.get('REPORT_SCHEDULER_ENABLED'):
+        from app.services.analytics import create_report_scheduler
+        scheduler = create_report_scheduler(app)
+        scheduler.start()
+        app.extensions['report_scheduler'] = scheduler
 
     # Create a simple index route
     @app.route('/')
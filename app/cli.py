@@ -0,0 +1,102 @@
+"""
+Flask CLI commands (``flask reports ...``, ``flask shards ...``, ``flask sync ...``,
+``flask tokens ...``, ``flask anomalies ...``, ``flask storage ...``,
+``flask teams ...``, ``flask search ...``).
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.services.anomalies import rebuild_weight_stats
+from app.services.analytics import create_report_scheduler, refresh_report_snapshots
+from app.services.rollups import rebuild_user_rollups
+from app.services.search import rebuild_search_index
+from app.services.revocation import compact_revoked_tokens
+from app.services.storage import StorageLayoutError, migrate_to_compact_storage
+from app.services.sync import backfill_changes
+from app.services.team_hierarchy import rebuild_team_closure
+from app.utils.sharding import create_shard_tables, shard_keys
+
+reports_cli = AppGroup('reports', help='Precomputed analytics reports.')
+shards_cli = AppGroup('shards', help='Team-keyed waste data shards.')
+sync_cli = AppGroup('sync', help='Delta sync change log.')
+tokens_cli = AppGroup('tokens', help='Refresh tokens and revocations.')
+anomalies_cli = AppGroup('anomalies', help='Weight outlier detection.')
+storage_cli = AppGroup('storage', help='Waste entry storage layout.')
+teams_cli = AppGroup('teams', help='Team hierarchy.')
+search_cli = AppGroup('search', help='Full-text search index.')
+
+
+@reports_cli.command('refresh')
+def refresh_reports():
+    """Recompute every team's report snapshots once."""
+    count = refresh_report_snapshots()
+    click.echo(f"Refreshed {count} report snapshots")
+
+
+@reports_cli.command('rollups')
+def rebuild_rollups():
+    """Recompute every user's daily rollups from existing entries."""
+    buckets = rebuild_user_rollups()
+    click.echo(f"Rebuilt {buckets} user rollup buckets")
+
+
+@reports_cli.command('worker')
+def run_report_worker():
+    """Refresh report snapshots on REPORT_SCHEDULE until interrupted."""
+    scheduler = create_report_scheduler(current_app._get_current_object())
+    click.echo(f"Refreshing report snapshots on schedule "
+               f"'{scheduler.jobs[0].schedule.expression}'")
+    scheduler.run_forever()
+
+
+@shards_cli.command('init')
+def init_shards():
+    """Create the sharded tables on every configured shard database."""
+    create_shard_tables()
+    click.echo(f"Initialised {len(shard_keys()) - 1} shards")
+
+
+@sync_cli.command('backfill')
+def backfill_sync_log():
+    """Log existing waste entries that have no change record yet."""
+    backfill_changes()
+    click.echo("Backfilled the waste change log")
+
+
+
+@tokens_cli.command('compact')
+def compact_tokens():
+    """Delete revocation and refresh token records of expired tokens."""
+    removed = compact_revoked_tokens()
+    click.echo(f"Removed {removed} expired token records")
+
+
+@anomalies_cli.command('rebuild')
+def rebuild_anomaly_stats():
+    """Recompute per-team weight statistics from existing entries."""
+    rebuild_weight_stats()
+    click.echo("Rebuilt weight statistics")
+
+
+@storage_cli.command('compact')
+def compact_storage():
+    """Migrate waste entries to the compact layout (COMPACT_WASTE_STORAGE=true)."""
+    try:
+        migrated = migrate_to_compact_storage()
+    except StorageLayoutError as error:
+        raise click.ClickException(str(error))
+    click.echo(f"Migrated {migrated} waste entries to the compact layout")
+
+
+@teams_cli.command('rebuild-closure')
+def rebuild_closure():
+    """Recreate the team closure table from the teams' parent links."""
+    pairs = rebuild_team_closure()
+    click.echo(f"Rebuilt team closure with {pairs} ancestor/descendant pairs")
+
+
+@search_cli.command('rebuild')
+def rebuild_search():
+    """Install the description search index and reindex every entry."""
+    rebuild_search_index()
+    click.echo("Rebuilt the waste entry search index")
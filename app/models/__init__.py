@@ -1,7 +1,19 @@
 from app.models.user import User
 from app.models.team import Team
+from app.models.team_closure import TeamClosure
 from app.models.waste_entry import WasteEntry, WasteType
 from app.models.permission import Permission
 from app.models.role import Role
+from app.models.weight_sketch import WeightSketch
+from app.models.report_snapshot import ReportSnapshot
+from app.models.waste_change import WasteChange
+from app.models.refresh_token import RefreshToken
+from app.models.revoked_token import RevokedToken
+from app.models.weight_stats import WeightStats
+from app.models.waste_anomaly import WasteAnomaly
+from app.models.user_waste_rollup import UserWasteRollup
+from app.models.audit_log import AuditLog
 
-__all__ = ['User', 'Team', 'WasteEntry', 'WasteType', 'Permission', 'Role'] 
\ No newline at end of file
+__all__ = ['User', 'Team', 'WasteEntry', 'WasteType', 'Permission', 'Role', 'WeightSketch',
+           'ReportSnapshot', 'WasteChange', 'RefreshToken', 'RevokedToken', 'WeightStats', 'WasteAnomaly', 'TeamClosure',
+           'UserWasteRollup', 'AuditLog']
\ No newline at end of file
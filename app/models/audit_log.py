@@ -0,0 +1,50 @@
+from app import db
+from datetime import datetime
+
+
+class AuditLog(db.Model):
+    """
+    One committed change to an administrative record (user, role, team or
+    permission). Rows are only ever appended.
+    """
+    __tablename__ = 'audit_log'
+    __table_args__ = (
+        db.Index('ix_audit_log_entity', 'entity_type', 'entity_id', 'id'),
+        db.Index('ix_audit_log_actor', 'actor_id', 'id'),
+    )
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    id = db.Column(db.Integer, primary_key=True)
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # No foreign keys: the log outlives the users and records it mentions
+    actor_id = db.Column(db.Integer, nullable=True)
+    source = db.Column(db.String(120), nullable=True)
+    action = db.Column(db.String(10), nullable=False)
+    entity_type = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=True)
+    changes = db.Column(db.JSON, nullable=False)
+
+    def __init__(self, action, entity_type, entity_id, changes, actor_id=None, source=None,
+                 occurred_at=None):
+        self.action = action
+        self.entity_type = entity_type
+        self.entity_id = entity_id
+        self.changes = changes
+        self.actor_id = actor_id
+        self.source = source
+        self.occurred_at = occurred_at or datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'occurred_at': self.occurred_at.isoformat(),
+            'actor_id': self.actor_id,
+            'source': self.source,
+            'action': self.action,
+            'entity_type': self.entity_type,
+            'entity_id': self.entity_id,
+            'changes': self.changes
+        }
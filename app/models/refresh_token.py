@@ -0,0 +1,36 @@
+from app import db
+from datetime import datetime
+
+
+class RefreshToken(db.Model):
+    """
+    Issued refresh token; rotation links tokens of one login into a family
+    """
+    __tablename__ = 'refresh_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    family_id = db.Column(db.String(36), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    expires_at = db.Column(db.DateTime)  # None when refresh tokens never expire
+    used_at = db.Column(db.DateTime)  # Set when rotated
+    revoked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, jti, family_id, user_id, expires_at):
+        self.jti = jti
+        self.family_id = family_id
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jti': self.jti,
+            'family_id': self.family_id,
+            'user_id': self.user_id,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'used_at': self.used_at.isoformat() if self.used_at else None,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None,
+            'created_at': self.created_at.isoformat()
+        }
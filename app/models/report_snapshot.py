@@ -0,0 +1,33 @@
+from app import db
+from datetime import datetime
+
+
+class ReportSnapshot(db.Model):
+    """
+    Precomputed analytics report for one team and period
+    """
+    __tablename__ = 'report_snapshots'
+    __table_args__ = (
+        db.UniqueConstraint('team_id', 'period', name='uq_report_snapshots_team_period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
+    period = db.Column(db.String(20), nullable=False)  # week, month, year
+    payload = db.Column(db.JSON, nullable=False)
+    generated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __init__(self, team_id, period, payload, generated_at=None):
+        self.team_id = team_id
+        self.period = period
+        self.payload = payload
+        self.generated_at = generated_at or datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'team_id': self.team_id,
+            'period': self.period,
+            'payload': self.payload,
+            'generated_at': self.generated_at.isoformat()
+        }
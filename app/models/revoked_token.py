@@ -0,0 +1,33 @@
+from app import db
+from datetime import datetime
+
+
+class RevokedToken(db.Model):
+    """
+    Blocklisted JWT; the id is the sequence workers refresh their copy from
+    """
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    token_type = db.Column(db.String(10), nullable=False)  # access, refresh
+    user_id = db.Column(db.Integer)
+    # When the token would have expired anyway; the row can be dropped after
+    expires_at = db.Column(db.DateTime, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, jti, token_type, user_id=None, expires_at=None):
+        self.jti = jti
+        self.token_type = token_type
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jti': self.jti,
+            'token_type': self.token_type,
+            'user_id': self.user_id,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'revoked_at': self.revoked_at.isoformat()
+        }
@@ -8,6 +8,8 @@ class Team(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=True)
+    # Optional hierarchy (site > department > team); see TeamClosure
+    parent_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -15,15 +17,17 @@ class Team(db.Model):
     members = db.relationship('User', back_populates='team')
     waste_entries = db.relationship('WasteEntry', back_populates='team')
 
-    def __init__(self, name, description=None):
+    def __init__(self, name, description=None, parent_id=None):
         self.name = name
         self.description = description
+        self.parent_id = parent_id
 
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
             'description': self.description,
+            'parent_id': self.parent_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
             'member_count': len(self.members)
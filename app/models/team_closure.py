@@ -0,0 +1,79 @@
+from app import db
+from sqlalchemy import and_, delete, event, insert, inspect, select, true
+from app.models.team import Team
+
+
+class TeamClosure(db.Model):
+    """
+    Ancestor/descendant pairs of the team hierarchy, including each team
+    with itself at depth 0. Maintained by the Team mapper events below.
+    """
+    __tablename__ = 'team_closure'
+    __table_args__ = (
+        db.Index('ix_team_closure_descendant', 'descendant_id', 'depth'),
+    )
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('teams.id'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    def __init__(self, ancestor_id, descendant_id, depth):
+        self.ancestor_id = ancestor_id
+        self.descendant_id = descendant_id
+        self.depth = depth
+
+    def to_dict(self):
+        return {
+            'ancestor_id': self.ancestor_id,
+            'descendant_id': self.descendant_id,
+            'depth': self.depth
+        }
+
+
+def _link_subtree(connection, team_id, parent_id):
+    """Connect every ancestor of the parent to every team in the subtree"""
+    ancestors = TeamClosure.__table__.alias('ancestors')
+    subtree = TeamClosure.__table__.alias('subtree')
+    connection.execute(insert(TeamClosure).from_select(
+        ['ancestor_id', 'descendant_id', 'depth'],
+        select(
+            ancestors.c.ancestor_id,
+            subtree.c.descendant_id,
+            ancestors.c.depth + subtree.c.depth + 1
+        ).select_from(
+            # Every ancestor with every subtree member
+            ancestors.join(subtree, true())
+        ).where(and_(ancestors.c.descendant_id == parent_id,
+                     subtree.c.ancestor_id == team_id))
+    ))
+
+
+@event.listens_for(Team, 'after_insert')
+def _insert_closure(mapper, connection, team):
+    connection.execute(insert(TeamClosure).values(
+        ancestor_id=team.id, descendant_id=team.id, depth=0
+    ))
+    if team.parent_id is not None:
+        _link_subtree(connection, team.id, team.parent_id)
+
+
+@event.listens_for(Team, 'after_update')
+def _move_closure(mapper, connection, team):
+    if not inspect(team).attrs.parent_id.history.has_changes():
+        return
+
+    # Detach the subtree from its old ancestors, then attach it to the new ones
+    subtree = select(TeamClosure.descendant_id).where(TeamClosure.ancestor_id == team.id)
+    connection.execute(delete(TeamClosure).where(
+        TeamClosure.descendant_id.in_(subtree.scalar_subquery()),
+        TeamClosure.ancestor_id.not_in(subtree.scalar_subquery())
+    ))
+    if team.parent_id is not None:
+        _link_subtree(connection, team.id, team.parent_id)
+
+
+@event.listens_for(Team, 'before_delete')
+def _delete_closure(mapper, connection, team):
+    connection.execute(delete(TeamClosure).where(
+        (TeamClosure.descendant_id == team.id) | (TeamClosure.ancestor_id == team.id)
+    ))
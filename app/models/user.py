@@ -1,4 +1,7 @@
 from app import db
+from sqlalchemy import String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 
@@ -20,10 +23,15 @@ class User(db.Model):
     team = db.relationship('Team', back_populates='members')
     waste_entries = db.relationship('WasteEntry', back_populates='user', cascade='all, delete-orphan')
 
-    def __init__(self, username, email, password, role_id=None, team_id=None, is_superuser=False):
+    def __init__(self, username, email, password=None, role_id=None, team_id=None,
+                 is_superuser=False, password_hash=None):
         self.username = username
         self.email = email
-        self.set_password(password)
+        if password_hash is not None:
+            # Already hashed, e.g. by bulk provisioning
+            self.password_hash = password_hash
+        else:
+            self.set_password(password)
         self.role_id = role_id
         self.team_id = team_id
         self.is_superuser = is_superuser
@@ -49,4 +57,30 @@ class User(db.Model):
             'team_id': self.team_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        } 
\ No newline at end of file
+        }
+
+
+class lower_key(FunctionElement):
+    """
+    lower(x), compared and ordered byte-wise: under COLLATE "C" on
+    PostgreSQL, where the default collation does not order strings by their
+    bytes, and under SQLite's default BINARY collation elsewhere
+    """
+    type = String()
+    name = 'lower_key'
+    inherit_cache = True
+
+
+@compiles(lower_key)
+def _compile_lower_key(element, compiler, **kw):
+    return f'lower({compiler.process(element.clauses, **kw)})'
+
+
+@compiles(lower_key, 'postgresql')
+def _compile_lower_key_postgresql(element, compiler, **kw):
+    return f'lower({compiler.process(element.clauses, **kw)}) COLLATE "C"'
+
+
+# Case-insensitive prefix search in the user directory (app.services.directory)
+db.Index('ix_users_username_lower', lower_key(User.username))
+db.Index('ix_users_email_lower', lower_key(User.email))
@@ -0,0 +1,37 @@
+from app import db
+from app.models.waste_entry import WasteType
+
+
+class UserWasteRollup(db.Model):
+    """
+    Total weight and entry count of one user's waste per type and day
+    """
+    __tablename__ = 'user_waste_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', 'waste_type', name='uq_user_waste_rollups_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: rollups live on the entries' shard
+    user_id = db.Column(db.Integer, nullable=False)
+    waste_type = db.Column(db.Enum(WasteType), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    total_weight = db.Column(db.Float, nullable=False, default=0.0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, user_id, waste_type, day, total_weight=0.0, entry_count=0):
+        self.user_id = user_id
+        self.waste_type = waste_type
+        self.day = day
+        self.total_weight = total_weight
+        self.entry_count = entry_count
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'waste_type': self.waste_type.value,
+            'day': self.day.isoformat(),
+            'total_weight': self.total_weight,
+            'entry_count': self.entry_count
+        }
@@ -0,0 +1,47 @@
+from app import db
+from datetime import datetime
+from app.models.waste_entry import WasteType
+
+
+class WasteAnomaly(db.Model):
+    """
+    Waste entry flagged at insert time as an outlier for its team and type
+    """
+    __tablename__ = 'waste_anomalies'
+    __table_args__ = (
+        db.Index('ix_waste_anomalies_team_created', 'team_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key, like waste_changes; listings join to live entries
+    entry_id = db.Column(db.Integer, nullable=False, index=True)
+    team_id = db.Column(db.Integer, nullable=False)
+    waste_type = db.Column(db.Enum(WasteType), nullable=False)
+    weight = db.Column(db.Float, nullable=False)
+    z_score = db.Column(db.Float, nullable=False)
+    # Baseline at the time the entry was checked
+    mean = db.Column(db.Float, nullable=False)
+    stddev = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, entry_id, team_id, waste_type, weight, z_score, mean, stddev):
+        self.entry_id = entry_id
+        self.team_id = team_id
+        self.waste_type = waste_type
+        self.weight = weight
+        self.z_score = z_score
+        self.mean = mean
+        self.stddev = stddev
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entry_id': self.entry_id,
+            'team_id': self.team_id,
+            'waste_type': self.waste_type.value,
+            'weight': self.weight,
+            'z_score': self.z_score,
+            'mean': self.mean,
+            'stddev': self.stddev,
+            'created_at': self.created_at.isoformat()
+        }
@@ -0,0 +1,40 @@
+from app import db
+from datetime import datetime
+
+
+class WasteChange(db.Model):
+    """
+    Append-only log of waste entry changes; the id is the sync sequence
+    """
+    __tablename__ = 'waste_changes'
+    __table_args__ = (
+        db.Index('ix_waste_changes_team_seq', 'team_id', 'id'),
+        db.Index('ix_waste_changes_user_seq', 'user_id', 'id'),
+    )
+
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: tombstones outlive the entry
+    entry_id = db.Column(db.Integer, nullable=False)
+    team_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # upsert, delete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __init__(self, entry_id, team_id, user_id, operation):
+        self.entry_id = entry_id
+        self.team_id = team_id
+        self.user_id = user_id
+        self.operation = operation
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'entry_id': self.entry_id,
+            'team_id': self.team_id,
+            'user_id': self.user_id,
+            'operation': self.operation,
+            'created_at': self.created_at.isoformat()
+        }
@@ -1,6 +1,16 @@
 from app import db
 from datetime import datetime
 from enum import Enum
+import os
+from sqlalchemy import func
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.types import SmallInteger, TypeDecorator
+
+# Compact layout: smallint type codes, integer grams and the audit timestamps
+# in waste_entry_audit. The schema is fixed when the models are imported, so
+# this is read from the environment rather than the app config; migrate
+# existing data with `flask storage compact`.
+COMPACT_STORAGE = os.environ.get('COMPACT_WASTE_STORAGE') == 'true'
 
 
 class WasteType(Enum):
@@ -14,19 +24,93 @@ class WasteType(Enum):
     OTHER = 'other'
 
 
+# Stored codes; append only, never renumber
+WASTE_TYPE_CODES = {
+    WasteType.PAPER: 1,
+    WasteType.PLASTIC: 2,
+    WasteType.GLASS: 3,
+    WasteType.METAL: 4,
+    WasteType.ORGANIC: 5,
+    WasteType.ELECTRONIC: 6,
+    WasteType.HAZARDOUS: 7,
+    WasteType.OTHER: 8,
+}
+_WASTE_TYPES_BY_CODE = {code: waste_type for waste_type, code in WASTE_TYPE_CODES.items()}
+
+
+class WasteTypeCode(TypeDecorator):
+    """
+    WasteType stored as a smallint code
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return WASTE_TYPE_CODES[value] if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return _WASTE_TYPES_BY_CODE[value] if value is not None else None
+
+
+if COMPACT_STORAGE:
+    class WasteEntryAudit(db.Model):
+        """
+        Creation and modification times of a waste entry in the compact layout
+        """
+        __tablename__ = 'waste_entry_audit'
+
+        entry_id = db.Column(db.Integer, db.ForeignKey('waste_entries.id'), primary_key=True)
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                               onupdate=datetime.utcnow)
+
+
 class WasteEntry(db.Model):
     __tablename__ = 'waste_entries'
 
     id = db.Column(db.Integer, primary_key=True)
-    waste_type = db.Column(db.Enum(WasteType), nullable=False)
-    weight = db.Column(db.Float, nullable=False)  # in kilograms
     description = db.Column(db.Text, nullable=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, 
-                           onupdate=datetime.utcnow)
+
+    if COMPACT_STORAGE:
+        waste_type = db.Column(WasteTypeCode, nullable=False)
+        weight_grams = db.Column('weight_g', db.Integer, nullable=False)
+        audit = db.relationship(WasteEntryAudit, uselist=False, lazy='selectin',
+                                cascade='all, delete-orphan')
+
+        @hybrid_property
+        def weight(self):  # in kilograms
+            return self.weight_grams / 1000
+
+        @weight.inplace.setter
+        def _weight_setter(self, value):
+            self.weight_grams = round(value * 1000)
+
+        @weight.inplace.expression
+        @classmethod
+        def _weight_expression(cls):
+            return cls.weight_grams / 1000.0
+
+        @weight.inplace.update_expression
+        @classmethod
+        def _weight_update_expression(cls, value):
+            return [(cls.weight_grams, func.round(value * 1000))]
+
+        @property
+        def created_at(self):
+            return self.audit.created_at
+
+        @property
+        def updated_at(self):
+            return self.audit.updated_at
+    else:
+        waste_type = db.Column(db.Enum(WasteType), nullable=False)
+        weight = db.Column(db.Float, nullable=False)  # in kilograms
+        created_at = db.Column(db.DateTime, default=datetime.utcnow)
+        updated_at = db.Column(db.DateTime, default=datetime.utcnow, 
+                               onupdate=datetime.utcnow)
 
     # Relationships
     user = db.relationship('User', back_populates='waste_entries')
@@ -50,6 +134,8 @@ class WasteEntry(db.Model):
             self.timestamp = timestamp
         else:
             self.timestamp = datetime.utcnow()
+        if COMPACT_STORAGE:
+            self.audit = WasteEntryAudit()
 
     def to_dict(self):
         return {
@@ -62,4 +148,4 @@ class WasteEntry(db.Model):
             'team_id': self.team_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        } 
\ No newline at end of file
+        }
\ No newline at end of file
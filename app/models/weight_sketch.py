@@ -0,0 +1,45 @@
+from app import db
+from datetime import datetime
+from app.models.waste_entry import WasteType
+
+
+class WeightSketch(db.Model):
+    """
+    Quantile sketch of entry weights for one team, waste type and day
+    """
+    __tablename__ = 'weight_sketches'
+    __table_args__ = (
+        db.UniqueConstraint('team_id', 'waste_type', 'day',
+                            name='uq_weight_sketches_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
+    waste_type = db.Column(db.Enum(WasteType), nullable=False)
+    day = db.Column(db.Date, nullable=False, index=True)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    data = db.Column(db.JSON, nullable=False)  # serialized KLLSketch
+    # Set when entries in the bucket were edited or deleted; rebuilt on read
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    def __init__(self, team_id, waste_type, day, data, entry_count=0):
+        self.team_id = team_id
+        self.waste_type = waste_type
+        self.day = day
+        self.data = data
+        self.entry_count = entry_count
+        self.stale = False
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'team_id': self.team_id,
+            'waste_type': self.waste_type.value,
+            'day': self.day.isoformat(),
+            'entry_count': self.entry_count,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
@@ -0,0 +1,40 @@
+from app import db
+from datetime import datetime
+from app.models.waste_entry import WasteType
+
+
+class WeightStats(db.Model):
+    """
+    Running mean and variance of entry weights for one team and waste type
+    """
+    __tablename__ = 'weight_stats'
+    __table_args__ = (
+        db.UniqueConstraint('team_id', 'waste_type', name='uq_weight_stats_team_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    team_id = db.Column(db.Integer, db.ForeignKey('teams.id'), nullable=False)
+    waste_type = db.Column(db.Enum(WasteType), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0.0)
+    m2 = db.Column(db.Float, nullable=False, default=0.0)  # Sum of squared deviations
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow,
+                           onupdate=datetime.utcnow)
+
+    def __init__(self, team_id, waste_type, count=0, mean=0.0, m2=0.0):
+        self.team_id = team_id
+        self.waste_type = waste_type
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'team_id': self.team_id,
+            'waste_type': self.waste_type.value,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'updated_at': self.updated_at.isoformat()
+        }
@@ -0,0 +1,49 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from app.models import AuditLog
+from app.services.audit import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, query_audit_log
+from app.utils import permission_required
+
+audit_bp = Blueprint('audit', __name__)
+
+AUDIT_ACTIONS = (AuditLog.CREATE, AuditLog.UPDATE, AuditLog.DELETE)
+
+
+@audit_bp.route('', methods=['GET'])
+@permission_required('view_audit_log')
+def get_audit_log():
+    entity_type = request.args.get('entity_type')
+    entity_id = request.args.get('entity_id', type=int)
+    actor_id = request.args.get('actor_id', type=int)
+    action = request.args.get('action')
+    before_id = request.args.get('before_id', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+
+    if action is not None and action not in AUDIT_ACTIONS:
+        return jsonify({"message": "Invalid action"}), 400
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    dates = {}
+    for name in ('since', 'until'):
+        value = request.args.get(name)
+        if value:
+            try:
+                dates[name] = datetime.fromisoformat(value)
+            except ValueError:
+                return jsonify({"message": f"Invalid {name} date"}), 400
+
+    records, next_before_id = query_audit_log(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        actor_id=actor_id,
+        action=action,
+        before_id=before_id,
+        limit=limit,
+        **dates
+    )
+
+    return jsonify({
+        "audit_log": records,
+        "next_before_id": next_before_id
+    }), 200
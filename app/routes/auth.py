@@ -1,11 +1,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
-    create_access_token,
+    get_jwt,
     get_jwt_identity,
     jwt_required
 )
 from app import db
 from app.models import User, Role
+from app.services.revocation import revoke_token
+from app.services.tokens import (
+    InvalidRefreshToken, RefreshTokenReused, issue_tokens, rotate_refresh_token
+)
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -80,16 +84,45 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({"message": "Invalid username or password"}), 401
 
-    # Create access token with string user ID
-    access_token = create_access_token(identity=str(user.id))
+    # Create access token with string user ID, plus a refresh token that
+    # starts a new rotation family
+    access_token, refresh_token = issue_tokens(user.id)
+    db.session.commit()
 
     return jsonify({
         "message": "Login successful",
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "user": user.to_dict()
     }), 200
 
 
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    # Exchange a refresh token for a new pair; the password is never checked
+    try:
+        access_token, refresh_token = rotate_refresh_token(get_jwt()['jti'])
+    except RefreshTokenReused:
+        return jsonify({"message": "Refresh token reuse detected, please log in again"}), 401
+    except InvalidRefreshToken:
+        return jsonify({"message": "Invalid refresh token"}), 401
+
+    return jsonify({
+        "access_token": access_token,
+        "refresh_token": refresh_token
+    }), 200
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    # Revoke the presented token; a refresh token takes its family with it
+    revoke_token(get_jwt())
+
+    return jsonify({"message": "Successfully logged out"}), 200
+
+
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def profile():
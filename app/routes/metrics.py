@@ -0,0 +1,25 @@
+from flask import Blueprint, jsonify
+from app.utils.admission import admission_controller
+from app.utils.coalescing import request_coalescer
+from app.utils.statements import statement_cache_stats
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/admission', methods=['GET'])
+def get_admission_metrics():
+    # Unauthenticated so load balancers and autoscalers can poll it; exposes
+    # only this worker's request counters
+    return jsonify(admission_controller().snapshot()), 200
+
+
+@metrics_bp.route('/coalescing', methods=['GET'])
+def get_coalescing_metrics():
+    # Per-endpoint executions and requests answered by another's execution
+    return jsonify(request_coalescer().snapshot()), 200
+
+
+@metrics_bp.route('/statements', methods=['GET'])
+def get_statement_metrics():
+    # Compiled statement cache outcomes for everything this process executed
+    return jsonify(statement_cache_stats().snapshot()), 200
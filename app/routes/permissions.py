@@ -2,12 +2,14 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Permission
 from app.utils import permission_required
+from app.utils.coalescing import coalesce
 
 permissions_bp = Blueprint('permissions', __name__)
 
 
 @permissions_bp.route('', methods=['GET'])
 @permission_required('view_permissions')
+@coalesce()
 def get_permissions():
     permissions = Permission.query.all()
     return jsonify({
@@ -3,12 +3,14 @@ from flask_jwt_extended import get_jwt_identity
 from app import db
 from app.models import Role, Permission, User
 from app.utils import permission_required
+from app.utils.coalescing import coalesce
 
 roles_bp = Blueprint('roles', __name__)
 
 
 @roles_bp.route('', methods=['GET'])
 @permission_required('view_roles')
+@coalesce()
 def get_roles():
     roles = Role.query.all()
     return jsonify({
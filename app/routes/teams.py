@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from app import db
 from app.models import Team, User
+from app.routes.users import directory_page
+from app.services.team_hierarchy import in_subtree, subtree_query
 from app.utils import permission_required
 
 teams_bp = Blueprint('teams', __name__)
@@ -16,6 +18,7 @@ def create_team():
     data = request.json
     name = data.get('name')
     description = data.get('description')
+    parent_id = data.get('parent_id')
 
     # Validate required fields
     if not name:
@@ -25,10 +28,14 @@ def create_team():
     if Team.query.filter_by(name=name).first():
         return jsonify({"message": "Team name already exists"}), 409
 
+    if parent_id is not None and not db.session.get(Team, parent_id):
+        return jsonify({"message": "Invalid parent team"}), 400
+
     # Create new team
     team = Team(
         name=name,
-        description=description
+        description=description,
+        parent_id=parent_id
     )
 
     db.session.add(team)
@@ -43,18 +50,19 @@ def create_team():
 @teams_bp.route('', methods=['GET'])
 @permission_required('view_teams')
 def get_teams():
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
 
     if not user:
         return jsonify({"message": "User not found"}), 404
 
-    # Admins can see all teams, others can only see their team
+    # Admins can see all teams, others their team and the teams below it
     if user.is_superuser:
         teams = Team.query.all()
+    elif user.team_id:
+        teams = Team.query.filter(Team.id.in_(subtree_query(user.team_id))).all()
     else:
-        team = user.team
-        teams = [team] if team else []
+        teams = []
 
     return jsonify({
         "teams": [team.to_dict() for team in teams]
@@ -64,11 +72,11 @@ def get_teams():
 @teams_bp.route('/<int:team_id>', methods=['GET'])
 @permission_required('view_teams')
 def get_team(team_id):
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
     
     # Check team access permission
-    if not user.is_superuser and user.team_id != team_id:
+    if not user.is_superuser and not in_subtree(user.team_id, team_id):
         return jsonify({"message": "Access denied for this team"}), 403
     
     team = db.session.get(Team, team_id)
@@ -85,11 +93,11 @@ def update_team(team_id):
     if not request.is_json:
         return jsonify({"message": "Missing JSON in request"}), 400
     
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
     
     # Check team access permission (for non-superusers)
-    if not user.is_superuser and user.team_id != team_id:
+    if not user.is_superuser and not in_subtree(user.team_id, team_id):
         return jsonify({"message": "Access denied for this team"}), 403
 
     team = db.session.get(Team, team_id)
@@ -112,6 +120,23 @@ def update_team(team_id):
     if description:
         team.description = description
 
+    # Moving a team moves its whole subtree
+    if 'parent_id' in data and data['parent_id'] != team.parent_id:
+        parent_id = data['parent_id']
+        if parent_id is not None:
+            if not db.session.get(Team, parent_id):
+                return jsonify({"message": "Invalid parent team"}), 400
+            if in_subtree(team_id, parent_id):
+                return jsonify({
+                    "message": "A team cannot be moved under itself or its descendants"
+                }), 400
+            # Only admins may move a team outside the manager's own subtree
+            if not user.is_superuser and not in_subtree(user.team_id, parent_id):
+                return jsonify({"message": "Access denied for this team"}), 403
+        elif not user.is_superuser:
+            return jsonify({"message": "Access denied for this team"}), 403
+        team.parent_id = parent_id
+
     db.session.commit()
 
     return jsonify({
@@ -123,7 +148,7 @@ def update_team(team_id):
 @teams_bp.route('/<int:team_id>', methods=['DELETE'])
 @permission_required('delete_team')
 def delete_team(team_id):
-    team = Team.query.get(team_id)
+    team = db.session.get(Team, team_id)
 
     if not team:
         return jsonify({"message": "Team not found"}), 404
@@ -134,6 +159,11 @@ def delete_team(team_id):
             "message": "Cannot delete team with members. Reassign members first."
         }), 400
 
+    if Team.query.filter_by(parent_id=team_id).first():
+        return jsonify({
+            "message": "Cannot delete team with child teams. Move them first."
+        }), 400
+
     db.session.delete(team)
     db.session.commit()
 
@@ -145,11 +175,11 @@ def delete_team(team_id):
 @teams_bp.route('/<int:team_id>/members', methods=['GET'])
 @permission_required('view_team_members')
 def get_team_members(team_id):
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
     
     # Check team access permission (for non-superusers)
-    if not user.is_superuser and user.team_id != team_id:
+    if not user.is_superuser and not in_subtree(user.team_id, team_id):
         return jsonify({"message": "Access denied for this team"}), 403
     
     team = db.session.get(Team, team_id)
@@ -157,5 +187,4 @@ def get_team_members(team_id):
     if not team:
         return jsonify({"message": "Team not found"}), 404
 
-    members = [member.to_dict() for member in team.members]
-    return jsonify({"members": members}), 200 
\ No newline at end of file
+    return directory_page([User.team_id == team_id], "members")
@@ -1,12 +1,46 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from app import db
-from app.models import User, Role, Team
+from app.models import User, Role, Team, WasteEntry
+from app.services.provisioning import provision_users, reassign_team
+from app.services.directory import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, list_users
+)
+from app.services.waste_edits import bulk_delete_entries
 from app.utils import permission_required
+from app.utils.permissions import admin_required
 
 users_bp = Blueprint('users', __name__)
 
 
+def directory_page(criteria, key):
+    """
+    One page of users matching `criteria` under `key`, honouring the q,
+    cursor, limit and fields=summary parameters
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"message": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    try:
+        users, next_cursor = list_users(
+            criteria,
+            q=request.args.get('q'),
+            cursor=request.args.get('cursor'),
+            limit=limit,
+            summary=request.args.get('fields') == 'summary'
+        )
+    except InvalidCursor:
+        return jsonify({"message": "Invalid cursor"}), 400
+
+    return jsonify({
+        key: users,
+        "next_cursor": next_cursor
+    }), 200
+
+
 @users_bp.route('', methods=['GET'])
 @permission_required('view_users')
 def get_users():
@@ -18,24 +52,19 @@ def get_users():
     user_id = int(get_jwt_identity())
     current_user = db.session.get(User, user_id)
     
-    # Base query
-    query = User.query
+    criteria = []
     
     # Apply filters
     if team_id:
-        query = query.filter(User.team_id == team_id)
+        criteria.append(User.team_id == team_id)
     elif not current_user.is_superuser:
         # Non-superusers can only see users from their team
-        query = query.filter(User.team_id == current_user.team_id)
+        criteria.append(User.team_id == current_user.team_id)
     
     if role_id:
-        query = query.filter(User.role_id == role_id)
+        criteria.append(User.role_id == role_id)
     
-    users = query.all()
-    
-    return jsonify({
-        "users": [user.to_dict() for user in users]
-    }), 200
+    return directory_page(criteria, "users")
 
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
@@ -152,9 +181,83 @@ def delete_user(user_id):
     if not current_user.is_superuser and current_user.team_id != user.team_id:
         return jsonify({"message": "Access denied"}), 403
     
+    # Delete the user's entries on every shard, keeping derived data in step
+    bulk_delete_entries([WasteEntry.user_id == user_id])
+
     db.session.delete(user)
     db.session.commit()
     
     return jsonify({
         "message": "User deleted successfully"
-    }), 200 
\ No newline at end of file
+    }), 200 
+
+
+@users_bp.route('/bulk', methods=['POST'])
+@admin_required()
+def bulk_create_users():
+    # Accept a CSV upload or a JSON array (bare or under "users")
+    if request.mimetype == 'text/csv':
+        rows = list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    elif request.is_json:
+        rows = request.json
+        if isinstance(rows, dict):
+            rows = rows.get('users')
+        if not isinstance(rows, list):
+            return jsonify({"message": "Expected a list of users"}), 400
+    else:
+        return jsonify({"message": "Expected JSON or CSV in request"}), 400
+
+    if not rows:
+        return jsonify({"message": "No users provided"}), 400
+
+    limit = current_app.config.get('BULK_USER_LIMIT', 1000)
+    if len(rows) > limit:
+        return jsonify({
+            "message": f"At most {limit} users can be created per request"
+        }), 413
+
+    created, errors = provision_users(rows)
+
+    return jsonify({
+        "message": f"Created {len(created)} of {len(rows)} users",
+        "users": created,
+        "errors": errors
+    }), 201 if created else 400
+
+
+@users_bp.route('/reassign-team', methods=['POST'])
+@admin_required()
+def reassign_users_team():
+    if not request.is_json:
+        return jsonify({"message": "Missing JSON in request"}), 400
+
+    data = request.json
+    team_id = data.get('team_id')
+    user_ids = data.get('user_ids')
+    from_team_id = data.get('from_team_id')
+
+    if not isinstance(team_id, int) or isinstance(team_id, bool):
+        return jsonify({"message": "team_id is required"}), 400
+    if (user_ids is None) == (from_team_id is None):
+        return jsonify({"message": "Provide either user_ids or from_team_id"}), 400
+    if user_ids is not None:
+        if not isinstance(user_ids, list) or not all(
+                isinstance(user_id, int) and not isinstance(user_id, bool) for user_id in user_ids):
+            return jsonify({"message": "user_ids must be a list of user IDs"}), 400
+        limit = current_app.config.get('BULK_USER_LIMIT', 1000)
+        if len(user_ids) > limit:
+            return jsonify({
+                "message": f"At most {limit} users can be moved per request"
+            }), 413
+
+    # Validated once for the whole batch
+    if not db.session.get(Team, team_id):
+        return jsonify({"message": "Team not found"}), 404
+
+    moved, missing = reassign_team(team_id, user_ids=user_ids, from_team_id=from_team_id)
+
+    return jsonify({
+        "message": f"Moved {len(moved)} users",
+        "moved": moved,
+        "not_found": missing
+    }), 200
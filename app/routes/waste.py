@@ -1,10 +1,30 @@
-from flask import Blueprint, request, jsonify
+import heapq
+from flask import Blueprint, Response, current_app, request
 from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import lambda_stmt, select
 from datetime import datetime, timedelta
-from sqlalchemy import func
 from app import db
-from app.models import WasteEntry, WasteType, User, Team
+from app.models import WasteEntry, WasteChange, WasteType, User, Team
+from app.services.anomalies import check_entry, list_anomalies
+from app.services.analytics import PERIOD_DAYS, compute_waste_analytics, get_team_report
+from app.services.distribution import record_weight, weight_distribution
+from app.services.live import publish_entry_created, stream_events, team_channel
+from app.services.forecast import DEFAULT_HORIZON_DAYS, MAX_HORIZON_DAYS, forecast_waste
+from app.services.rollups import compute_user_analytics, record_rollup
+from app.services.search import (
+    DEFAULT_SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE, InvalidSearchQuery, search_entries
+)
+from app.services.team_hierarchy import subtree_scope, subtree_team_ids
+from app.services.sync import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, changes_since, record_change
+)
+from app.services.waste_edits import bulk_delete_entries, bulk_update_entries, count_entries
 from app.utils import permission_required
+from app.utils.coalescing import coalesce, team_scope
+from app.utils.events import TooManySubscribers, event_hub
+from app.utils.wire import request_data, respond
+from app.utils.sharding import fan_out, session_for_team, keys_for_teams
+from app.utils.sketches import DEFAULT_RANK_ERROR
 
 waste_bp = Blueprint('waste', __name__)
 
@@ -12,10 +32,10 @@ waste_bp = Blueprint('waste', __name__)
 @waste_bp.route('', methods=['POST'])
 @permission_required('add_wasteentry')
 def create_waste_entry():
-    if not request.is_json:
-        return jsonify({"message": "Missing JSON in request"}), 400
+    data = request_data()
+    if data is None:
+        return respond({"message": "Missing JSON or MessagePack in request"}, 400)
 
-    data = request.json
     waste_type_name = data.get('waste_type')
     weight = data.get('weight')
     description = data.get('description')
@@ -23,30 +43,34 @@ def create_waste_entry():
 
     # Validate required fields
     if not waste_type_name or not weight:
-        return jsonify({"message": "Missing required fields"}), 400
+        return respond({"message": "Missing required fields"}, 400)
+
+    # Checked before the weight reaches the sketches, rollups and statistics
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+        return respond({"message": "weight must be a positive number"}, 400)
 
     # Validate waste type
     try:
         waste_type = WasteType(waste_type_name)
     except ValueError:
-        return jsonify({"message": "Invalid waste type"}), 400
+        return respond({"message": "Invalid waste type"}, 400)
 
     # Get user
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
 
     # Handle team_id based on user role
     if user.is_superuser:
         if not team_id:
-            return jsonify({"message": "Team ID is required for admin users"}), 400
+            return respond({"message": "Team ID is required for admin users"}, 400)
         # Verify team exists
         team = db.session.get(Team, team_id)
         if not team:
-            return jsonify({"message": "Invalid team ID"}), 400
+            return respond({"message": "Invalid team ID"}, 400)
     else:
         # For non-admin users, use their assigned team
         if not user.team_id:
-            return jsonify({"message": "User must be assigned to a team"}), 400
+            return respond({"message": "User must be assigned to a team"}, 400)
         team_id = user.team_id
 
     # Create waste entry
@@ -58,19 +82,65 @@ def create_waste_entry():
         team_id=team_id
     )
 
-    db.session.add(waste_entry)
-    db.session.commit()
-
-    return jsonify({
+    # Entries are stored on their team's shard
+    session = session_for_team(team_id)
+    session.add(waste_entry)
+    record_change(session, waste_entry)
+    record_weight(waste_entry, session)
+    record_rollup(session, waste_entry)
+    anomaly = check_entry(session, waste_entry)
+    session.commit()
+    publish_entry_created(waste_entry)
+
+    return respond({
         "message": "Waste entry created successfully",
-        "waste_entry": waste_entry.to_dict()
-    }), 201
+        "waste_entry": waste_entry.to_dict(),
+        "flagged": anomaly is not None
+    }, 201)
+
+
+def _team_scope(team_id, include_subteams=False):
+    """(criterion, shard keys) for one team's entries or its whole subtree"""
+    if include_subteams and team_id is not None:
+        return subtree_scope(WasteEntry.team_id, team_id)
+    return WasteEntry.team_id == team_id, keys_for_teams([team_id])
+
+
+def _scope_team_ids(team_id, include_subteams=False):
+    """Team ids `_team_scope` covers, as a list (None for no team)"""
+    if team_id is None:
+        return None
+    if include_subteams:
+        return subtree_team_ids(team_id)
+    return [team_id]
+
+
+def _listing_statement(team_ids=None, user_id=None, waste_type=None, start=None, end=None):
+    """
+    Cached statement for an entry listing: entries of `team_ids` (a list, or
+    None for entries without a team) or of `user_id`, newest first
+    """
+    statement = lambda_stmt(lambda: select(WasteEntry))
+    if user_id is not None:
+        statement += lambda s: s.where(WasteEntry.user_id == user_id)
+    elif team_ids is None:
+        statement += lambda s: s.where(WasteEntry.team_id.is_(None))
+    else:
+        statement += lambda s: s.where(WasteEntry.team_id.in_(team_ids))
+    if waste_type is not None:
+        statement += lambda s: s.where(WasteEntry.waste_type == waste_type)
+    if start is not None:
+        statement += lambda s: s.where(WasteEntry.timestamp >= start)
+    if end is not None:
+        statement += lambda s: s.where(WasteEntry.timestamp <= end)
+    statement += lambda s: s.order_by(WasteEntry.timestamp.desc())
+    return statement
 
 
 @waste_bp.route('', methods=['GET'])
 @permission_required('view_wasteentry')
 def get_waste_entries():
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
 
     # Parse query parameters
@@ -79,108 +149,469 @@ def get_waste_entries():
     start_date = request.args.get('start_date')
     end_date = request.args.get('end_date')
 
-    # Base query
-    query = WasteEntry.query
+    include_subteams = request.args.get('include_subteams', '').lower() == 'true'
+
+    filters = []
+    keys = None  # every shard
+    # Parameters of the listing statement, alongside the filters search uses
+    listing = {}
 
     # Apply filters based on user permissions
     if team_id and user.is_superuser:
-        query = query.filter(WasteEntry.team_id == team_id)
+        team_filter, keys = _team_scope(team_id, include_subteams)
+        filters.append(team_filter)
+        listing['team_ids'] = _scope_team_ids(team_id, include_subteams)
     elif user.has_permission('view_analytics'):  # Manager-level permission
-        query = query.filter(WasteEntry.team_id == user.team_id)
+        team_filter, keys = _team_scope(user.team_id, include_subteams)
+        filters.append(team_filter)
+        listing['team_ids'] = _scope_team_ids(user.team_id, include_subteams)
     else:  # Regular employee
-        query = query.filter(WasteEntry.user_id == user.id)
+        filters.append(WasteEntry.user_id == user.id)
+        listing['user_id'] = user.id
 
     if waste_type:
         try:
             waste_type_enum = WasteType(waste_type)
-            query = query.filter(WasteEntry.waste_type == waste_type_enum)
+            filters.append(WasteEntry.waste_type == waste_type_enum)
+            listing['waste_type'] = waste_type_enum
         except ValueError:
             pass  # Ignore invalid waste type
 
     if start_date:
         try:
             start = datetime.fromisoformat(start_date)
-            query = query.filter(WasteEntry.timestamp >= start)
+            filters.append(WasteEntry.timestamp >= start)
+            listing['start'] = start
         except ValueError:
             pass  # Ignore invalid date format
 
     if end_date:
         try:
             end = datetime.fromisoformat(end_date)
-            query = query.filter(WasteEntry.timestamp <= end)
+            filters.append(WasteEntry.timestamp <= end)
+            listing['end'] = end
         except ValueError:
             pass  # Ignore invalid date format
 
-    waste_entries = query.order_by(WasteEntry.timestamp.desc()).all()
+    # Full-text search: ranked and paginated within the same scope
+    q = request.args.get('q')
+    if q is not None:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', DEFAULT_SEARCH_PAGE_SIZE, type=int)
+        if page < 1 or not 1 <= per_page <= MAX_SEARCH_PAGE_SIZE:
+            return respond({
+                "message": f"page must be at least 1 and per_page between 1 and {MAX_SEARCH_PAGE_SIZE}"
+            }, 400)
+        try:
+            results, has_more = search_entries(q, filters, keys, page=page, per_page=per_page)
+        except InvalidSearchQuery as error:
+            return respond({"message": str(error)}, 400)
+        return respond({
+            "waste_entries": results,
+            "page": page,
+            "per_page": per_page,
+            "has_more": has_more
+        }, 200)
+
+    statement = _listing_statement(**listing)
+
+    def fetch(session):
+        return [entry.to_dict() for entry in session.scalars(statement)]
+
+    # Each shard returns its entries newest first; merge them in that order
+    waste_entries = heapq.merge(
+        *fan_out(fetch, keys),
+        key=lambda entry: entry['timestamp'],
+        reverse=True
+    )
+
+    return respond({
+        "waste_entries": list(waste_entries)
+    }, 200)
+
+
+def _bulk_criteria(user, filters):
+    """
+    Translate bulk edit filters into criteria within the user's scope.
+    Returns (criteria, shard keys, error response).
+    """
+    if not isinstance(filters, dict) or not any(
+            filters.get(name) for name in
+            ('team_id', 'user_id', 'waste_type', 'start_date', 'end_date')):
+        return None, None, respond({"message": "At least one filter is required"}, 400)
+
+    criteria = []
+    keys = None  # every shard
+    team_id = filters.get('team_id')
+
+    # Same visibility as the entry listing
+    if user.is_superuser:
+        if team_id:
+            criteria.append(WasteEntry.team_id == team_id)
+            keys = keys_for_teams([team_id])
+    elif user.has_permission('view_analytics'):  # Manager-level permission
+        if team_id and team_id != user.team_id:
+            return None, None, respond({"message": "Access denied for this team"}, 403)
+        criteria.append(WasteEntry.team_id == user.team_id)
+        keys = keys_for_teams([user.team_id])
+    else:  # Regular employee
+        criteria.append(WasteEntry.user_id == user.id)
+
+    if filters.get('user_id'):
+        criteria.append(WasteEntry.user_id == filters['user_id'])
+
+    if filters.get('waste_type'):
+        try:
+            criteria.append(WasteEntry.waste_type == WasteType(filters['waste_type']))
+        except ValueError:
+            return None, None, respond({"message": "Invalid waste type"}, 400)
+
+    for name, compare in (('start_date', WasteEntry.timestamp.__ge__),
+                          ('end_date', WasteEntry.timestamp.__le__)):
+        if filters.get(name):
+            try:
+                criteria.append(compare(datetime.fromisoformat(filters[name])))
+            except (TypeError, ValueError):
+                return None, None, respond({"message": f"Invalid {name}"}, 400)
+
+    return criteria, keys, None
 
-    return jsonify({
-        "waste_entries": [entry.to_dict() for entry in waste_entries]
-    }), 200
+
+@waste_bp.route('', methods=['PATCH'])
+@permission_required('edit_wasteentry')
+def bulk_update_waste_entries():
+    data = request_data()
+    if data is None:
+        return respond({"message": "Missing JSON or MessagePack in request"}, 400)
+
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    criteria, keys, error = _bulk_criteria(user, data.get('filters'))
+    if error:
+        return error
+
+    changes = data.get('set') or {}
+    values = {}
+    if 'waste_type' in changes:
+        try:
+            values['waste_type'] = WasteType(changes['waste_type'])
+        except ValueError:
+            return respond({"message": "Invalid waste type"}, 400)
+    if 'weight' in changes and 'weight_factor' in changes:
+        return respond({"message": "Set either weight or weight_factor, not both"}, 400)
+    for name in ('weight', 'weight_factor'):
+        if name in changes and (
+                isinstance(changes[name], bool) or
+                not isinstance(changes[name], (int, float)) or changes[name] <= 0):
+            return respond({"message": f"{name} must be a positive number"}, 400)
+    if 'weight' in changes:
+        values['weight'] = changes['weight']
+    if 'weight_factor' in changes:
+        # e.g. correcting a mis-calibrated scale
+        values['weight'] = WasteEntry.weight * changes['weight_factor']
+    if 'description' in changes:
+        values['description'] = changes['description']
+
+    if not values:
+        return respond({"message": "Nothing to update"}, 400)
+
+    if data.get('dry_run'):
+        return respond({
+            "message": "Dry run, no entries updated",
+            "affected": count_entries(criteria, keys),
+            "dry_run": True
+        }, 200)
+
+    values['updated_at'] = datetime.utcnow()
+    affected = bulk_update_entries(criteria, values, keys)
+
+    return respond({
+        "message": "Waste entries updated successfully",
+        "affected": affected,
+        "dry_run": False
+    }, 200)
+
+
+@waste_bp.route('', methods=['DELETE'])
+@permission_required('delete_wasteentry')
+def bulk_delete_waste_entries():
+    data = request_data()
+    if data is None:
+        return respond({"message": "Missing JSON or MessagePack in request"}, 400)
+
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    criteria, keys, error = _bulk_criteria(user, data.get('filters'))
+    if error:
+        return error
+
+    if data.get('dry_run'):
+        return respond({
+            "message": "Dry run, no entries deleted",
+            "affected": count_entries(criteria, keys),
+            "dry_run": True
+        }, 200)
+
+    affected = bulk_delete_entries(criteria, keys)
+
+    return respond({
+        "message": "Waste entries deleted successfully",
+        "affected": affected,
+        "dry_run": False
+    }, 200)
+
+
+@waste_bp.route('/changes', methods=['GET'])
+@permission_required('view_wasteentry')
+def get_waste_changes():
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    # Parse query parameters
+    since = request.args.get('since')
+    team_id = request.args.get('team_id', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return respond({
+            "message": f"limit must be between 1 and {MAX_PAGE_SIZE}"
+        }, 400)
+
+    # Same visibility as the entry listing
+    keys = None  # every shard
+    if user.is_superuser:
+        scope = [WasteChange.team_id == team_id] if team_id else []
+        if team_id:
+            keys = keys_for_teams([team_id])
+    elif user.has_permission('view_analytics'):  # Manager-level permission
+        scope = [WasteChange.team_id == user.team_id]
+        keys = keys_for_teams([user.team_id])
+    else:  # Regular employee
+        scope = [WasteChange.user_id == user.id]
+
+    try:
+        changes = changes_since(since, scope, keys=keys, limit=limit)
+    except InvalidCursor:
+        return respond({"message": "Invalid cursor"}, 400)
+
+    return respond(changes, 200)
 
 
 @waste_bp.route('/analytics', methods=['GET'])
 @permission_required('view_analytics')
+@coalesce(team_scope)
 def get_waste_analytics():
-    user_id = get_jwt_identity()
+    user_id = int(get_jwt_identity())
     user = db.session.get(User, user_id)
 
     # Parse query parameters
     team_id = request.args.get('team_id', type=int)
     period = request.args.get('period', 'week')  # week, month, year
     waste_type = request.args.get('waste_type')
+    include_subteams = request.args.get('include_subteams', '').lower() == 'true'
 
-    # Determine date range based on period
-    now = datetime.utcnow()
-    if period == 'week':
-        start_date = now - timedelta(days=7)
-    elif period == 'month':
-        start_date = now - timedelta(days=30)
-    elif period == 'year':
-        start_date = now - timedelta(days=365)
-    else:
-        return jsonify({"message": "Invalid period"}), 400
-
-    # Base query
-    query = db.session.query(
-        WasteEntry.waste_type,
-        func.sum(WasteEntry.weight).label('total_weight'),
-        func.count(WasteEntry.id).label('entry_count')
-    ).filter(WasteEntry.timestamp >= start_date)
+    if period not in PERIOD_DAYS:
+        return respond({"message": "Invalid period"}, 400)
 
     # Apply team filter based on role
     if not user.is_superuser:
         # Managers can only see their team's data
-        query = query.filter(WasteEntry.team_id == user.team_id)
-    elif team_id:
-        # Admins can optionally filter by team
-        query = query.filter(WasteEntry.team_id == team_id)
+        if not user.team_id:
+            return respond({"message": "User must be assigned to a team"}, 400)
+        team_id = user.team_id
+
+    # Apply waste type filter
+    waste_type_enum = None
+    if waste_type:
+        try:
+            waste_type_enum = WasteType(waste_type)
+        except ValueError:
+            pass  # Ignore invalid waste type
+
+    # Unfiltered single-team reports are precomputed
+    if team_id is not None and waste_type_enum is None and not include_subteams:
+        return respond(get_team_report(team_id, period), 200)
+
+    return respond(compute_waste_analytics(
+        period,
+        team_id=team_id,
+        waste_type=waste_type_enum,
+        include_subteams=include_subteams
+    ), 200)
+
+
+@waste_bp.route('/analytics/stream', methods=['GET'])
+@permission_required('view_analytics')
+def stream_waste_analytics():
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    team_id = request.args.get('team_id', type=int)
+    period = request.args.get('period', 'week')  # week, month, year
+
+    if period not in PERIOD_DAYS:
+        return respond({"message": "Invalid period"}, 400)
+
+    # Streams are per team; admins choose which
+    if not user.is_superuser:
+        if not user.team_id:
+            return respond({"message": "User must be assigned to a team"}, 400)
+        team_id = user.team_id
+    elif team_id is None:
+        return respond({"message": "Team ID is required for admin users"}, 400)
+
+    try:
+        subscription = event_hub().subscribe(team_channel(team_id))
+    except TooManySubscribers:
+        return respond({"message": "Too many live dashboards on this server"}, 503)
+
+    # Subscribed before reading the report, so no entry committed in between
+    # is missed (one may be counted twice; deltas carry entry_id)
+    try:
+        initial = compute_waste_analytics(period, team_id=team_id)
+    except Exception:
+        subscription.close()
+        raise
+
+    # The generator needs no request context, so the request's database
+    # session and admission slot are released as soon as streaming starts
+    return Response(
+        stream_events(subscription, initial, current_app.config.get('STREAM_HEARTBEAT_SECONDS', 15)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@waste_bp.route('/analytics/me', methods=['GET'])
+@permission_required('view_wasteentry')
+def get_my_waste_analytics():
+    user_id = int(get_jwt_identity())
+
+    period = request.args.get('period', 'week')  # week, month, year
+    waste_type = request.args.get('waste_type')
+
+    if period not in PERIOD_DAYS:
+        return respond({"message": "Invalid period"}, 400)
 
     # Apply waste type filter
+    waste_type_enum = None
     if waste_type:
         try:
             waste_type_enum = WasteType(waste_type)
-            query = query.filter(WasteEntry.waste_type == waste_type_enum)
         except ValueError:
             pass  # Ignore invalid waste type
 
-    # Group by waste type
-    results = query.group_by(WasteEntry.waste_type).all()
+    return respond(compute_user_analytics(
+        user_id,
+        period,
+        waste_type=waste_type_enum
+    ), 200)
 
-    # Calculate totals
-    total_weight = round(sum(float(result[1]) for result in results), 2)
-    total_entries = sum(result[2] for result in results)
 
-    # Format results by waste type
-    waste_by_type = {
-        result[0].value: round(float(result[1]), 2)
-        for result in results
-    }
+@waste_bp.route('/forecast', methods=['GET'])
+@permission_required('view_analytics')
+@coalesce(team_scope)
+def get_waste_forecast():
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    team_id = request.args.get('team_id', type=int)
+    days = request.args.get('days', DEFAULT_HORIZON_DAYS, type=int)
+
+    if not 1 <= days <= MAX_HORIZON_DAYS:
+        return respond({"message": f"days must be between 1 and {MAX_HORIZON_DAYS}"}, 400)
+
+    # Forecasts are per team; admins choose which
+    if not user.is_superuser:
+        if not user.team_id:
+            return respond({"message": "User must be assigned to a team"}, 400)
+        team_id = user.team_id
+    elif team_id is None:
+        return respond({"message": "Team ID is required for admin users"}, 400)
+
+    return respond(forecast_waste(team_id, horizon_days=days), 200)
+
+
+@waste_bp.route('/anomalies', methods=['GET'])
+@permission_required('view_analytics')
+def get_waste_anomalies():
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    team_id = request.args.get('team_id', type=int)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    since = request.args.get('since')
+
+    # SQLite reads a negative LIMIT as no limit at all
+    if limit < 1:
+        return respond({"message": "limit must be at least 1"}, 400)
+
+    if not user.is_superuser:
+        if not user.team_id:
+            return respond({"message": "User must be assigned to a team"}, 400)
+        team_id = user.team_id
+
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return respond({"message": "Invalid since date"}, 400)
+
+    return respond({
+        "anomalies": list_anomalies(team_id=team_id, since=since, limit=limit)
+    }, 200)
+
+
+@waste_bp.route('/analytics/distribution', methods=['GET'])
+@permission_required('view_analytics')
+@coalesce(team_scope)
+def get_weight_distribution():
+    user_id = int(get_jwt_identity())
+    user = db.session.get(User, user_id)
+
+    # Parse query parameters
+    team_id = request.args.get('team_id', type=int)
+    period = request.args.get('period', 'week')  # week, month, year
+    waste_type = request.args.get('waste_type')
+    include_subteams = request.args.get('include_subteams', '').lower() == 'true'
+    bins = request.args.get('bins', 10, type=int)
+
+    if period not in PERIOD_DAYS:
+        return respond({"message": "Invalid period"}, 400)
+    if bins < 1 or bins > 100:
+        return respond({"message": "bins must be between 1 and 100"}, 400)
+
+    now = datetime.utcnow()
+    start_date = now - timedelta(days=PERIOD_DAYS[period])
+
+    # Managers can only see their team's data, admins can optionally filter
+    if not user.is_superuser:
+        if not user.team_id:
+            return respond({"message": "User must be assigned to a team"}, 400)
+        team_id = user.team_id
+
+    waste_type_enum = None
+    if waste_type:
+        try:
+            waste_type_enum = WasteType(waste_type)
+        except ValueError:
+            pass  # Ignore invalid waste type
+
+    distribution = weight_distribution(
+        start_date,
+        now,
+        team_id=team_id,
+        waste_type=waste_type_enum,
+        bins=bins,
+        include_subteams=include_subteams
+    )
 
-    return jsonify({
+    return respond({
         'period': period,
         'start_date': start_date.isoformat(),
         'end_date': now.isoformat(),
-        'total_entries': total_entries,
-        'total_weight': total_weight,
-        'waste_by_type': waste_by_type
-    }), 200 
\ No newline at end of file
+        'rank_error': DEFAULT_RANK_ERROR,
+        'waste_by_type': distribution
+    }, 200)
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Waste analytics reports and their precomputed snapshots.
+
+Per-team week, month and year reports are refreshed on a schedule (see
+``app.cli`` and ``REPORT_SCHEDULE``) and stored in ``report_snapshots``. A
+request is served from its snapshot while the snapshot is younger than
+``REPORT_SNAPSHOT_MAX_AGE`` seconds; otherwise the report is recomputed once,
+no matter how many requests for it arrive concurrently, and stored again.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import WasteEntry, Team, ReportSnapshot
+from app.services.team_hierarchy import subtree_scope
+from app.utils.sharding import fan_out, session_for_team
+from app.utils.singleflight import SingleFlight
+
+PERIOD_DAYS = {
+    'week': 7,
+    'month': 30,
+    'year': 365
+}
+
+DEFAULT_SNAPSHOT_MAX_AGE = 900  # seconds
+DEFAULT_REPORT_SCHEDULE = '*/15 * * * *'
+
+_report_flights = SingleFlight()
+
+
+def _totals_by_type(session, start_date, team_filter, waste_type):
+    query = session.query(
+        WasteEntry.waste_type,
+        func.sum(WasteEntry.weight).label('total_weight'),
+        func.count(WasteEntry.id).label('entry_count')
+    ).filter(WasteEntry.timestamp >= start_date)
+
+    if team_filter is not None:
+        query = query.filter(team_filter)
+    if waste_type is not None:
+        query = query.filter(WasteEntry.waste_type == waste_type)
+
+    # Group by waste type
+    return [
+        (result[0], float(result[1]), result[2])
+        for result in query.group_by(WasteEntry.waste_type).all()
+    ]
+
+
+def compute_waste_analytics(period, team_id=None, waste_type=None, now=None,
+                            include_subteams=False):
+    """
+    Total weight and entry counts per waste type over a trailing period, for
+    one team or (with `include_subteams`) its whole subtree. Cross-team
+    reports are aggregated on every shard and merged.
+    """
+    now = now or datetime.utcnow()
+    start_date = now - timedelta(days=PERIOD_DAYS[period])
+
+    team_filter, keys = None, None
+    if team_id is not None and include_subteams:
+        team_filter, keys = subtree_scope(WasteEntry.team_id, team_id)
+    elif team_id is not None:
+        team_filter = WasteEntry.team_id == team_id
+
+    def totals(session):
+        return _totals_by_type(session, start_date, team_filter, waste_type)
+
+    if team_id is not None and not include_subteams:
+        shard_results = [totals(session_for_team(team_id))]
+    else:
+        shard_results = fan_out(totals, keys)
+
+    weights = defaultdict(float)
+    counts = defaultdict(int)
+    for results in shard_results:
+        for waste_type_enum, weight, count in results:
+            weights[waste_type_enum] += weight
+            counts[waste_type_enum] += count
+
+    # Calculate totals
+    total_weight = round(sum(weights.values()), 2)
+    total_entries = sum(counts.values())
+
+    # Format results by waste type
+    waste_by_type = {
+        waste_type_enum.value: round(weight, 2)
+        for waste_type_enum, weight in weights.items()
+    }
+
+    return {
+        'period': period,
+        'start_date': start_date.isoformat(),
+        'end_date': now.isoformat(),
+        'total_entries': total_entries,
+        'total_weight': total_weight,
+        'waste_by_type': waste_by_type,
+        'generated_at': now.isoformat()
+    }
+
+
+def store_snapshot(team_id, period, payload):
+    snapshot = ReportSnapshot.query.filter_by(team_id=team_id, period=period).first()
+    if snapshot is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(ReportSnapshot(team_id, period, payload))
+            return
+        except IntegrityError:
+            # Another worker stored it first; overwrite with ours
+            snapshot = ReportSnapshot.query.filter_by(
+                team_id=team_id, period=period
+            ).first()
+
+    snapshot.payload = payload
+    snapshot.generated_at = datetime.utcnow()
+
+
+def invalidate_team_reports(team_ids):
+    """
+    Drop the snapshots of teams whose history was edited
+    """
+    if team_ids:
+        ReportSnapshot.query.filter(
+            ReportSnapshot.team_id.in_(team_ids)
+        ).delete(synchronize_session=False)
+
+
+def get_team_report(team_id, period):
+    """
+    Report for a team, served from its snapshot when fresh enough
+    """
+    max_age = current_app.config.get('REPORT_SNAPSHOT_MAX_AGE', DEFAULT_SNAPSHOT_MAX_AGE)
+    snapshot = ReportSnapshot.query.filter_by(team_id=team_id, period=period).first()
+    if snapshot and datetime.utcnow() - snapshot.generated_at <= timedelta(seconds=max_age):
+        return snapshot.payload
+
+    def refresh():
+        payload = compute_waste_analytics(period, team_id=team_id)
+        store_snapshot(team_id, period, payload)
+        db.session.commit()
+        return payload
+
+    return _report_flights.do((team_id, period), refresh)
+
+
+def refresh_report_snapshots(periods=None):
+    """
+    Recompute every team's reports; run by the scheduler
+    """
+    periods = periods or list(PERIOD_DAYS)
+    team_ids = [team_id for team_id, in db.session.query(Team.id)]
+    for team_id in team_ids:
+        for period in periods:
+            store_snapshot(team_id, period, compute_waste_analytics(period, team_id=team_id))
+        db.session.commit()
+    return len(team_ids) * len(periods)
+
+
+def create_report_scheduler(app):
+    """
+    Scheduler that keeps report snapshots fresh
+    """
+    from app.utils.scheduler import Scheduler
+
+    scheduler = Scheduler(app)
+    scheduler.add_job(
+        'refresh_report_snapshots',
+        app.config.get('REPORT_SCHEDULE', DEFAULT_REPORT_SCHEDULE),
+        refresh_report_snapshots
+    )
+    return scheduler
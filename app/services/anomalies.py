@@ -0,0 +1,240 @@
+"""
+Outlier detection on the ingestion path.
+
+Each worker keeps running weight statistics (``RunningStats``) per
+(team, waste_type) in memory. A new entry is scored against them in O(1);
+once at least ``ANOMALY_MIN_SAMPLES`` weights have been seen, an entry whose
+z-score exceeds ``ANOMALY_Z_THRESHOLD`` is recorded in ``waste_anomalies``
+and kept out of the statistics so one bad reading does not shift the
+baseline.
+
+Statistics are loaded from ``weight_stats`` on first use and the weights a
+worker has seen since are merged back into the stored row every
+``ANOMALY_PERSIST_EVERY`` entries (under a row lock, in the entry's
+transaction), so workers share a baseline without a query per insert.
+``flask anomalies rebuild`` recomputes the stored statistics from history.
+"""
+import threading
+from flask import current_app
+from sqlalchemy import and_, func
+from sqlalchemy.exc import IntegrityError
+from app.models import WasteAnomaly, WasteEntry, WeightStats
+from app.utils.sharding import fan_out, keys_for_teams
+from app.utils.stats import RunningStats
+
+DEFAULT_Z_THRESHOLD = 4.0
+DEFAULT_MIN_SAMPLES = 30
+DEFAULT_PERSIST_EVERY = 50
+
+
+class AnomalyDetector:
+    """
+    Per-process weight statistics for each (team, waste_type)
+    """
+
+    def __init__(self, z_threshold=DEFAULT_Z_THRESHOLD, min_samples=DEFAULT_MIN_SAMPLES,
+                 persist_every=DEFAULT_PERSIST_EVERY):
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.persist_every = persist_every
+        self._lock = threading.Lock()
+        self._stored = {}   # As last read from or written to weight_stats
+        self._pending = {}  # Seen by this worker since
+
+    def _stored_stats(self, session, key):
+        stored = self._stored.get(key)
+        if stored is None:
+            row = session.query(WeightStats).filter_by(
+                team_id=key[0], waste_type=key[1]
+            ).first()
+            stored = RunningStats(row.count, row.mean, row.m2) if row else RunningStats()
+            with self._lock:
+                stored = self._stored.setdefault(key, stored)
+        return stored
+
+    def check(self, session, entry):
+        """
+        Score a new entry in the caller's transaction. Returns the recorded
+        WasteAnomaly, or None when the weight is within range.
+        """
+        key = (entry.team_id, entry.waste_type)
+        stored = self._stored_stats(session, key)
+
+        with self._lock:
+            pending = self._pending.setdefault(key, RunningStats())
+            stats = stored.copy().merge(pending)
+            z_score = stats.z_score(entry.weight)
+            flagged = stats.count >= self.min_samples and abs(z_score) > self.z_threshold
+            if not flagged:
+                pending.update(entry.weight)
+            due = pending.count >= self.persist_every
+
+        if due:
+            self.persist(session, key)
+
+        if not flagged:
+            return None
+
+        if entry.id is None:
+            session.flush()
+        anomaly = WasteAnomaly(
+            entry_id=entry.id,
+            team_id=entry.team_id,
+            waste_type=entry.waste_type,
+            weight=entry.weight,
+            z_score=z_score,
+            mean=stats.mean,
+            stddev=stats.stddev
+        )
+        session.add(anomaly)
+        return anomaly
+
+    def reset(self):
+        """Forget all statistics; they are reloaded on next use"""
+        with self._lock:
+            self._stored.clear()
+            self._pending.clear()
+
+    def forget(self, team_ids):
+        """Forget the statistics of `team_ids`; they are reloaded on next use"""
+        with self._lock:
+            for statistics in (self._stored, self._pending):
+                for key in [key for key in statistics if key[0] in team_ids]:
+                    del statistics[key]
+
+    def persist(self, session, key):
+        """Merge this worker's pending statistics for `key` into weight_stats"""
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if not pending or not pending.count:
+            return
+
+        row = _locked_stats(session, *key)
+        if row is None:
+            try:
+                with session.begin_nested():
+                    row = WeightStats(team_id=key[0], waste_type=key[1])
+                    session.add(row)
+            except IntegrityError:
+                # Another worker created the row first
+                row = _locked_stats(session, *key)
+
+        merged = RunningStats(row.count, row.mean, row.m2).merge(pending)
+        row.count, row.mean, row.m2 = merged.count, merged.mean, merged.m2
+        with self._lock:
+            self._stored[key] = merged
+
+
+def _locked_stats(session, team_id, waste_type):
+    return session.query(WeightStats).filter_by(
+        team_id=team_id,
+        waste_type=waste_type
+    ).with_for_update().first()
+
+
+def init_anomaly_detection(app):
+    app.extensions['anomaly_detector'] = AnomalyDetector(
+        z_threshold=app.config.get('ANOMALY_Z_THRESHOLD', DEFAULT_Z_THRESHOLD),
+        min_samples=app.config.get('ANOMALY_MIN_SAMPLES', DEFAULT_MIN_SAMPLES),
+        persist_every=app.config.get('ANOMALY_PERSIST_EVERY', DEFAULT_PERSIST_EVERY)
+    )
+
+
+def anomaly_detector():
+    return current_app.extensions['anomaly_detector']
+
+
+def check_entry(session, entry):
+    return anomaly_detector().check(session, entry)
+
+
+def list_anomalies(team_id=None, since=None, limit=100):
+    """
+    Flagged entries that still exist, newest first, with the entry itself
+    """
+    def fetch(session):
+        query = session.query(WasteAnomaly, WasteEntry).join(
+            WasteEntry, WasteEntry.id == WasteAnomaly.entry_id
+        )
+        if team_id is not None:
+            query = query.filter(WasteAnomaly.team_id == team_id)
+        if since is not None:
+            query = query.filter(WasteAnomaly.created_at >= since)
+        rows = query.order_by(WasteAnomaly.created_at.desc()).limit(limit).all()
+        return [
+            {**anomaly.to_dict(), 'waste_entry': entry.to_dict()}
+            for anomaly, entry in rows
+        ]
+
+    keys = keys_for_teams([team_id]) if team_id is not None else None
+    anomalies = [row for rows in fan_out(fetch, keys) for row in rows]
+    anomalies.sort(key=lambda row: row['created_at'], reverse=True)
+    return anomalies[:limit]
+
+
+def _rebuild_shard_stats(session, team_ids=None):
+    stored = session.query(WeightStats)
+    scope = [WasteEntry.id.not_in(session.query(WasteAnomaly.entry_id))]
+    if team_ids is not None:
+        stored = stored.filter(WeightStats.team_id.in_(team_ids))
+        scope.append(WasteEntry.team_id.in_(team_ids))
+    stored.delete(synchronize_session=False)
+
+    means = session.query(
+        WasteEntry.team_id,
+        WasteEntry.waste_type,
+        func.count(WasteEntry.id).label('count'),
+        func.avg(WasteEntry.weight).label('mean')
+    ).filter(
+        *scope
+    ).group_by(WasteEntry.team_id, WasteEntry.waste_type).subquery()
+
+    # Second pass over the deviations from each group's mean: subtracting
+    # count * mean^2 from the sum of squares cancels catastrophically when
+    # the spread is small next to the mean
+    deviation = WasteEntry.weight - means.c.mean
+    rows = session.query(
+        means.c.team_id,
+        means.c.waste_type,
+        means.c.count,
+        means.c.mean,
+        func.sum(deviation * deviation)
+    ).select_from(WasteEntry).join(means, and_(
+        WasteEntry.team_id.is_not_distinct_from(means.c.team_id),
+        WasteEntry.waste_type == means.c.waste_type
+    )).filter(
+        *scope
+    ).group_by(means.c.team_id, means.c.waste_type, means.c.count, means.c.mean).all()
+
+    session.add_all([
+        WeightStats(
+            team_id=team_id,
+            waste_type=waste_type,
+            count=count,
+            mean=mean,
+            m2=m2
+        )
+        for team_id, waste_type, count, mean, m2 in rows
+    ])
+
+
+def rebuild_team_stats(session, team_ids):
+    """
+    Recompute the stored statistics of `team_ids` from their unflagged entries
+    on one shard, in the caller's transaction; the detector's cached copies
+    are dropped with ``AnomalyDetector.forget`` once it commits
+    """
+    _rebuild_shard_stats(session, team_ids)
+
+
+def rebuild_weight_stats():
+    """
+    Recompute the stored statistics from all unflagged entries, with one
+    grouped query per shard
+    """
+    def rebuild(session):
+        _rebuild_shard_stats(session)
+        session.commit()
+
+    fan_out(rebuild)
+    anomaly_detector().reset()
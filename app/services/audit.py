@@ -0,0 +1,333 @@
+"""
+Append-only audit log of administrative changes.
+
+Changes to users, roles, teams and permissions are captured from the ORM
+session instead of in each route:
+
+1. ``after_flush`` diffs every new, changed or deleted audited object
+   (column before/after values, added and removed role permissions) and
+   keeps the records on the session.
+2. ``after_commit`` hands them to this worker's ``AuditWriter``; a rollback
+   discards them, so only changes that actually happened are logged.
+3. The writer's background thread inserts queued records in batches of up to
+   ``AUDIT_BATCH_SIZE``, at least every ``AUDIT_FLUSH_INTERVAL`` seconds, on
+   its own connection.
+
+Set-based statements are recorded explicitly with ``record_bulk_changes``.
+Requests therefore never wait on audit writes or hold locks on
+``audit_log``.
+
+Records still queued when the process exits are written by an ``atexit``
+hook, which covers normal exits and servers that turn SIGTERM into one
+(gunicorn workers). A process still on the default SIGTERM disposition
+(plain ``python``, ``flask run``) would die without running it, so
+``init_audit`` installs a SIGTERM handler that writes the queue and then
+terminates as before. Records are lost on SIGKILL or a crash. Secrets
+(password hashes) are logged as changed, never by value.
+"""
+import atexit
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+import weakref
+from datetime import datetime
+from enum import Enum
+from flask import current_app, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, insert, inspect
+from app import db
+from app.models import AuditLog, Permission, Role, Team, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0  # seconds
+DEFAULT_QUEUE_SIZE = 10000
+WRITE_ATTEMPTS = 3
+
+AUDITED_MODELS = (User, Role, Team, Permission)
+# Collections recorded as added/removed ids; backrefs are left out so one
+# change is not logged from both sides
+AUDITED_COLLECTIONS = {Role: ('permissions',)}
+REDACTED_FIELDS = {'password_hash'}
+REDACTED = '[redacted]'
+# Maintained by the database on every write
+IGNORED_FIELDS = {'created_at', 'updated_at'}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class AuditWriter:
+    """
+    Queue of committed audit records and the thread that writes them
+    """
+
+    def __init__(self, app, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 queue_size=DEFAULT_QUEUE_SIZE):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Full queue blocks committers rather than dropping records
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.written = 0
+
+    def enqueue(self, records):
+        # Started lazily so forked workers each get their own thread
+        self._ensure_started()
+        for record in records:
+            self._queue.put(record)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _next_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        # None only wakes the thread up to stop
+        for _ in range(batch.count(None)):
+            batch.remove(None)
+            self._queue.task_done()
+        return batch
+
+    def _write(self, batch):
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(AuditLog), batch)
+                self.written += len(batch)
+                break
+            except Exception:
+                if attempt == WRITE_ATTEMPTS:
+                    # Leave the records in the application log rather than lose them
+                    logger.exception("Failed to write %d audit records: %r", len(batch), batch)
+                else:
+                    time.sleep(0.1 * attempt)
+        for _ in batch:
+            self._queue.task_done()
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._next_batch(self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Block until every record queued so far is written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Write what is queued and stop the thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        # Anything enqueued while stopping
+        while not self._queue.empty():
+            self._write(self._next_batch(0))
+
+
+def init_audit(app):
+    writer = AuditWriter(
+        app,
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+        queue_size=app.config.get('AUDIT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)
+    )
+    app.extensions['audit'] = writer
+    atexit.register(writer.close)
+    _close_on_sigterm(writer)
+
+
+_sigterm_writers = weakref.WeakSet()
+
+
+def _close_on_sigterm(writer):
+    _sigterm_writers.add(writer)
+    # Signal handlers can only be set from the main thread; leave handlers
+    # installed by the server (or earlier apps) alone
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL:
+        return
+    signal.signal(signal.SIGTERM, _write_and_terminate)
+
+
+def _write_and_terminate(signum, frame):
+    for writer in list(_sigterm_writers):
+        writer.close()
+    # Die of the signal as the default disposition would have
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def audit_writer():
+    return current_app.extensions['audit']
+
+
+def _field(key, value):
+    if key in REDACTED_FIELDS:
+        return REDACTED
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _snapshot(state):
+    # Loaded values only; a deleted object cannot be refreshed
+    return {
+        attr.key: _field(attr.key, state.dict.get(attr.key))
+        for attr in state.mapper.column_attrs
+        if attr.key not in IGNORED_FIELDS and attr.key in state.dict
+    }
+
+
+def _diff(obj, state):
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        if attr.key in IGNORED_FIELDS:
+            continue
+        history = state.attrs[attr.key].history
+        if not history.has_changes():
+            continue
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0] if history.added else None
+        if old != new or attr.key in REDACTED_FIELDS:
+            changes[attr.key] = {'old': _field(attr.key, old), 'new': _field(attr.key, new)}
+
+    for key in AUDITED_COLLECTIONS.get(type(obj), ()):
+        history = state.attrs[key].history
+        added = sorted(item.id for item in history.added)
+        removed = sorted(item.id for item in history.deleted)
+        if added or removed:
+            changes[key] = {'added': added, 'removed': removed}
+    return changes
+
+
+def _actor():
+    if not has_request_context():
+        return None, 'cli'
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:  # Unauthenticated route, e.g. registration
+        identity = None
+    return (int(identity) if identity is not None else None), request.endpoint
+
+
+@event.listens_for(db.session, 'after_flush')
+def _capture(session, flush_context):
+    records = []
+    now = datetime.utcnow()
+    for action, objects in ((AuditLog.CREATE, session.new),
+                            (AuditLog.UPDATE, session.dirty),
+                            (AuditLog.DELETE, session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, AUDITED_MODELS):
+                continue
+            state = inspect(obj)
+            if action == AuditLog.UPDATE:
+                changes = _diff(obj, state)
+                if not changes:
+                    continue
+            else:
+                changes = _snapshot(state)
+            records.append({
+                'occurred_at': now,
+                'action': action,
+                'entity_type': state.mapper.local_table.name,
+                # Not state.identity: new objects get their key after this hook
+                'entity_id': state.mapper.primary_key_from_instance(obj)[0],
+                'changes': changes,
+            })
+
+    if records:
+        actor_id, source = _actor()
+        for record in records:
+            record['actor_id'] = actor_id
+            record['source'] = source
+        session.info.setdefault('audit_records', []).extend(records)
+
+
+def record_bulk_changes(session, action, entity_type, changes_by_id):
+    """
+    Audit a set-based statement, which the flush hook cannot see; logged like
+    flushed changes when `session` commits
+    """
+    actor_id, source = _actor()
+    now = datetime.utcnow()
+    session.info.setdefault('audit_records', []).extend(
+        {
+            'occurred_at': now,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'changes': changes,
+            'actor_id': actor_id,
+            'source': source,
+        }
+        for entity_id, changes in changes_by_id.items()
+    )
+
+
+@event.listens_for(db.session, 'after_commit')
+def _enqueue(session):
+    records = session.info.pop('audit_records', None)
+    if records and 'audit' in current_app.extensions:
+        audit_writer().enqueue(records)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard(session, transaction):
+    # Whatever the outermost transaction did not commit never happened
+    if transaction.parent is None:
+        session.info.pop('audit_records', None)
+
+
+def query_audit_log(entity_type=None, entity_id=None, actor_id=None, action=None,
+                    since=None, until=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Audit records newest first, one page at a time: pass the last page's
+    ``next_before_id`` as ``before_id``. Returns (records, next_before_id).
+    """
+    query = AuditLog.query
+    if entity_type is not None:
+        query = query.filter(AuditLog.entity_type == entity_type)
+    if entity_id is not None:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if actor_id is not None:
+        query = query.filter(AuditLog.actor_id == actor_id)
+    if action is not None:
+        query = query.filter(AuditLog.action == action)
+    if since is not None:
+        query = query.filter(AuditLog.occurred_at >= since)
+    if until is not None:
+        query = query.filter(AuditLog.occurred_at <= until)
+    if before_id is not None:
+        query = query.filter(AuditLog.id < before_id)
+
+    rows = query.order_by(AuditLog.id.desc()).limit(limit + 1).all()
+    next_before_id = rows[limit - 1].id if len(rows) > limit else None
+    return [row.to_dict() for row in rows[:limit]], next_before_id
@@ -0,0 +1,92 @@
+"""
+User directory listings: keyset pagination and prefix search.
+
+Users are listed by case-insensitive username, then id. A page ends with an
+opaque cursor holding the last (username, id) returned; the next page starts
+strictly after it, so every page is an index range scan no matter how deep
+the client pages. ``q`` matches the start of the username or email, case
+insensitively, as a range over the ``lower(username)`` and ``lower(email)``
+indexes rather than a scan. Keys compare byte-wise (``lower_key``) so the
+range holds under any database collation, and the search term is lowercased
+by the same ``lower()`` as the keys: SQLite's folds only ASCII letters. The
+summary projection reads only the user columns, without roles and
+permissions.
+"""
+import base64
+import binascii
+import json
+from sqlalchemy import and_, literal, or_
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import User
+from app.models.user import lower_key
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+SUMMARY_COLUMNS = (User.id, User.username, User.email, User.team_id, User.role_id)
+
+_username_key = lower_key(User.username)
+_email_key = lower_key(User.email)
+
+# Sorts byte-wise after every other code point
+_MAX_CHAR = '\U0010ffff'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(username_key, user_id):
+    data = json.dumps([username_key, user_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        username_key, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(username_key), int(user_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def _prefix(key, prefix):
+    """
+    Rows whose `key` starts with `prefix` lowercased by the database, as an
+    index range
+    """
+    lower = lower_key(literal(prefix))
+    return and_(key >= lower, key < lower.concat(_MAX_CHAR))
+
+
+def list_users(criteria, q=None, cursor=None, limit=DEFAULT_PAGE_SIZE, summary=False):
+    """
+    One page of the users matching `criteria`; returns (user dicts, cursor of
+    the next page or None)
+    """
+    if summary:
+        query = db.session.query(*SUMMARY_COLUMNS, _username_key)
+    else:
+        query = db.session.query(User, _username_key).options(selectinload(User.role))
+    query = query.filter(*criteria)
+
+    if q:
+        query = query.filter(or_(_prefix(_username_key, q), _prefix(_email_key, q)))
+    if cursor:
+        after_key, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            _username_key > after_key,
+            and_(_username_key == after_key, User.id > after_id)
+        ))
+
+    rows = query.order_by(_username_key, User.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if summary:
+        users = [dict(zip(('id', 'username', 'email', 'team_id', 'role_id'), row[:-1]))
+                 for row in rows]
+    else:
+        users = [user.to_dict() for user, _ in rows]
+    next_cursor = encode_cursor(rows[-1][-1], users[-1]['id']) if has_more else None
+    return users, next_cursor
@@ -0,0 +1,235 @@
+"""
+Weight distribution statistics backed by per-day quantile sketches.
+
+Every waste entry is folded into a KLL sketch for its (team, waste_type, day)
+bucket when it is created. Percentiles and histograms over any date range are
+answered by merging the bucket sketches instead of sorting raw weights, so
+the cost depends on the number of days in the range rather than the number of
+entries. See ``app.utils.sketches`` for the error bound. Date ranges are
+resolved to whole days.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, exists, func, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import WasteEntry, WasteType, WeightSketch
+from app.services.team_hierarchy import subtree_scope
+from app.utils.sharding import fan_out, session_for_team
+from app.utils.sketches import KLLSketch
+
+QUANTILES = {'median': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+
+def _locked_bucket(session, team_id, waste_type, day):
+    return session.query(WeightSketch).filter_by(
+        team_id=team_id,
+        waste_type=waste_type,
+        day=day
+    ).with_for_update().first()
+
+
+def record_weight(entry, session=None):
+    """
+    Add a new entry's weight to the sketch of its (team, waste_type, day)
+    bucket. Runs inside the caller's transaction.
+    """
+    session = session or db.session
+    day = entry.timestamp.date()
+
+    bucket = _locked_bucket(session, entry.team_id, entry.waste_type, day)
+    if bucket is None:
+        try:
+            with session.begin_nested():
+                bucket = WeightSketch(
+                    team_id=entry.team_id,
+                    waste_type=entry.waste_type,
+                    day=day,
+                    data=KLLSketch().to_dict()
+                )
+                session.add(bucket)
+        except IntegrityError:
+            # Another transaction created the bucket first
+            bucket = _locked_bucket(session, entry.team_id, entry.waste_type, day)
+
+    sketch = KLLSketch.from_dict(bucket.data)
+    sketch.update(entry.weight)
+    bucket.data = sketch.to_dict()
+    bucket.entry_count = sketch.n
+
+
+def weight_distribution(start_date, end_date, team_id=None, waste_type=None,
+                        bins=10, include_subteams=False):
+    """
+    Median, p90, p99 and a histogram of entry weights per waste type, for one
+    team or (with `include_subteams`) its whole subtree
+    """
+    team_filter, keys = None, None
+    if team_id is not None and include_subteams:
+        team_filter, keys = subtree_scope(WeightSketch.team_id, team_id)
+    elif team_id is not None:
+        team_filter = WeightSketch.team_id == team_id
+
+    def bucket_sketches(session):
+        refresh_stale_sketches(session, start_date, end_date, team_filter)
+        query = session.query(WeightSketch.waste_type, WeightSketch.data).filter(
+            WeightSketch.day >= start_date.date(),
+            WeightSketch.day <= end_date.date()
+        )
+        if team_filter is not None:
+            query = query.filter(team_filter)
+        if waste_type is not None:
+            query = query.filter(WeightSketch.waste_type == waste_type)
+        return query.all()
+
+    if team_id is not None and not include_subteams:
+        shard_results = [bucket_sketches(session_for_team(team_id))]
+    else:
+        shard_results = fan_out(bucket_sketches, keys)
+
+    merged = defaultdict(KLLSketch)
+    for buckets in shard_results:
+        for bucket_type, data in buckets:
+            merged[bucket_type].merge(KLLSketch.from_dict(data))
+
+    return {
+        waste_type.value: _summarize(sketch, bins)
+        for waste_type, sketch in merged.items()
+    }
+
+
+def mark_sketches_stale(session, criteria, new_waste_type=None):
+    """
+    Flag the buckets of every entry matching ``criteria`` before a bulk edit
+    or delete. When the edit moves entries to ``new_waste_type`` the
+    destination buckets are flagged too, creating empty ones where needed.
+    Runs as set-based statements; no entries are loaded.
+    """
+    entry_day = func.date(WasteEntry.timestamp)
+    same_bucket = [
+        WasteEntry.team_id == WeightSketch.team_id,
+        entry_day == WeightSketch.day
+    ]
+
+    # Compared type by type: the two columns may be stored differently
+    # (see COMPACT_STORAGE)
+    same_type = or_(*(
+        and_(WasteEntry.waste_type == waste_type, WeightSketch.waste_type == waste_type)
+        for waste_type in WasteType
+    ))
+    session.execute(update(WeightSketch).where(exists().where(
+        *criteria, *same_bucket, same_type
+    )).values(stale=True))
+
+    if new_waste_type is None:
+        return
+
+    session.execute(update(WeightSketch).where(
+        WeightSketch.waste_type == new_waste_type,
+        exists().where(*criteria, *same_bucket)
+    ).values(stale=True))
+
+    now = datetime.utcnow()
+    existing = select(WeightSketch.id).where(
+        WeightSketch.team_id == WasteEntry.team_id,
+        WeightSketch.waste_type == new_waste_type,
+        WeightSketch.day == entry_day
+    )
+    missing = select(
+        WasteEntry.team_id,
+        literal(new_waste_type, WeightSketch.waste_type.type),
+        entry_day,
+        literal(KLLSketch().to_dict(), WeightSketch.data.type),
+        literal(0),
+        literal(True),
+        literal(now),
+        literal(now)
+    ).where(*criteria, ~existing.exists()).distinct()
+    session.execute(insert(WeightSketch).from_select(
+        ['team_id', 'waste_type', 'day', 'data', 'entry_count', 'stale',
+         'created_at', 'updated_at'],
+        missing
+    ))
+
+
+def refresh_stale_sketches(session, start_date, end_date, team_filter=None):
+    """
+    Rebuild flagged buckets in a date range (and matching `team_filter`, a
+    criterion on WeightSketch.team_id) from their raw entries
+    """
+    query = session.query(WeightSketch).filter(
+        WeightSketch.stale.is_(True),
+        WeightSketch.day >= start_date.date(),
+        WeightSketch.day <= end_date.date()
+    )
+    if team_filter is not None:
+        query = query.filter(team_filter)
+
+    buckets = query.all()
+    for bucket in buckets:
+        day_start = datetime.combine(bucket.day, time.min)
+        weights = session.query(WasteEntry.weight).filter(
+            WasteEntry.team_id == bucket.team_id,
+            WasteEntry.waste_type == bucket.waste_type,
+            WasteEntry.timestamp >= day_start,
+            WasteEntry.timestamp < day_start + timedelta(days=1)
+        )
+
+        sketch = KLLSketch()
+        for weight, in weights:
+            sketch.update(weight)
+
+        if sketch.n == 0:
+            session.delete(bucket)
+            continue
+        bucket.data = sketch.to_dict()
+        bucket.entry_count = sketch.n
+        bucket.stale = False
+
+    if buckets:
+        session.commit()
+
+
+def _summarize(sketch, bins):
+    values = sketch.quantiles(QUANTILES.values())
+    summary = {
+        'count': sketch.n,
+        'min': sketch.min,
+        'max': sketch.max,
+        'histogram': sketch.histogram(bins)
+    }
+    summary.update(zip(QUANTILES.keys(), values))
+    return summary
+
+
+def _rebuild_shard_sketches(session):
+    session.query(WeightSketch).delete(synchronize_session=False)
+
+    sketches = defaultdict(KLLSketch)
+    rows = session.query(
+        WasteEntry.team_id,
+        WasteEntry.waste_type,
+        WasteEntry.timestamp,
+        WasteEntry.weight
+    ).yield_per(1000)
+    for team_id, waste_type, timestamp, weight in rows:
+        sketches[(team_id, waste_type, timestamp.date())].update(weight)
+
+    session.add_all([
+        WeightSketch(
+            team_id=team_id,
+            waste_type=waste_type,
+            day=day,
+            data=sketch.to_dict(),
+            entry_count=sketch.n
+        )
+        for (team_id, waste_type, day), sketch in sketches.items()
+    ])
+    session.commit()
+
+
+def rebuild_weight_sketches():
+    """
+    Recreate every sketch from the raw entries (backfills and repairs)
+    """
+    fan_out(_rebuild_shard_sketches)
@@ -0,0 +1,165 @@
+"""
+Waste forecasts.
+
+The daily total weight per waste type over the last ``history_days`` is read
+with one grouped query into a (types x days) matrix. Every type is then fitted
+at once with a single least-squares solve of a linear trend plus day-of-week
+seasonality and projected over the horizon.
+
+Fitted coefficients are cached per team and keyed by the team's latest
+change-log id and the current day, so a forecast is only refitted after new
+entries land (or an edit/delete) or the day rolls over; cached requests only
+do the matrix product for the requested horizon.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import func
+from app.models import WasteChange, WasteEntry, WasteType
+from app.utils.sharding import session_for_team
+
+DEFAULT_HISTORY_DAYS = 182
+DEFAULT_HORIZON_DAYS = 30
+MAX_HORIZON_DAYS = 90
+CACHE_SIZE = 1024
+
+_WASTE_TYPES = list(WasteType)
+
+
+class _FitCache:
+    """
+    Bounded LRU of fitted models per team
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._fits = OrderedDict()
+
+    def get(self, team_id, version):
+        with self._lock:
+            cached = self._fits.get(team_id)
+            if cached is None or cached[0] != version:
+                return None
+            self._fits.move_to_end(team_id)
+            return cached[1]
+
+    def put(self, team_id, version, fit):
+        with self._lock:
+            self._fits[team_id] = (version, fit)
+            self._fits.move_to_end(team_id)
+            while len(self._fits) > self.size:
+                self._fits.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._fits.clear()
+
+
+_fit_cache = _FitCache()
+
+
+def _design(day_numbers, first_weekday):
+    """Intercept, linear trend and six day-of-week indicators per day"""
+    days = np.asarray(day_numbers)
+    weekdays = (first_weekday + days) % 7
+    return np.column_stack([
+        np.ones(len(days)),
+        days,
+        *(weekdays == weekday for weekday in range(1, 7))
+    ]).astype(float)
+
+
+def _daily_matrix(session, team_id, start, history_days):
+    rows = session.query(
+        WasteEntry.waste_type,
+        func.date(WasteEntry.timestamp),
+        func.sum(WasteEntry.weight)
+    ).filter(
+        WasteEntry.team_id == team_id,
+        WasteEntry.timestamp >= datetime.combine(start, datetime.min.time())
+    ).group_by(WasteEntry.waste_type, func.date(WasteEntry.timestamp)).all()
+
+    series = np.zeros((len(_WASTE_TYPES), history_days))
+    if not rows:
+        return series
+
+    type_index = np.array([_WASTE_TYPES.index(waste_type) for waste_type, _, _ in rows])
+    day_index = np.array([
+        ((day if isinstance(day, date) else date.fromisoformat(day)) - start).days
+        for _, day, _ in rows
+    ])
+    weights = np.array([float(weight) for _, _, weight in rows])
+    in_range = (day_index >= 0) & (day_index < history_days)
+    series[type_index[in_range], day_index[in_range]] = weights[in_range]
+    return series
+
+
+def _fit(session, team_id, today, history_days):
+    start = today - timedelta(days=history_days)
+    series = _daily_matrix(session, team_id, start, history_days)
+
+    # Only fit types with history, from the team's first logged day (earlier
+    # days are missing data, not zero waste); one solve covers all types
+    observed = series.any(axis=1)
+    if observed.any():
+        first_day = int(np.argmax(series.any(axis=0)))
+        design = _design(np.arange(first_day, history_days), start.weekday())
+        coefficients, *_ = np.linalg.lstsq(design, series[observed, first_day:].T, rcond=None)
+    else:
+        coefficients = np.zeros((_design([0], 0).shape[1], 0))
+
+    return {
+        'start': start,
+        'history_days': history_days,
+        'waste_types': [waste_type for waste_type, seen in zip(_WASTE_TYPES, observed) if seen],
+        'coefficients': coefficients,
+        'fitted_at': datetime.utcnow()
+    }
+
+
+def _team_version(session, team_id):
+    return session.query(func.max(WasteChange.id)).filter(
+        WasteChange.team_id == team_id
+    ).scalar()
+
+
+def forecast_waste(team_id, horizon_days=DEFAULT_HORIZON_DAYS, history_days=DEFAULT_HISTORY_DAYS,
+                   today=None):
+    """
+    Projected daily and total weight per waste type for the next
+    `horizon_days` days, starting today
+    """
+    session = session_for_team(team_id)
+    today = today or datetime.utcnow().date()
+    version = (_team_version(session, team_id), today, history_days)
+
+    fit = _fit_cache.get(team_id, version)
+    if fit is None:
+        fit = _fit(session, team_id, today, history_days)
+        _fit_cache.put(team_id, version, fit)
+
+    future = np.arange(history_days, history_days + horizon_days)
+    projected = np.clip(_design(future, fit['start'].weekday()) @ fit['coefficients'], 0, None)
+    projected = projected.reshape(horizon_days, len(fit['waste_types']))
+
+    by_type = [
+        {
+            'waste_type': waste_type.value,
+            'total_weight': round(float(projected[:, index].sum()), 3),
+            'daily': [round(float(value), 3) for value in projected[:, index]]
+        }
+        for index, waste_type in enumerate(fit['waste_types'])
+    ]
+
+    return {
+        'team_id': team_id,
+        'start_date': today.isoformat(),
+        'end_date': (today + timedelta(days=horizon_days - 1)).isoformat(),
+        'horizon_days': horizon_days,
+        'history_days': history_days,
+        'total_weight': round(sum(row['total_weight'] for row in by_type), 3),
+        'by_type': by_type,
+        'fitted_at': fit['fitted_at'].isoformat()
+    }
@@ -0,0 +1,62 @@
+"""
+Live analytics deltas for team dashboards.
+
+Dashboards subscribe to their team's channel over Server-Sent Events
+(``GET /api/waste/analytics/stream``), start from a full report and then
+apply one ``delta`` event (waste type, weight, count) per committed entry.
+Bulk edits and deletes, which change totals in ways a delta cannot describe,
+publish ``resync`` so clients fetch a fresh report.
+"""
+import json
+from app.utils.events import publish
+
+
+def team_channel(team_id):
+    return f'team:{team_id}'
+
+
+def publish_entry_created(entry):
+    """Announce a committed entry to its team's dashboards"""
+    publish(team_channel(entry.team_id), {
+        'event': 'delta',
+        'data': {
+            'team_id': entry.team_id,
+            'entry_id': entry.id,
+            'waste_type': entry.waste_type.value,
+            'weight': entry.weight,
+            'count': 1,
+            'timestamp': entry.timestamp.isoformat()
+        }
+    })
+
+
+def publish_resync(team_ids):
+    for team_id in team_ids:
+        publish(team_channel(team_id), {'event': 'resync', 'data': {'team_id': team_id}})
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def stream_events(subscription, initial, heartbeat_seconds):
+    """
+    SSE frames for one subscriber: the initial report, then deltas as they
+    arrive, with a comment line every `heartbeat_seconds` of silence so
+    proxies keep the connection open
+    """
+    try:
+        yield format_event('snapshot', initial)
+        while True:
+            event = subscription.get(timeout=heartbeat_seconds)
+            if subscription.lagging:
+                # Events were dropped; totals can only be recovered by refetching
+                subscription.lagging = False
+                subscription.drain()
+                yield format_event('resync', {'reason': 'lagging'})
+            elif event is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield format_event(event['event'], event['data'])
+    finally:
+        subscription.close()
@@ -0,0 +1,182 @@
+"""
+Bulk user provisioning.
+
+Validates a batch of user rows with a constant number of queries (one ``IN``
+lookup each for usernames, emails, roles and teams), hashes the passwords of
+the valid rows on a thread pool and inserts them in a single transaction.
+Rows that fail validation are reported individually and do not block the
+rest of the batch.
+
+Team reassignment moves any number of users with one UPDATE after validating
+the target team once.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import AuditLog, User, Role, Team
+from app.services.audit import record_bulk_changes
+
+DEFAULT_HASH_WORKERS = 4
+DEFAULT_ROLE_NAME = 'Employee'
+
+
+def _as_int(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def _row_error(index, row, message):
+    return {'row': index, 'username': row.get('username'), 'message': message}
+
+
+def provision_users(rows):
+    """
+    Create users from a list of dicts with username, email, password and
+    optional role_id / role (name) / team_id. Returns (created, errors).
+    """
+    errors = []
+    candidates = []
+    seen_usernames = set()
+    seen_emails = set()
+
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'username': None, 'message': 'Row must be an object'})
+            continue
+        if not row.get('username') or not row.get('email') or not row.get('password'):
+            errors.append(_row_error(index, row, 'Missing required fields'))
+            continue
+        if not all(isinstance(row[field], str) for field in ('username', 'email', 'password')):
+            errors.append(_row_error(index, row, 'username, email and password must be strings'))
+            continue
+        if row.get('role') and not isinstance(row['role'], str):
+            errors.append(_row_error(index, row, 'role must be a string'))
+            continue
+        try:
+            role_id = _as_int(row.get('role_id'))
+            team_id = _as_int(row.get('team_id'))
+        except (TypeError, ValueError):
+            errors.append(_row_error(index, row, 'role_id and team_id must be integers'))
+            continue
+        if row['username'] in seen_usernames:
+            errors.append(_row_error(index, row, 'Duplicate username in batch'))
+            continue
+        if row['email'] in seen_emails:
+            errors.append(_row_error(index, row, 'Duplicate email in batch'))
+            continue
+
+        seen_usernames.add(row['username'])
+        seen_emails.add(row['email'])
+        candidates.append((index, row, role_id, team_id))
+
+    # One query per lookup for the whole batch
+    taken_usernames = {
+        username for username, in db.session.query(User.username)
+        .filter(User.username.in_(seen_usernames))
+    }
+    taken_emails = {
+        email for email, in db.session.query(User.email)
+        .filter(User.email.in_(seen_emails))
+    }
+    role_ids = {role_id for _, _, role_id, _ in candidates if role_id}
+    role_names = {row['role'].lower() for _, row, role_id, _ in candidates
+                  if not role_id and row.get('role')}
+    role_names.add(DEFAULT_ROLE_NAME.lower())
+    roles = Role.query.filter(
+        db.or_(Role.id.in_(role_ids), db.func.lower(Role.name).in_(role_names))
+    ).all()
+    roles_by_id = {role.id: role for role in roles}
+    roles_by_name = {role.name.lower(): role for role in roles}
+    team_ids = {team_id for _, _, _, team_id in candidates if team_id}
+    existing_team_ids = {
+        team_id for team_id, in db.session.query(Team.id).filter(Team.id.in_(team_ids))
+    }
+
+    accepted = []
+    for index, row, role_id, team_id in candidates:
+        if row['username'] in taken_usernames:
+            errors.append(_row_error(index, row, 'Username already exists'))
+            continue
+        if row['email'] in taken_emails:
+            errors.append(_row_error(index, row, 'Email already exists'))
+            continue
+
+        if role_id:
+            role = roles_by_id.get(role_id)
+        else:
+            role = roles_by_name.get((row.get('role') or DEFAULT_ROLE_NAME).lower())
+        if role is None:
+            errors.append(_row_error(index, row, 'Invalid role'))
+            continue
+        if team_id and team_id not in existing_team_ids:
+            errors.append(_row_error(index, row, 'Invalid team'))
+            continue
+
+        accepted.append((row, role.id, team_id))
+
+    # Password hashing dominates the cost; hashlib releases the GIL
+    workers = current_app.config.get('BULK_HASH_WORKERS', DEFAULT_HASH_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashes = list(pool.map(generate_password_hash,
+                               [row['password'] for row, _, _ in accepted]))
+
+    users = [
+        User(
+            username=row['username'],
+            email=row['email'],
+            password_hash=password_hash,
+            role_id=role_id,
+            team_id=team_id
+        )
+        for (row, role_id, team_id), password_hash in zip(accepted, hashes)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+
+    created = [
+        {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'role_id': user.role_id,
+            'team_id': user.team_id
+        }
+        for user in users
+    ]
+    db.session.commit()
+
+    errors.sort(key=lambda error: error['row'])
+    return created, errors
+
+
+def reassign_team(team_id, user_ids=None, from_team_id=None):
+    """
+    Move the users in `user_ids`, or every member of `from_team_id`, to the
+    existing team `team_id` in one statement. Returns (moved user ids, ids of
+    users that do not exist).
+    """
+    if user_ids is not None:
+        scope = User.id.in_(user_ids)
+    else:
+        scope = User.team_id == from_team_id
+
+    # Current teams, for the audit log and to report unknown ids
+    current = dict(db.session.query(User.id, User.team_id).filter(scope))
+    missing = sorted(set(user_ids) - set(current)) if user_ids is not None else []
+    moved = sorted(user_id for user_id, old_team_id in current.items() if old_team_id != team_id)
+    if not moved:
+        return [], missing
+
+    db.session.query(User).filter(User.id.in_(moved)).update(
+        {User.team_id: team_id, User.updated_at: datetime.utcnow()},
+        synchronize_session='fetch'
+    )
+    record_bulk_changes(db.session, AuditLog.UPDATE, User.__tablename__, {
+        user_id: {'team_id': {'old': current[user_id], 'new': team_id}}
+        for user_id in moved
+    })
+    db.session.commit()
+    return moved, missing
@@ -0,0 +1,176 @@
+"""
+JWT revocation.
+
+Revoked token ids are persisted in ``revoked_tokens`` and mirrored in an
+in-process set that every request checks. The set is refreshed incrementally
+at most once every ``REVOCATION_REFRESH_SECONDS``, so deciding that a token is
+not revoked, the common case, needs no I/O. Revocations made by this process
+apply immediately; those made by other workers apply within one refresh
+interval.
+
+Ids are assigned at insert but become visible at commit, so concurrent
+revocations can appear out of id order. Each refresh therefore re-reads the
+last ``REFRESH_ID_WINDOW`` ids below the highest one seen, and the whole
+table is re-read every ``FULL_RELOAD_SECONDS`` in case a commit lagged
+further behind than that.
+
+Revoking a refresh token family (logout with a refresh token, or a reused
+refresh token) also records the family id itself, which access tokens carry
+in their ``fam`` claim: the access tokens already issued from the family are
+rejected until they would have expired.
+
+Entries are only needed until the token would have expired anyway;
+``compact_revoked_tokens`` (``flask tokens compact``) deletes expired rows
+and each refresh drops them from memory.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import select
+from app import db, jwt
+from app.models import RefreshToken, RevokedToken
+
+DEFAULT_REFRESH_SECONDS = 5
+FAMILY_TOKEN_TYPE = 'family'
+REFRESH_ID_WINDOW = 1000
+FULL_RELOAD_SECONDS = 300
+
+
+class RevocationList:
+    """
+    In-memory mirror of the revoked_tokens table
+    """
+
+    def __init__(self, refresh_interval=DEFAULT_REFRESH_SECONDS, id_window=REFRESH_ID_WINDOW,
+                 full_reload_interval=FULL_RELOAD_SECONDS):
+        self.refresh_interval = refresh_interval
+        self.id_window = id_window
+        self.full_reload_interval = full_reload_interval
+        self._lock = threading.Lock()
+        self._expiry = {}
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._next_full_reload = 0.0
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def add(self, jti, expires_at=None):
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def contains(self, jti):
+        if time.monotonic() >= self._next_refresh:
+            self.refresh()
+        return jti in self._expiry
+
+    def refresh(self, now=None):
+        """
+        Load revocations committed since the last refresh, including late
+        commits of lower ids, and drop expired ones
+        """
+        full = time.monotonic() >= self._next_full_reload
+        query = select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+        if not full:
+            query = query.where(RevokedToken.id > self._last_id - self.id_window)
+        rows = db.session.execute(query).all()
+        now = now or datetime.utcnow()
+        with self._lock:
+            if full:
+                self._next_full_reload = time.monotonic() + self.full_reload_interval
+            for row in rows:
+                self._expiry[row.jti] = row.expires_at
+                self._last_id = max(self._last_id, row.id)
+            for jti in [jti for jti, expires_at in self._expiry.items()
+                        if expires_at is not None and expires_at < now]:
+                del self._expiry[jti]
+            self._next_refresh = time.monotonic() + self.refresh_interval
+
+
+def init_revocation(app):
+    app.extensions['revocation_list'] = RevocationList(
+        app.config.get('REVOCATION_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+    )
+
+
+def _revocation_list():
+    return current_app.extensions['revocation_list']
+
+
+@jwt.token_in_blocklist_loader
+def _is_token_revoked(jwt_header, jwt_payload):
+    revocations = _revocation_list()
+    if revocations.contains(jwt_payload['jti']):
+        return True
+    return bool(jwt_payload.get('fam')) and revocations.contains(jwt_payload['fam'])
+
+
+def _access_expiry(now):
+    expires = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES')
+    if not expires:
+        return None
+    if not isinstance(expires, timedelta):
+        expires = timedelta(seconds=expires)
+    return now + expires
+
+
+def revoke_family(family_id, now=None):
+    """
+    Revoke every live refresh token of a family and, until they expire, the
+    access tokens issued from it. The caller commits.
+    """
+    now = now or datetime.utcnow()
+    revoked = RefreshToken.query.filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+
+    # The family issues no more access tokens, so the entry can go once the
+    # newest one has expired
+    expires_at = _access_expiry(now)
+    if not RevokedToken.query.filter_by(jti=family_id).first():
+        db.session.add(RevokedToken(jti=family_id, token_type=FAMILY_TOKEN_TYPE,
+                                    expires_at=expires_at))
+    _revocation_list().add(family_id, expires_at)
+    return revoked
+
+
+def revoke_token(jwt_payload):
+    """
+    Revoke a decoded token. Revoking a refresh token also revokes the rest of
+    its rotation family.
+    """
+    jti = jwt_payload['jti']
+    expires_at = None
+    if 'exp' in jwt_payload:
+        expires_at = datetime.fromtimestamp(jwt_payload['exp'], timezone.utc).replace(tzinfo=None)
+
+    if not RevokedToken.query.filter_by(jti=jti).first():
+        db.session.add(RevokedToken(
+            jti=jti,
+            token_type=jwt_payload.get('type', 'access'),
+            user_id=int(jwt_payload['sub']) if jwt_payload.get('sub') else None,
+            expires_at=expires_at
+        ))
+    if jwt_payload.get('fam') and jwt_payload.get('type') == 'refresh':
+        revoke_family(jwt_payload['fam'])
+    db.session.commit()
+
+    _revocation_list().add(jti, expires_at)
+
+
+def compact_revoked_tokens(now=None):
+    """
+    Delete revocations and refresh token records for tokens that have
+    expired. Returns the number of rows removed.
+    """
+    now = now or datetime.utcnow()
+    removed = RevokedToken.query.filter(
+        RevokedToken.expires_at < now
+    ).delete(synchronize_session=False)
+    removed += RefreshToken.query.filter(
+        RefreshToken.expires_at < now
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
@@ -0,0 +1,173 @@
+"""
+Personal waste analytics backed by per-user daily rollups.
+
+Every waste entry is added to the ``user_waste_rollups`` row for its
+(user, waste_type, day) bucket when it is created, in the same transaction
+and on the same shard. A user's report sums at most one row per type and day
+of the period, however many entries they have logged. Bulk edits and deletes
+recompute the buckets they touch (see ``app.services.waste_edits``). Periods
+are resolved to whole days.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, func, insert
+from sqlalchemy.exc import IntegrityError
+from app.models import WasteEntry, UserWasteRollup
+from app.services.analytics import PERIOD_DAYS
+from app.utils.sharding import fan_out
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def _locked_bucket(session, user_id, waste_type, day):
+    return session.query(UserWasteRollup).filter_by(
+        user_id=user_id,
+        waste_type=waste_type,
+        day=day
+    ).with_for_update().first()
+
+
+def record_rollup(session, entry):
+    """
+    Add a new entry to its user's (waste_type, day) rollup. Runs inside the
+    caller's transaction.
+    """
+    day = entry.timestamp.date()
+
+    bucket = _locked_bucket(session, entry.user_id, entry.waste_type, day)
+    if bucket is None:
+        try:
+            with session.begin_nested():
+                bucket = UserWasteRollup(entry.user_id, entry.waste_type, day)
+                session.add(bucket)
+        except IntegrityError:
+            # Another transaction created the bucket first
+            bucket = _locked_bucket(session, entry.user_id, entry.waste_type, day)
+
+    bucket.total_weight = (bucket.total_weight or 0.0) + float(entry.weight)
+    bucket.entry_count = (bucket.entry_count or 0) + 1
+
+
+def _as_date(value):
+    # SQLite returns date() as an ISO string
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def affected_buckets(session, criteria):
+    """
+    (user ids, days) of the entries matching ``criteria``; call before the
+    statement that changes them
+    """
+    entry_day = func.date(WasteEntry.timestamp)
+    rows = session.query(WasteEntry.user_id, entry_day).filter(*criteria).distinct().all()
+    return {user_id for user_id, _ in rows}, {_as_date(day) for _, day in rows}
+
+
+def recompute_rollups(session, user_ids, days):
+    """
+    Rebuild the rollups of ``user_ids`` on ``days`` from their entries. Every
+    type is recomputed, so buckets an edit moved entries into are covered too.
+    """
+    if not user_ids or not days:
+        return
+
+    entry_day = func.date(WasteEntry.timestamp)
+    session.execute(delete(UserWasteRollup).where(
+        UserWasteRollup.user_id.in_(user_ids),
+        UserWasteRollup.day.in_(days)
+    ))
+    # Aggregates pass through Python so waste types are stored the way the
+    # rollup column expects, whatever the entry storage layout
+    rows = session.query(
+        WasteEntry.user_id,
+        WasteEntry.waste_type,
+        entry_day,
+        func.sum(WasteEntry.weight),
+        func.count(WasteEntry.id)
+    ).filter(
+        WasteEntry.user_id.in_(user_ids),
+        entry_day.in_(days)
+    ).group_by(WasteEntry.user_id, WasteEntry.waste_type, entry_day).all()
+    _insert_rollups(session, rows)
+
+
+def _insert_rollups(session, rows):
+    values = [
+        {
+            'user_id': user_id,
+            'waste_type': waste_type,
+            'day': _as_date(day),
+            'total_weight': float(total_weight),
+            'entry_count': entry_count
+        }
+        for user_id, waste_type, day, total_weight, entry_count in rows
+    ]
+    for start in range(0, len(values), ROLLUP_BATCH_SIZE):
+        session.execute(insert(UserWasteRollup), values[start:start + ROLLUP_BATCH_SIZE])
+
+
+def _rebuild_shard_rollups(session):
+    entry_day = func.date(WasteEntry.timestamp)
+    session.query(UserWasteRollup).delete(synchronize_session=False)
+    rows = session.query(
+        WasteEntry.user_id,
+        WasteEntry.waste_type,
+        entry_day,
+        func.sum(WasteEntry.weight),
+        func.count(WasteEntry.id)
+    ).group_by(WasteEntry.user_id, WasteEntry.waste_type, entry_day).all()
+    _insert_rollups(session, rows)
+    session.commit()
+    return len(rows)
+
+
+def rebuild_user_rollups():
+    """
+    Recompute every user's rollups from the entries, e.g. after a bulk import;
+    returns the number of buckets written
+    """
+    return sum(fan_out(_rebuild_shard_rollups))
+
+
+def compute_user_analytics(user_id, period, waste_type=None, now=None):
+    """
+    Total weight and entry counts per waste type over a trailing period of
+    whole days for one user. A user's entries follow their team, so the
+    rollups of every shard are summed.
+    """
+    now = now or datetime.utcnow()
+    start_day = (now - timedelta(days=PERIOD_DAYS[period])).date()
+
+    def totals(session):
+        query = session.query(
+            UserWasteRollup.waste_type,
+            func.sum(UserWasteRollup.total_weight),
+            func.sum(UserWasteRollup.entry_count)
+        ).filter(
+            UserWasteRollup.user_id == user_id,
+            UserWasteRollup.day >= start_day
+        )
+        if waste_type is not None:
+            query = query.filter(UserWasteRollup.waste_type == waste_type)
+        return query.group_by(UserWasteRollup.waste_type).all()
+
+    weights = defaultdict(float)
+    counts = defaultdict(int)
+    for results in fan_out(totals):
+        for waste_type_enum, weight, count in results:
+            weights[waste_type_enum] += float(weight)
+            counts[waste_type_enum] += int(count)
+
+    return {
+        'user_id': user_id,
+        'period': period,
+        'start_date': start_day.isoformat(),
+        'end_date': now.isoformat(),
+        'total_entries': sum(counts.values()),
+        'total_weight': round(sum(weights.values()), 2),
+        'waste_by_type': {
+            waste_type_enum.value: round(weight, 2)
+            for waste_type_enum, weight in weights.items()
+        },
+        'generated_at': now.isoformat()
+    }
@@ -0,0 +1,141 @@
+"""
+Full-text search over waste entry descriptions.
+
+The index lives next to ``waste_entries`` on every database and is kept up
+to date by the database itself on every write:
+
+- SQLite: an external-content FTS5 table ``waste_entries_fts`` (porter
+  stemming) maintained by triggers; results are ranked by bm25.
+- PostgreSQL: a generated ``description_tsv`` column with a GIN index;
+  results are ranked by ``ts_rank``.
+
+The index is installed whenever ``waste_entries`` is created (``db
+create_all``, ``flask shards init``, ``flask storage compact``);
+``flask search rebuild`` installs it on existing databases and reindexes.
+A query matches entries containing every word, the last one as a prefix, so
+it works as you type. Lookups go through the index, so their cost follows
+the number of matches rather than the size of the table.
+"""
+import heapq
+import re
+from sqlalchemy import Table, column, event, func, literal_column, table, text
+from app.models import WasteEntry
+from app.utils.sharding import fan_out
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+MAX_SEARCH_TERMS = 16
+
+_WORD = re.compile(r'\w+')
+
+_SQLITE_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS waste_entries_fts USING fts5("
+    "description, content='waste_entries', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS waste_entries_fts_insert AFTER INSERT ON waste_entries BEGIN "
+    "INSERT INTO waste_entries_fts(rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS waste_entries_fts_delete AFTER DELETE ON waste_entries BEGIN "
+    "INSERT INTO waste_entries_fts(waste_entries_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS waste_entries_fts_update AFTER UPDATE OF description ON waste_entries BEGIN "
+    "INSERT INTO waste_entries_fts(waste_entries_fts, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO waste_entries_fts(rowid, description) VALUES (new.id, new.description); END",
+)
+
+_POSTGRES_INDEX = (
+    "ALTER TABLE waste_entries ADD COLUMN IF NOT EXISTS description_tsv tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_waste_entries_description_tsv "
+    "ON waste_entries USING GIN (description_tsv)",
+)
+
+_fts = table('waste_entries_fts', column('rowid'), column('rank'))
+
+
+class InvalidSearchQuery(Exception):
+    pass
+
+
+def install_search_index(conn):
+    """Create the index and its maintenance on one database, if missing"""
+    if conn.dialect.name == 'sqlite':
+        statements = _SQLITE_INDEX
+    elif conn.dialect.name == 'postgresql':
+        statements = _POSTGRES_INDEX
+    else:
+        return
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+@event.listens_for(Table, 'after_create')
+def _install_on_create(target, connection, **kw):
+    # Copies on shards are separate Table objects with the same name
+    if target.name == 'waste_entries':
+        install_search_index(connection)
+
+
+def _rebuild_shard_index(session):
+    conn = session.connection()
+    install_search_index(conn)
+    if conn.dialect.name == 'sqlite':
+        # The triggers only cover writes made after they were created
+        conn.execute(text("INSERT INTO waste_entries_fts(waste_entries_fts) VALUES ('rebuild')"))
+    session.commit()
+
+
+def rebuild_search_index():
+    """Install the index on every database and reindex existing entries"""
+    fan_out(_rebuild_shard_index)
+
+
+def parse_query(q):
+    terms = _WORD.findall((q or '').lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise InvalidSearchQuery("Search query must contain at least one word")
+    return terms
+
+
+def _ranked_query(session, terms, criteria):
+    """(entry, score) rows matching `terms`, best first; higher scores rank higher"""
+    dialect = session.connection().dialect.name
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        score = -_fts.c.rank  # bm25: lower is better
+        return session.query(WasteEntry, score).join(
+            _fts, _fts.c.rowid == WasteEntry.id
+        ).filter(
+            literal_column('waste_entries_fts').op('MATCH')(match), *criteria
+        ).order_by(_fts.c.rank, WasteEntry.id.desc())
+
+    tsquery = func.to_tsquery('english', ' & '.join(terms[:-1] + [f'{terms[-1]}:*']))
+    tsv = literal_column('waste_entries.description_tsv')
+    score = func.ts_rank(tsv, tsquery)
+    return session.query(WasteEntry, score).filter(
+        tsv.op('@@')(tsquery), *criteria
+    ).order_by(score.desc(), WasteEntry.id.desc())
+
+
+def search_entries(q, criteria, keys=None, page=1, per_page=DEFAULT_SEARCH_PAGE_SIZE):
+    """
+    One page of the entries matching `q` within `criteria`, best match first.
+    Each shard returns its best ``page * per_page`` matches, which are merged;
+    returns (entry dicts with their 'score', whether more matches exist).
+    """
+    terms = parse_query(q)
+    wanted = page * per_page + 1
+
+    def fetch(session):
+        return [
+            {**entry.to_dict(), 'score': float(score)}
+            for entry, score in _ranked_query(session, terms, criteria).limit(wanted)
+        ]
+
+    ranked = list(heapq.merge(
+        *fan_out(fetch, keys),
+        key=lambda entry: (entry['score'], entry['id']),
+        reverse=True
+    ))
+    start = (page - 1) * per_page
+    return ranked[start:start + per_page], len(ranked) > start + per_page
@@ -0,0 +1,111 @@
+"""
+Migration of waste_entries to the compact storage layout.
+
+The compact layout (``COMPACT_WASTE_STORAGE=true``, see
+``app.models.waste_entry``) stores the waste type as a smallint code, the
+weight as integer grams and moves ``created_at``/``updated_at`` to
+``waste_entry_audit``. ``migrate_to_compact_storage`` rewrites an existing
+database (and every shard) in place, one transaction per database:
+
+1. create ``waste_entries_compact`` and copy every row with INSERT ... SELECT
+2. swap it in for ``waste_entries``
+3. create ``waste_entry_audit`` from the old timestamps, drop the old table
+   and reattach the full-text search index
+
+Entry ids are preserved, so the change log, anomalies and clients' cached
+ids stay valid. Databases already in the compact layout are skipped.
+"""
+from sqlalchemy import (
+    Column, Integer, MetaData, String, Table, case, cast, func, insert, inspect, select, text
+)
+from app import db
+from app.models.waste_entry import COMPACT_STORAGE, WASTE_TYPE_CODES
+from app.services.search import install_search_index
+from app.utils.sharding import DEFAULT_SHARD, copy_shard_table, shard_keys
+
+
+class StorageLayoutError(Exception):
+    pass
+
+
+def _compact_tables(key):
+    """Copies of the compact tables to create on one database"""
+    metadata = MetaData()
+    if key is DEFAULT_SHARD:
+        # Stand-ins so the foreign keys resolve; never created
+        for name in ('users', 'teams', 'waste_entries'):
+            Table(name, metadata, Column('id', Integer, primary_key=True))
+        entries = db.metadata.tables['waste_entries'].to_metadata(
+            metadata, name='waste_entries_compact'
+        )
+        audit = db.metadata.tables['waste_entry_audit'].to_metadata(metadata)
+    else:
+        entries = copy_shard_table(db.metadata.tables['waste_entries'], metadata,
+                                   name='waste_entries_compact')
+        audit = copy_shard_table(db.metadata.tables['waste_entry_audit'], metadata)
+    return entries, audit
+
+
+def _migrate_database(key):
+    engine = db.engines[key]
+    inspector = inspect(engine)
+    if not inspector.has_table('waste_entries'):
+        return 0
+    if 'weight_g' in {column['name'] for column in inspector.get_columns('waste_entries')}:
+        return 0
+
+    entries, audit = _compact_tables(key)
+    with engine.begin() as conn:
+        legacy = Table('waste_entries', MetaData(), autoload_with=conn)
+        entries.create(conn)
+        type_code = case(
+            {waste_type.name: code for waste_type, code in WASTE_TYPE_CODES.items()},
+            value=cast(legacy.c.waste_type, String)
+        )
+        migrated = conn.execute(insert(entries).from_select(
+            ['id', 'description', 'timestamp', 'user_id', 'team_id', 'waste_type', 'weight_g'],
+            select(
+                legacy.c.id,
+                legacy.c.description,
+                legacy.c.timestamp,
+                legacy.c.user_id,
+                legacy.c.team_id,
+                type_code,
+                cast(func.round(legacy.c.weight * 1000), Integer)
+            )
+        )).rowcount
+
+        conn.execute(text('ALTER TABLE waste_entries RENAME TO waste_entries_legacy'))
+        conn.execute(text('ALTER TABLE waste_entries_compact RENAME TO waste_entries'))
+
+        renamed = Table('waste_entries_legacy', MetaData(), autoload_with=conn)
+        audit.create(conn)
+        conn.execute(insert(audit).from_select(
+            ['entry_id', 'created_at', 'updated_at'],
+            select(renamed.c.id, renamed.c.created_at, renamed.c.updated_at)
+        ))
+        conn.execute(text('DROP TABLE waste_entries_legacy'))
+        # The search triggers (or generated column) went with the old table;
+        # entry ids are unchanged, so the index itself stays valid
+        install_search_index(conn)
+
+        if conn.dialect.name == 'postgresql':
+            # The copied ids bypassed the new table's sequence
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('waste_entries', 'id'), "
+                "COALESCE(MAX(id), 1)) FROM waste_entries"
+            ))
+
+    return migrated
+
+
+def migrate_to_compact_storage():
+    """
+    Rewrite waste_entries in the compact layout on every database; returns
+    the number of entries migrated
+    """
+    if not COMPACT_STORAGE:
+        raise StorageLayoutError(
+            "Set COMPACT_WASTE_STORAGE=true to migrate to the compact layout"
+        )
+    return sum(_migrate_database(key) for key in shard_keys())
@@ -0,0 +1,241 @@
+"""
+Delta sync for offline clients.
+
+Every insert, update and delete of a waste entry appends a row to
+``waste_changes`` on the entry's shard. Clients pass back the opaque cursor
+from their previous sync and receive only the entries changed since then, as
+upserts (current entry state) and deletes (tombstoned entry ids), in pages of
+at most ``limit`` changes per shard. A resync therefore costs work
+proportional to the number of changes, not to the size of the history.
+
+The cursor records, per shard, the last change id delivered and the gaps
+below it: ids that were not visible when a page was read. Ids are assigned
+at insert but become visible at commit, so on databases with concurrent
+writers (PostgreSQL) a lower id can appear after a higher one was read.
+Only ids above the newest change older than ``commit_lag`` seconds can
+still be in flight (transactions are assumed to commit within that time),
+so only those become gaps, and a gap is forgotten ``commit_lag`` seconds
+after it was first seen. Each sync delivers the gaps that have since
+committed, then the next changes, at most ``limit`` in all. SQLite commits
+writers one at a time, in id order, so it needs no lag and has no gaps.
+"""
+import base64
+import binascii
+import json
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, literal, or_, select
+from app.models import WasteEntry, WasteChange
+from app.utils.sharding import fan_out, fan_out_by_key
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+DEFAULT_COMMIT_LAG_SECONDS = 30
+
+_DEFAULT_SHARD_NAME = 'default'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _gap_ranges(gaps):
+    """[[first id, last id, seen], ...] for runs of consecutive ids seen together"""
+    ranges = []
+    for change_id in sorted(gaps):
+        seen = gaps[change_id]
+        if ranges and ranges[-1][1] == change_id - 1 and ranges[-1][2] == seen:
+            ranges[-1][1] = change_id
+        else:
+            ranges.append([change_id, change_id, seen])
+    return ranges
+
+
+def encode_cursor(positions):
+    """
+    `positions` maps shard keys to (delivered change id, gaps), where gaps maps
+    missing change ids to when they were first seen missing (epoch seconds)
+    """
+    data = json.dumps(
+        {(key or _DEFAULT_SHARD_NAME): [delivered, _gap_ranges(gaps)]
+         for key, (delivered, gaps) in positions.items()},
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def _decode_position(position):
+    if not isinstance(position, list):
+        return int(position), {}  # Cursors issued before gaps were tracked
+    first, second = position
+    if not isinstance(second, list):
+        # (settled, delivered) cursors: everything unsettled is checked again
+        settled, delivered = int(first), int(second)
+        now = int(time.time())
+        return delivered, {change_id: now for change_id in range(settled + 1, delivered + 1)}
+    gaps = {}
+    for start, end, seen in second:
+        for change_id in range(int(start), int(end) + 1):
+            gaps[change_id] = int(seen)
+    return int(first), gaps
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {
+            None if key == _DEFAULT_SHARD_NAME else key: _decode_position(position)
+            for key, position in data.items()
+        }
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        raise InvalidCursor(cursor)
+
+
+def record_change(session, entry, operation=WasteChange.UPSERT):
+    """
+    Log a change to one entry in the caller's transaction (flushes to get its id)
+    """
+    if entry.id is None:
+        session.flush()
+    session.add(WasteChange(
+        entry_id=entry.id,
+        team_id=entry.team_id,
+        user_id=entry.user_id,
+        operation=operation
+    ))
+
+
+def record_changes(session, operation, *criteria):
+    """
+    Log a change for every entry matching ``criteria`` with one INSERT ... SELECT
+    """
+    rows = select(
+        WasteEntry.id,
+        WasteEntry.team_id,
+        WasteEntry.user_id,
+        literal(operation),
+        literal(datetime.utcnow())
+    ).where(*criteria)
+    session.execute(insert(WasteChange).from_select(
+        ['entry_id', 'team_id', 'user_id', 'operation', 'created_at'], rows
+    ))
+
+
+def backfill_changes():
+    """
+    Log an upsert for every entry created without one (e.g. seeded data)
+    """
+    def backfill(session):
+        logged = select(WasteChange.entry_id)
+        record_changes(session, WasteChange.UPSERT, WasteEntry.id.not_in(logged))
+        session.commit()
+
+    fan_out(backfill)
+
+
+def _commit_lag(session, commit_lag):
+    if commit_lag is not None:
+        return commit_lag
+    return 0 if session.get_bind().dialect.name == 'sqlite' else DEFAULT_COMMIT_LAG_SECONDS
+
+
+def changes_since(cursor, scope, keys=None, limit=DEFAULT_PAGE_SIZE, commit_lag=None):
+    """
+    Entries changed after ``cursor`` within ``scope`` (filters on WasteChange).
+    ``commit_lag`` (seconds) defaults to none on SQLite and
+    ``DEFAULT_COMMIT_LAG_SECONDS`` elsewhere.
+    """
+    positions = decode_cursor(cursor)
+
+    def page(key, session):
+        delivered, gaps = positions.get(key, (0, {}))
+        lag = _commit_lag(session, commit_lag)
+        now = int(time.time())
+
+        # Gaps that have committed since: delivered first, within the page size.
+        # The rest stay gaps until delivered or, if never committed, past the lag
+        late, still_missing = [], set()
+        if gaps:
+            in_gaps = or_(*(WasteChange.id.between(start, end)
+                            for start, end, _ in _gap_ranges(gaps)))
+            committed = {change_id for change_id, in session.query(WasteChange.id).filter(in_gaps)}
+            in_scope = session.query(WasteChange).filter(
+                in_gaps, *scope
+            ).order_by(WasteChange.id).all()
+            late = in_scope[:limit]
+            still_missing = {change.id for change in in_scope[limit:]}
+            gaps = {change_id: seen for change_id, seen in gaps.items()
+                    if change_id in still_missing
+                    or (change_id not in committed and seen + lag > now)}
+
+        room = limit - len(late)
+        new_changes = session.query(WasteChange).filter(
+            WasteChange.id > delivered, *scope
+        ).order_by(WasteChange.id).limit(room + 1).all()
+
+        has_more = len(new_changes) > room or bool(still_missing)
+        new_changes = new_changes[:room]
+        changes = late + new_changes
+
+        # Only the latest change per entry in this page matters
+        latest = {}
+        for change in changes:
+            latest[change.entry_id] = change.operation
+
+        upsert_ids = [entry_id for entry_id, operation in latest.items()
+                      if operation == WasteChange.UPSERT]
+        entries = []
+        if upsert_ids:
+            entries = [
+                entry.to_dict()
+                for entry in session.query(WasteEntry)
+                .filter(WasteEntry.id.in_(upsert_ids))
+                .order_by(WasteEntry.id)
+            ]
+        deletes = sorted(entry_id for entry_id, operation in latest.items()
+                         if operation == WasteChange.DELETE)
+
+        if new_changes:
+            last = new_changes[-1].id
+            if lag:
+                # A change still in flight was created within the lag, so after
+                # any change older than that: walk down from the newest id to the
+                # first old change, and ids missing on the way are gaps
+                cutoff = datetime.utcnow() - timedelta(seconds=lag)
+                rows = session.execute(
+                    select(WasteChange.id, WasteChange.created_at)
+                    .where(WasteChange.id > delivered, WasteChange.id <= last)
+                    .order_by(WasteChange.id.desc())
+                    .execution_options(yield_per=limit)
+                )
+                floor, visible = delivered, set()
+                for change_id, created_at in rows:
+                    if created_at <= cutoff:
+                        floor = change_id
+                        break
+                    visible.add(change_id)
+                rows.close()
+                gaps.update((change_id, now) for change_id in range(floor + 1, last + 1)
+                            if change_id not in visible)
+            delivered = last
+        return key, (delivered, gaps), entries, deletes, has_more
+
+    results = fan_out_by_key(page, keys)
+
+    next_positions = dict(positions)
+    upserts, deletes, has_more = [], [], False
+    for key, last, shard_entries, shard_deletes, shard_more in results:
+        next_positions[key] = last
+        upserts.extend(shard_entries)
+        deletes.extend(shard_deletes)
+        has_more = has_more or shard_more
+
+    return {
+        'upserts': upserts,
+        'deletes': deletes,
+        'next_cursor': encode_cursor(next_positions),
+        'has_more': has_more
+    }
@@ -0,0 +1,62 @@
+"""
+Team hierarchy queries.
+
+Teams may have a parent (site > department > team). ``team_closure`` holds
+every ancestor/descendant pair, so "this team and everything below it" is
+one indexed lookup on ``ancestor_id`` whatever the depth, and subtree
+aggregates over waste entries are a single query filtered by
+``team_id IN (SELECT descendant_id ...)``. With sharding the closure table
+stays on the default database, so the subtree is resolved to ids first and
+routed to the shards holding them.
+"""
+from app import db
+from app.models import Team, TeamClosure
+from app.utils.sharding import is_sharded, keys_for_teams
+
+
+def subtree_query(team_id):
+    return db.select(TeamClosure.descendant_id).where(TeamClosure.ancestor_id == team_id)
+
+
+def subtree_team_ids(team_id):
+    return list(db.session.scalars(subtree_query(team_id)))
+
+
+def in_subtree(ancestor_id, team_id):
+    """Whether `team_id` is `ancestor_id` or one of its descendants"""
+    if ancestor_id is None or team_id is None:
+        return False
+    if ancestor_id == team_id:
+        return True
+    return db.session.get(TeamClosure, (ancestor_id, team_id)) is not None
+
+
+def subtree_scope(column, team_id):
+    """
+    (criterion, shard keys) restricting `column` (a team id column of a
+    sharded table) to a team's subtree
+    """
+    if is_sharded():
+        team_ids = subtree_team_ids(team_id)
+        return column.in_(team_ids), keys_for_teams(team_ids)
+    return column.in_(subtree_query(team_id)), None
+
+
+def rebuild_team_closure():
+    """
+    Recreate the closure table from the parent links (backfills teams created
+    before the hierarchy existed); returns the number of pairs
+    """
+    parents = dict(db.session.query(Team.id, Team.parent_id))
+    rows = []
+    for team_id in parents:
+        ancestor, depth = team_id, 0
+        while ancestor is not None and depth <= len(parents):
+            rows.append({'ancestor_id': ancestor, 'descendant_id': team_id, 'depth': depth})
+            ancestor, depth = parents.get(ancestor), depth + 1
+
+    db.session.query(TeamClosure).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(db.insert(TeamClosure), rows)
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,93 @@
+"""
+Refresh token rotation.
+
+Login issues a short-lived access token together with a refresh token. The
+refresh endpoint exchanges a refresh token for a new pair without touching
+the password hash, so clients no longer re-post credentials when the access
+token expires.
+
+Every refresh token is recorded by its ``jti`` (unique index, so lookups are
+a single index probe) and belongs to a family started by one login. A token
+can be exchanged once; presenting an already rotated or revoked token means
+it was leaked, so the whole family is revoked and the client has to log in
+again. Access tokens carry their family id (``fam``) too, so revoking the
+family also blocks the access tokens already issued from it.
+"""
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from app import db
+from app.models import RefreshToken
+from app.services.revocation import revoke_family
+
+
+class InvalidRefreshToken(Exception):
+    pass
+
+
+class RefreshTokenReused(InvalidRefreshToken):
+    pass
+
+
+def _refresh_expiry(now):
+    expires = current_app.config.get('JWT_REFRESH_TOKEN_EXPIRES')
+    if not expires:
+        return None
+    if not isinstance(expires, timedelta):
+        expires = timedelta(seconds=expires)
+    return now + expires
+
+
+def issue_tokens(user_id, family_id=None):
+    """
+    Create an access/refresh token pair for a user. The refresh token starts
+    a new family unless `family_id` is given. The caller commits.
+    """
+    jti = str(uuid.uuid4())
+    family_id = family_id or str(uuid.uuid4())
+
+    access_token = create_access_token(
+        identity=str(user_id),
+        additional_claims={'fam': family_id}
+    )
+    refresh_token = create_refresh_token(
+        identity=str(user_id),
+        additional_claims={'jti': jti, 'fam': family_id}
+    )
+    db.session.add(RefreshToken(
+        jti=jti,
+        family_id=family_id,
+        user_id=user_id,
+        expires_at=_refresh_expiry(datetime.utcnow())
+    ))
+    return access_token, refresh_token
+
+
+def rotate_refresh_token(jti):
+    """
+    Exchange the refresh token `jti` for a new token pair in the same family.
+    Raises InvalidRefreshToken for unknown tokens and RefreshTokenReused
+    (after revoking the family) when the token was already used or revoked.
+    """
+    token = RefreshToken.query.filter_by(jti=jti).first()
+    if token is None:
+        raise InvalidRefreshToken(jti)
+
+    now = datetime.utcnow()
+    # Claim the token with a conditional update so two concurrent refreshes
+    # with the same token cannot both succeed
+    claimed = RefreshToken.query.filter(
+        RefreshToken.id == token.id,
+        RefreshToken.used_at.is_(None),
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.used_at: now}, synchronize_session=False)
+
+    if not claimed:
+        revoke_family(token.family_id, now)
+        db.session.commit()
+        raise RefreshTokenReused(jti)
+
+    tokens = issue_tokens(token.user_id, family_id=token.family_id)
+    db.session.commit()
+    return tokens
@@ -0,0 +1,100 @@
+"""
+Set-based bulk edits and deletes of waste entries.
+
+Each operation runs as one UPDATE or DELETE per shard, preceded by set-based
+statements that keep the derived data consistent: the sync change log
+(``INSERT ... SELECT``), the weight sketches of affected days (flagged for
+rebuild), the per-user rollups of affected users and days (recomputed) and the
+report snapshots of affected teams (dropped). The anomaly baselines of
+affected teams are recomputed from their remaining entries, so a corrected
+or deleted reading stops skewing them. Live dashboards of affected teams
+are told to resync once the changes commit. Entries are never loaded into
+Python.
+"""
+from sqlalchemy import delete, func, select, update
+from app import db
+from app.models import WasteEntry, WasteChange
+from app.models.waste_entry import COMPACT_STORAGE
+from app.services.analytics import invalidate_team_reports
+from app.services.anomalies import anomaly_detector, rebuild_team_stats
+from app.services.distribution import mark_sketches_stale
+from app.services.live import publish_resync
+from app.services.rollups import affected_buckets, recompute_rollups
+from app.services.sync import record_changes
+from app.utils.sharding import commit_shard_sessions, session_for_shard, shard_keys
+
+if COMPACT_STORAGE:
+    from app.models.waste_entry import WasteEntryAudit
+
+
+def count_entries(criteria, keys=None):
+    return sum(
+        session_for_shard(key).query(func.count(WasteEntry.id)).filter(*criteria).scalar()
+        for key in (shard_keys() if keys is None else keys)
+    )
+
+
+def _apply(criteria, keys, operation, statement):
+    affected = 0
+    team_ids = set()
+    for key in (shard_keys() if keys is None else keys):
+        session = session_for_shard(key)
+        shard_team_ids = [
+            team_id for team_id, in
+            session.query(WasteEntry.team_id).filter(*criteria).distinct()
+        ]
+        if not shard_team_ids:
+            continue
+
+        team_ids.update(shard_team_ids)
+        record_changes(session, operation, *criteria)
+        user_ids, days = affected_buckets(session, criteria)
+        affected += statement(session)
+        recompute_rollups(session, user_ids, days)
+        rebuild_team_stats(session, shard_team_ids)
+
+    invalidate_team_reports(team_ids)
+    commit_shard_sessions()
+    db.session.commit()
+    anomaly_detector().forget(team_ids)
+    publish_resync(team_ids)
+    return affected
+
+
+def bulk_update_entries(criteria, values, keys=None):
+    """
+    Apply ``values`` (column name -> value or SQL expression) to every entry
+    matching ``criteria``; returns the number of entries updated
+    """
+    values = dict(values)
+    updated_at = values.pop('updated_at', None) if COMPACT_STORAGE else None
+
+    def statement(session):
+        mark_sketches_stale(session, criteria, new_waste_type=values.get('waste_type'))
+        if updated_at is not None:
+            # Before the update, which may change what `criteria` match
+            session.execute(update(WasteEntryAudit).where(
+                WasteEntryAudit.entry_id.in_(select(WasteEntry.id).where(*criteria))
+            ).values(updated_at=updated_at))
+        return session.query(WasteEntry).filter(*criteria).update(
+            values, synchronize_session=False
+        )
+
+    return _apply(criteria, keys, WasteChange.UPSERT, statement)
+
+
+def bulk_delete_entries(criteria, keys=None):
+    """
+    Delete every entry matching ``criteria``; returns the number deleted
+    """
+    def statement(session):
+        mark_sketches_stale(session, criteria)
+        if COMPACT_STORAGE:
+            session.execute(delete(WasteEntryAudit).where(
+                WasteEntryAudit.entry_id.in_(select(WasteEntry.id).where(*criteria))
+            ))
+        return session.query(WasteEntry).filter(*criteria).delete(
+            synchronize_session=False
+        )
+
+    return _apply(criteria, keys, WasteChange.DELETE, statement)
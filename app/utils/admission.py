@@ -0,0 +1,166 @@
+"""
+Admission control by endpoint class.
+
+Every request is mapped to a priority class, first by endpoint name
+(``waste.create_waste_entry``) and then by blueprint name (``waste``), via
+``ENDPOINT_CLASSES`` merged with ``ADMISSION_CLASSES``. A class is admitted
+only while
+
+- its own in-flight count is below its limit (``ADMISSION_LIMITS``), and
+- the worker's total in-flight count is below its share of
+  ``ADMISSION_MAX_IN_FLIGHT``.
+
+Lower priority classes get smaller shares, so as a worker fills up analytics
+and exports are shed first and the remaining headroom is kept for ingestion.
+Rejected requests fail fast with ``429`` (class limit reached) or ``503``
+(worker saturated) and a ``Retry-After`` header instead of queueing.
+Counters are per process; ``GET /api/metrics/admission`` exposes them.
+"""
+import threading
+from flask import current_app, g, jsonify, request
+
+DEFAULT_MAX_IN_FLIGHT = 64
+DEFAULT_RETRY_AFTER = 1
+DEFAULT_CLASS = 'default'
+
+# Share of ADMISSION_MAX_IN_FLIGHT each class may fill, highest priority first
+CLASS_SHARES = {
+    'ingest': 1.0,
+    'default': 0.9,
+    'read': 0.75,
+    'analytics': 0.5,
+    'export': 0.5,
+}
+
+DEFAULT_LIMITS = {
+    'ingest': None,
+    'default': None,
+    'read': 32,
+    'analytics': 8,
+    'export': 4,
+}
+
+ENDPOINT_CLASSES = {
+    'waste.create_waste_entry': 'ingest',
+    'waste.get_waste_entries': 'read',
+    'waste.get_waste_analytics': 'analytics',
+    'waste.get_weight_distribution': 'analytics',
+    'waste.get_my_waste_analytics': 'analytics',
+    'waste.get_waste_forecast': 'analytics',
+    'waste.get_waste_anomalies': 'analytics',
+    # Holds its slot only while subscribing and computing the initial report:
+    # the stream itself runs outside the request, capped by EVENT_MAX_SUBSCRIBERS
+    'waste.stream_waste_analytics': 'analytics',
+    'waste.get_waste_changes': 'export',
+    'waste.bulk_update_waste_entries': 'export',
+    'waste.bulk_delete_waste_entries': 'export',
+    'users.bulk_create_users': 'export',
+}
+
+# Never shed: health and occupancy must stay observable under load
+EXEMPT_BLUEPRINTS = {'metrics'}
+
+
+class Rejected(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class AdmissionController:
+    """
+    Per-process in-flight counters for each priority class
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT, limits=None, classes=None):
+        self.max_in_flight = max_in_flight
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.classes = {**ENDPOINT_CLASSES, **(classes or {})}
+        self._lock = threading.Lock()
+        self._total = 0
+        self._in_flight = {name: 0 for name in CLASS_SHARES}
+        self._admitted = {name: 0 for name in CLASS_SHARES}
+        self._rejected = {name: 0 for name in CLASS_SHARES}
+
+    def class_for(self, endpoint, blueprint=None):
+        name = self.classes.get(endpoint) or self.classes.get(blueprint)
+        return name if name in CLASS_SHARES else DEFAULT_CLASS
+
+    def acquire(self, name):
+        """Admit one request of class `name` or raise Rejected"""
+        with self._lock:
+            limit = self.limits.get(name)
+            if limit is not None and self._in_flight[name] >= limit:
+                self._rejected[name] += 1
+                raise Rejected(429)
+            if self._total >= self.max_in_flight * CLASS_SHARES[name]:
+                self._rejected[name] += 1
+                raise Rejected(503)
+            self._total += 1
+            self._in_flight[name] += 1
+            self._admitted[name] += 1
+
+    def release(self, name):
+        with self._lock:
+            self._total -= 1
+            self._in_flight[name] -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'in_flight': self._total,
+                'max_in_flight': self.max_in_flight,
+                'utilization': round(self._total / self.max_in_flight, 4) if self.max_in_flight else None,
+                'classes': {
+                    name: {
+                        'in_flight': self._in_flight[name],
+                        'limit': self.limits.get(name),
+                        'capacity': int(self.max_in_flight * share),
+                        'admitted': self._admitted[name],
+                        'rejected': self._rejected[name],
+                    }
+                    for name, share in CLASS_SHARES.items()
+                }
+            }
+
+
+def init_admission(app):
+    app.extensions['admission'] = AdmissionController(
+        max_in_flight=app.config.get('ADMISSION_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT),
+        limits=app.config.get('ADMISSION_LIMITS'),
+        classes=app.config.get('ADMISSION_CLASSES')
+    )
+    app.before_request(_admit)
+    app.teardown_request(_release)
+
+
+def admission_controller():
+    return current_app.extensions['admission']
+
+
+def _admit():
+    if request.endpoint is None or request.blueprint in EXEMPT_BLUEPRINTS:
+        return None
+
+    controller = admission_controller()
+    name = controller.class_for(request.endpoint, request.blueprint)
+    try:
+        controller.acquire(name)
+    except Rejected as rejected:
+        message = ("Too many concurrent requests of this kind" if rejected.status == 429
+                   else "Server busy")
+        response = jsonify({"message": message})
+        response.status_code = rejected.status
+        response.headers['Retry-After'] = str(
+            current_app.config.get('ADMISSION_RETRY_AFTER', DEFAULT_RETRY_AFTER)
+        )
+        return response
+
+    g.admission_class = name
+    return None
+
+
+def _release(exc):
+    name = g.pop('admission_class', None)
+    if name is not None:
+        admission_controller().release(name)
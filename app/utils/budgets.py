@@ -0,0 +1,213 @@
+"""
+Per-endpoint statement timeouts and query budgets.
+
+``QUERY_BUDGETS`` (merged over ``DEFAULT_BUDGETS``) maps endpoint names to
+limits for one request:
+
+- ``timeout_ms``: wall-clock time the request's statements may run for.
+  Postgres enforces it with ``SET LOCAL statement_timeout`` (the remaining
+  time, applied once per transaction), SQLite with a progress handler that
+  interrupts the running statement once the deadline passes.
+- ``max_queries``: number of statements executed.
+- ``max_rows``: rows returned by ORM/session selects.
+
+Exceeding a budget aborts the request with ``422`` and the endpoint's
+``hint`` on how to narrow it. Budgets live in a context variable, so they
+also cover queries ``fan_out`` runs on other threads, and ``query_budget``
+applies one outside a request (e.g. in CLI commands).
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+DEFAULT_BUDGETS = {
+    'waste.get_waste_entries': {
+        'timeout_ms': 10000,
+        'max_rows': 50000,
+        'hint': 'Narrow start_date/end_date or filter by team_id or waste_type'
+    },
+    'waste.get_waste_analytics': {
+        'timeout_ms': 15000,
+        'hint': 'Filter by team_id or waste_type, or use a shorter period'
+    },
+    'waste.get_weight_distribution': {
+        'timeout_ms': 15000,
+        'hint': 'Filter by team_id or waste_type, or narrow start_date/end_date'
+    },
+    'waste.get_waste_changes': {
+        'timeout_ms': 15000,
+        'hint': 'Sync with a smaller limit'
+    },
+    'waste.get_my_waste_analytics': {
+        'timeout_ms': 10000,
+        'hint': 'Filter by waste_type or use a shorter period'
+    },
+    'waste.get_waste_forecast': {
+        'timeout_ms': 15000,
+        'hint': 'Forecast fewer days'
+    },
+    'waste.get_waste_anomalies': {
+        'timeout_ms': 10000,
+        'hint': 'Pass since or a smaller limit, or filter by team_id'
+    },
+}
+
+# SQLite VM instructions between deadline checks
+SQLITE_PROGRESS_STEPS = 1000
+
+_current_budget = contextvars.ContextVar('query_budget', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, message, hint=None):
+        super().__init__(message)
+        self.message = message
+        self.hint = hint
+
+
+class QueryBudget:
+    """
+    Limits and usage counters for one request
+    """
+
+    def __init__(self, timeout_ms=None, max_queries=None, max_rows=None, hint=None):
+        self.timeout_ms = timeout_ms
+        self.max_queries = max_queries
+        self.max_rows = max_rows
+        self.hint = hint
+        self.deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms is not None else None
+        self.queries = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining_ms(self):
+        return max(1, int((self.deadline - time.monotonic()) * 1000))
+
+    def count_query(self):
+        with self._lock:
+            self.queries += 1
+            queries = self.queries
+        if self.max_queries is not None and queries > self.max_queries:
+            raise QueryBudgetExceeded(
+                f"Query budget exceeded: more than {self.max_queries} queries", self.hint
+            )
+
+    def count_rows(self, count):
+        with self._lock:
+            self.rows += count
+            rows = self.rows
+        if self.max_rows is not None and rows > self.max_rows:
+            raise QueryBudgetExceeded(
+                f"Query budget exceeded: more than {self.max_rows} rows", self.hint
+            )
+
+
+def current_budget():
+    return _current_budget.get()
+
+
+@contextmanager
+def query_budget(**limits):
+    """Apply a QueryBudget to the statements run inside the block"""
+    token = _current_budget.set(QueryBudget(**limits))
+    try:
+        yield _current_budget.get()
+    finally:
+        _current_budget.reset(token)
+
+
+def init_budgets(app):
+    budgets = {**DEFAULT_BUDGETS}
+    for endpoint, limits in (app.config.get('QUERY_BUDGETS') or {}).items():
+        budgets[endpoint] = {**budgets.get(endpoint, {}), **limits}
+    app.extensions['query_budgets'] = budgets
+
+    app.before_request(_start_budget)
+    app.teardown_request(_end_budget)
+    app.register_error_handler(QueryBudgetExceeded, _budget_exceeded)
+    app.register_error_handler(OperationalError, _statement_failed)
+
+
+def _start_budget():
+    limits = current_app.extensions['query_budgets'].get(request.endpoint)
+    if limits:
+        g.query_budget_token = _current_budget.set(QueryBudget(**limits))
+
+
+def _end_budget(exc):
+    token = g.pop('query_budget_token', None)
+    if token is not None:
+        _current_budget.reset(token)
+
+
+def _budget_exceeded(error):
+    return jsonify({"message": error.message, "hint": error.hint}), 422
+
+
+def _statement_failed(error):
+    budget = current_budget()
+    if budget is None or not budget.expired():
+        raise error
+    return _budget_exceeded(QueryBudgetExceeded(
+        f"Query budget exceeded: statements ran longer than {budget.timeout_ms} ms", budget.hint
+    ))
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    budget = current_budget()
+    if budget is None:
+        return
+
+    budget.count_query()
+    if budget.deadline is None or conn.info.get('query_budget') is budget:
+        return
+
+    if conn.dialect.name == 'postgresql':
+        # Reverts at the end of the transaction
+        cursor.execute(f"SET LOCAL statement_timeout = {budget.remaining_ms()}")
+    elif conn.dialect.name == 'sqlite':
+        conn.connection.dbapi_connection.set_progress_handler(
+            lambda: budget.expired(), SQLITE_PROGRESS_STEPS
+        )
+    conn.info['query_budget'] = budget
+
+
+def _end_transaction(conn):
+    # SET LOCAL only lasts for the transaction; reapply in the next one
+    if conn.dialect.name == 'postgresql':
+        conn.info.pop('query_budget', None)
+
+
+event.listen(Engine, 'commit', _end_transaction)
+event.listen(Engine, 'rollback', _end_transaction)
+
+
+@event.listens_for(Pool, 'checkin')
+def _checkin(dbapi_connection, connection_record):
+    if connection_record.info.pop('query_budget', None) is not None and \
+            hasattr(dbapi_connection, 'set_progress_handler'):
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _count_rows(orm_execute_state):
+    budget = current_budget()
+    if budget is None or budget.max_rows is None or not orm_execute_state.is_select:
+        return None
+
+    # Buffer the result to count it; selects under a row budget are small
+    # enough to materialise by definition
+    frozen = orm_execute_state.invoke_statement().freeze()
+    budget.count_rows(len(frozen.data))
+    return frozen()
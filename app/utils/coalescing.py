@@ -0,0 +1,123 @@
+"""
+Coalescing of identical concurrent read requests.
+
+Views decorated with ``@coalesce(scope)`` (below their permission check)
+share one execution between concurrent requests for the same endpoint,
+arguments, ``Accept`` header and authorization scope within a worker: the
+first request runs the view, the others wait for it and are answered with a
+copy of its serialized response. Nothing is cached once the leader finishes;
+a request that arrives afterwards runs the view again.
+
+``scope`` returns what, besides the URL, the response depends on for the
+caller, e.g. ``team_scope`` for views filtered by the caller's team; use
+``shared_scope`` for views whose response is the same for every caller who
+passes the permission check. Set ``REQUEST_COALESCING=false`` to disable.
+``GET /api/metrics/coalescing`` reports executions and coalesced requests
+(executions saved) per endpoint.
+"""
+import threading
+from functools import wraps
+from flask import Response, current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from app import db
+from app.models import User
+from app.utils.singleflight import SingleFlight
+
+
+def shared_scope():
+    return None
+
+
+def team_scope():
+    """Callers see the same data when they agree on superuser status and team"""
+    user = db.session.get(User, int(get_jwt_identity()))
+    return (user.is_superuser, user.team_id)
+
+
+class _SharedResponse:
+    def __init__(self, response):
+        self.body = response.get_data()
+        self.status = response.status_code
+        self.headers = list(response.headers.items())
+
+    def to_response(self):
+        return Response(self.body, status=self.status, headers=self.headers)
+
+
+class RequestCoalescer:
+    """
+    Per-process single-flight of view executions, with counters per endpoint
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._executions = {}
+        self._coalesced = {}
+
+    def _count(self, counters, endpoint):
+        with self._lock:
+            counters[endpoint] = counters.get(endpoint, 0) + 1
+
+    def run(self, key, view):
+        """Response of `view` for this request, shared with concurrent identical ones"""
+        endpoint = key[0]
+        executed = []
+
+        def execute():
+            executed.append(True)
+            self._count(self._executions, endpoint)
+            return _SharedResponse(make_response(view()))
+
+        shared = self._flights.do(key, execute)
+        if not executed:
+            self._count(self._coalesced, endpoint)
+        return shared.to_response()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'endpoints': {
+                    endpoint: {
+                        'executions': executions,
+                        'coalesced': self._coalesced.get(endpoint, 0),
+                    }
+                    for endpoint, executions in sorted(self._executions.items())
+                }
+            }
+
+
+def init_coalescing(app):
+    app.extensions['coalescing'] = RequestCoalescer(
+        enabled=app.config.get('REQUEST_COALESCING', True)
+    )
+
+
+def request_coalescer():
+    return current_app.extensions['coalescing']
+
+
+def coalesce(scope=shared_scope):
+    """
+    Share one execution of the decorated GET view between identical
+    concurrent requests in the same `scope`
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            coalescer = request_coalescer()
+            if not coalescer.enabled or request.method != 'GET':
+                return fn(*args, **kwargs)
+
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                request.headers.get('Accept'),
+                scope(),
+            )
+            return coalescer.run(key, lambda: fn(*args, **kwargs))
+        return decorator
+    return wrapper
@@ -0,0 +1,135 @@
+"""
+In-process publish/subscribe for live dashboard events.
+
+Each worker has one ``EventHub`` holding bounded queues for the clients
+streaming from it. Events are published through a broker, which delivers them
+to the hub of every worker:
+
+- ``LocalBroker`` (default) hands events straight to this worker's hub, which
+  is enough for a single worker process.
+- Multi-worker deployments set ``EVENT_BROKER`` to the import path of a
+  broker class (``package.module:Class``) that relays events between workers,
+  e.g. over Redis pub/sub. It is constructed as ``Broker(app, deliver)`` and
+  must call ``deliver(channel, event)`` on every worker for each
+  ``publish(channel, event)``.
+
+A subscriber that falls more than ``EVENT_QUEUE_SIZE`` events behind is
+marked as lagging and its queue is dropped; the client is then told to
+resync instead of blocking publishers.
+"""
+import queue
+import threading
+from flask import current_app
+from werkzeug.utils import import_string
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_MAX_SUBSCRIBERS = 100
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscription:
+    def __init__(self, hub, channel, maxsize):
+        self.hub = hub
+        self.channel = channel
+        self.lagging = False
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.lagging = True
+            self.drain()
+
+    def get(self, timeout):
+        """The next event, or None if none arrived within `timeout` seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    Subscriptions of this worker's streaming clients, by channel
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, max_subscribers=DEFAULT_MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._count = 0
+
+    def subscribe(self, channel):
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscription = Subscription(self, channel, self.queue_size)
+            self._channels.setdefault(channel, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[subscription.channel]
+            self._count -= 1
+
+    def deliver(self, channel, event):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return self._count
+
+
+class LocalBroker:
+    """
+    Delivers events to this worker only
+    """
+
+    def __init__(self, app, deliver):
+        self.deliver = deliver
+
+    def publish(self, channel, event):
+        self.deliver(channel, event)
+
+
+def init_events(app):
+    hub = EventHub(
+        queue_size=app.config.get('EVENT_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+        max_subscribers=app.config.get('EVENT_MAX_SUBSCRIBERS', DEFAULT_MAX_SUBSCRIBERS)
+    )
+    broker_class = app.config.get('EVENT_BROKER') or LocalBroker
+    if isinstance(broker_class, str):
+        broker_class = import_string(broker_class.replace(':', '.'))
+    app.extensions['events'] = {'hub': hub, 'broker': broker_class(app, hub.deliver)}
+
+
+def event_hub():
+    return current_app.extensions['events']['hub']
+
+
+def publish(channel, event):
+    current_app.extensions['events']['broker'].publish(channel, event)
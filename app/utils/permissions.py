@@ -1,8 +1,23 @@
 from functools import wraps
 from flask import jsonify, request
 from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import lambda_stmt, select
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import User
+from app.models import Role, User
+
+
+def load_user(user_id):
+    """
+    The user with their role and its permissions, in one cached statement.
+    Later ``db.session.get(User, ...)`` calls in the request hit the identity
+    map only when given the id as an int, not the JWT identity string
+    """
+    user_id = int(user_id)
+    statement = lambda_stmt(lambda: select(User).where(User.id == user_id).options(
+        joinedload(User.role).joinedload(Role.permissions)
+    ))
+    return db.session.execute(statement).unique().scalar_one_or_none()
 
 
 def permission_required(permission_code):
@@ -14,7 +29,7 @@ def permission_required(permission_code):
         @jwt_required()
         def decorator(*args, **kwargs):
             user_id = get_jwt_identity()
-            user = db.session.get(User, user_id)
+            user = load_user(user_id)
             
             if not user:
                 return jsonify(message="Authentication required"), 401
@@ -36,7 +51,7 @@ def admin_required():
         @jwt_required()
         def decorator(*args, **kwargs):
             user_id = get_jwt_identity()
-            user = db.session.get(User, user_id)
+            user = load_user(user_id)
             
             if not user or not user.is_superuser:
                 return jsonify(message="Admin access required"), 403
@@ -58,7 +73,7 @@ def team_access_required(team_id_param='team_id'):
         @jwt_required()
         def decorator(*args, **kwargs):
             user_id = get_jwt_identity()
-            user = db.session.get(User, user_id)
+            user = load_user(user_id)
             
             if not user:
                 return jsonify(message="Authentication required"), 401
@@ -0,0 +1,139 @@
+"""
+Minimal in-process job scheduler driven by cron expressions.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# (min, max) for minute, hour, day of month, month, day of week (0 = Sunday)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _parse_field(field, low, high):
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(value) for value in part.split('-'))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Standard five-field cron expression ("minute hour dom month dow"),
+    evaluated in UTC
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression: {expression}")
+        self.expression = expression
+        (self.minutes, self.hours, self.days, self.months,
+         self.weekdays) = [
+            _parse_field(field, low, high)
+            for field, (low, high) in zip(fields, CRON_FIELDS)
+        ]
+        # As in cron, a restricted day of month OR day of week is enough
+        self._either_day = fields[2] != '*' and fields[4] != '*'
+
+    def _day_matches(self, moment):
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._either_day:
+            return in_days or in_weekdays
+        return in_days and in_weekdays
+
+    def matches(self, moment):
+        return (
+            moment.minute in self.minutes and
+            moment.hour in self.hours and
+            moment.month in self.months and
+            self._day_matches(moment)
+        )
+
+    def next_after(self, moment):
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Any valid expression fires at least once every four years
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) +
+                             timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never fires: {self.expression}")
+
+
+class _Job:
+    def __init__(self, name, schedule, func):
+        self.name = name
+        self.schedule = schedule
+        self.func = func
+        self.next_run = schedule.next_after(datetime.utcnow())
+
+
+class Scheduler:
+    """
+    Runs registered jobs inside an application context on a background thread
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, expression, func):
+        self.jobs.append(_Job(name, CronSchedule(expression), func))
+
+    def run_pending(self, now=None):
+        now = now or datetime.utcnow()
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            try:
+                with self.app.app_context():
+                    job.func()
+            except Exception:
+                logger.exception("Scheduled job %s failed", job.name)
+            job.next_run = job.schedule.next_after(now)
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            next_run = min((job.next_run for job in self.jobs), default=None)
+            timeout = 60.0
+            if next_run is not None:
+                timeout = max((next_run - datetime.utcnow()).total_seconds(), 0)
+            self._stop.wait(timeout)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self.run_forever, name='wasteer-scheduler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
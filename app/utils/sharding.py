@@ -0,0 +1,168 @@
+"""
+Team-keyed sharding of waste data.
+
+Waste entries and the per-team data derived from them (``SHARDED_TABLES``)
+can live on separate databases. ``WASTE_SHARDS`` maps bind keys from
+``SQLALCHEMY_BINDS`` to the team ids stored there; every other team stays on
+the default database:
+
+    SQLALCHEMY_BINDS = {'large_a': 'postgresql://...', 'large_b': 'sqlite:///b.db'}
+    WASTE_SHARDS = {'large_a': [4, 17], 'large_b': [23]}
+
+``session_for_team`` returns the session to use for one team's rows and
+``fan_out`` runs a function against every shard in parallel for cross-team
+queries. Without ``WASTE_SHARDS`` everything resolves to ``db.session``.
+Shard databases hold copies of the sharded tables without foreign keys (the
+referenced users and teams live on the default database); create them with
+``flask shards init``.
+"""
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, g
+from sqlalchemy import MetaData
+from sqlalchemy.orm import Session
+from app import db
+
+DEFAULT_SHARD = None
+# Tables missing from the metadata (e.g. waste_entry_audit outside the compact
+# storage layout) are skipped
+SHARDED_TABLES = ('waste_entries', 'waste_entry_audit', 'weight_sketches', 'waste_changes',
+                  'weight_stats', 'waste_anomalies', 'user_waste_rollups')
+
+
+class ShardRouter:
+    """
+    Maps team ids to bind keys
+    """
+
+    def __init__(self, shards):
+        self.shards = list(shards)
+        self.team_shards = {
+            int(team_id): key
+            for key, team_ids in shards.items()
+            for team_id in team_ids
+        }
+
+    @property
+    def keys(self):
+        return [DEFAULT_SHARD] + self.shards
+
+    def key_for_team(self, team_id):
+        return self.team_shards.get(team_id, DEFAULT_SHARD)
+
+
+def init_sharding(app):
+    app.extensions['shard_router'] = ShardRouter(app.config.get('WASTE_SHARDS') or {})
+    app.teardown_appcontext(_close_shard_sessions)
+
+
+def _router():
+    return current_app.extensions['shard_router']
+
+
+def _engine(key):
+    return db.engines[key]
+
+
+def _close_shard_sessions(exception=None):
+    sessions = g.pop('shard_sessions', {})
+    for session in sessions.values():
+        session.close()
+
+
+def is_sharded():
+    return bool(_router().shards)
+
+
+def shard_keys():
+    return _router().keys
+
+
+def session_for_shard(key):
+    """
+    Session for a shard, shared for the rest of the application context
+    """
+    if key is DEFAULT_SHARD:
+        return db.session
+
+    sessions = g.setdefault('shard_sessions', {})
+    if key not in sessions:
+        sessions[key] = Session(bind=_engine(key))
+    return sessions[key]
+
+
+def session_for_team(team_id):
+    return session_for_shard(_router().key_for_team(team_id))
+
+
+def keys_for_teams(team_ids):
+    router = _router()
+    return sorted({router.key_for_team(team_id) for team_id in team_ids},
+                  key=lambda key: key or '')
+
+
+def fan_out(fn, keys=None):
+    """
+    Call ``fn(session)`` once per shard and return the results in shard order.
+
+    With more than one shard the calls run in parallel, each on its own
+    short-lived session, so ``fn`` should return plain data rather than ORM
+    objects.
+    """
+    return fan_out_by_key(lambda key, session: fn(session), keys)
+
+
+def fan_out_by_key(fn, keys=None):
+    """
+    Like ``fan_out`` but calls ``fn(key, session)``
+    """
+    keys = shard_keys() if keys is None else list(keys)
+    if len(keys) == 1:
+        return [fn(keys[0], session_for_shard(keys[0]))]
+
+    app = current_app._get_current_object()
+    engines = {key: _engine(key) for key in keys}
+
+    def run(key):
+        with app.app_context():
+            with Session(bind=engines[key]) as session:
+                return fn(key, session)
+
+    # Carry context variables (e.g. the request's query budget) to the workers
+    contexts = {key: contextvars.copy_context() for key in keys}
+    with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+        return list(pool.map(lambda key: contexts[key].run(run, key), keys))
+
+
+def commit_shard_sessions():
+    """
+    Commit any shard sessions opened during this request
+    """
+    for session in g.get('shard_sessions', {}).values():
+        session.commit()
+
+
+def create_shard_tables():
+    """
+    Create the sharded tables on every shard database
+    """
+    for key in _router().shards:
+        metadata = MetaData()
+        for name in SHARDED_TABLES:
+            if name in db.metadata.tables:
+                copy_shard_table(db.metadata.tables[name], metadata)
+        metadata.create_all(_engine(key))
+
+
+def copy_shard_table(table, metadata, name=None):
+    """
+    Copy a table into `metadata` without its foreign keys; the referenced
+    users and teams tables are not on the shard
+    """
+    table = table.to_metadata(metadata, name=name)
+    for constraint in list(table.foreign_key_constraints):
+        table.constraints.discard(constraint)
+    table.foreign_keys.clear()
+    for column in table.columns:
+        column.foreign_keys.clear()
+    return table
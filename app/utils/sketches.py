@@ -0,0 +1,168 @@
+"""
+Mergeable quantile sketches.
+
+Implements the KLL sketch (Karnin, Lang & Liberty, "Optimal Quantile
+Approximation in Streams", 2016). A sketch keeps a small, bounded sample of
+the values it has seen, organised into levels where every item on level
+``h`` stands for ``2 ** h`` original values. Sketches built independently
+(for example one per team, waste type and day) can be merged into a sketch
+of the union without revisiting the raw values.
+
+Error bound: with the default ``k=200`` the rank of any value returned by
+``quantile`` is within about 1.65% of the requested rank (e.g. the reported
+p90 lies somewhere between the true p88.35 and p91.65) with 99% confidence.
+The bound does not depend on how many values were added or how many sketches
+were merged. A sketch that has seen fewer than ``k`` values is exact.
+"""
+import math
+import random
+
+DEFAULT_K = 200
+# Normalised rank error for DEFAULT_K at 99% confidence
+DEFAULT_RANK_ERROR = 0.0165
+
+_CAPACITY_DECAY = 2 / 3
+_MIN_CAPACITY = 8
+
+
+class KLLSketch:
+    """
+    Quantile sketch over a stream of floats
+    """
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(_MIN_CAPACITY, int(math.ceil(self.k * _CAPACITY_DECAY ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) < self._capacity(level):
+                level += 1
+                continue
+
+            if level + 1 == len(self.levels):
+                self.levels.append([])
+
+            items.sort()
+            # With an odd number of items one stays behind on this level
+            keep = [items.pop()] if len(items) % 2 else []
+            offset = random.getrandbits(1)
+            self.levels[level + 1].extend(items[offset::2])
+            self.levels[level] = keep
+
+            # Adding a level shrinks the capacity of every level below it
+            level = 0
+
+    def update(self, value):
+        value = float(value)
+        self.levels[0].append(value)
+        self.n += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self._compress()
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+
+        self.n += other.n
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        weighted = [
+            (value, 1 << level)
+            for level, items in enumerate(self.levels)
+            for value in items
+        ]
+        weighted.sort()
+        return weighted
+
+    def quantiles(self, fractions):
+        """
+        Estimate the values at the given fractions (0.0 - 1.0) of the distribution
+        """
+        if self.n == 0:
+            return [None for _ in fractions]
+
+        weighted = self._weighted_items()
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for fraction in fractions:
+            if fraction <= 0:
+                results.append(self.min)
+                continue
+            if fraction >= 1:
+                results.append(self.max)
+                continue
+
+            target = fraction * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+        return results
+
+    def quantile(self, fraction):
+        return self.quantiles([fraction])[0]
+
+    def histogram(self, bins=10):
+        """
+        Estimate counts for ``bins`` equal-width buckets between min and max
+        """
+        if self.n == 0:
+            return []
+
+        width = (self.max - self.min) / bins
+        if width == 0:
+            return [{'lower': self.min, 'upper': self.max, 'count': self.n}]
+
+        counts = [0] * bins
+        for value, weight in self._weighted_items():
+            index = min(int((value - self.min) / width), bins - 1)
+            counts[index] += weight
+
+        return [
+            {
+                'lower': self.min + i * width,
+                'upper': self.min + (i + 1) * width,
+                'count': count
+            }
+            for i, count in enumerate(counts)
+        ]
+
+    def to_dict(self):
+        return {
+            'k': self.k,
+            'n': self.n,
+            'min': self.min,
+            'max': self.max,
+            'levels': self.levels
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(k=data['k'])
+        sketch.n = data['n']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        sketch.levels = [list(items) for items in data['levels']] or [[]]
+        return sketch
@@ -0,0 +1,62 @@
+"""
+Compiled statement cache statistics.
+
+SQLAlchemy reuses the compiled SQL of a statement whose cache key it has seen
+before. Hot queries are written as lambda statements (``lambda_stmt``), whose
+cache key comes from the lambdas' code locations, so a repeat request skips
+building the statement, computing its key and compiling it; only the values
+of the closure variables are extracted as bound parameters.
+
+Every statement executed by this process is counted as a cache ``hit``,
+``miss`` (compiled and now cached) or ``uncached`` (DDL, raw SQL strings and
+other statements SQLAlchemy does not cache). ``GET /api/metrics/statements``
+reports the counts and hit rate.
+"""
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.interfaces import CacheStats
+
+
+class StatementCacheStats:
+    """
+    Process-wide counts of compiled cache outcomes
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def record(self, context):
+        with self._lock:
+            if context.cache_hit == CacheStats.CACHE_HIT:
+                self.hits += 1
+            elif context.cache_hit == CacheStats.CACHE_MISS:
+                self.misses += 1
+            else:
+                self.uncached += 1
+
+    def snapshot(self):
+        with self._lock:
+            cached = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'uncached': self.uncached,
+                'hit_rate': round(self.hits / cached, 4) if cached else None,
+            }
+
+
+_stats = StatementCacheStats()
+
+
+def statement_cache_stats():
+    return _stats
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_cache_outcome(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        _stats.record(context)
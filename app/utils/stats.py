@@ -0,0 +1,57 @@
+"""
+Streaming mean and variance.
+
+``RunningStats`` implements Welford's online algorithm: each update is O(1)
+and numerically stable, and two summaries built independently (e.g. by
+different workers) can be combined exactly with the parallel formula of
+Chan, Golub & LeVeque.
+"""
+import math
+
+
+class RunningStats:
+    """
+    Count, mean and sum of squared deviations of a stream of floats
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        """Combine with another summary in place"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return self
+
+    def copy(self):
+        return RunningStats(self.count, self.mean, self.m2)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def z_score(self, value):
+        stddev = self.stddev
+        if stddev == 0:
+            return 0.0 if value == self.mean else math.inf
+        return (value - self.mean) / stddev
@@ -0,0 +1,50 @@
+"""
+Wire format negotiation for the waste endpoints.
+
+JSON is the default. Clients on slow links or with little CPU (weighing
+terminals) can instead send MessagePack bodies (``Content-Type:
+application/msgpack``) and ask for MessagePack responses (``Accept:
+application/msgpack``); the payloads are the same documents in either
+encoding. ``benchmarks/wire.py`` compares the two.
+"""
+import msgpack
+from flask import Response, jsonify, request
+from werkzeug.exceptions import BadRequest
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+# Also seen in the wild before application/msgpack was registered
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack', 'application/vnd.msgpack')
+
+
+def wants_msgpack():
+    best = request.accept_mimetypes.best_match(
+        [JSON_MIMETYPE, *MSGPACK_MIMETYPES], default=JSON_MIMETYPE
+    )
+    return best in MSGPACK_MIMETYPES
+
+
+def request_data():
+    """
+    The decoded JSON or MessagePack request body, or None if the request has
+    neither content type
+    """
+    if request.mimetype in MSGPACK_MIMETYPES:
+        try:
+            return msgpack.unpackb(request.get_data(cache=False), raw=False)
+        except (ValueError, msgpack.UnpackException):
+            raise BadRequest("Failed to decode MessagePack body")
+    if request.is_json:
+        return request.json
+    return None
+
+
+def respond(payload, status=200):
+    """`payload` encoded as the client asked, JSON unless it accepts MessagePack"""
+    if wants_msgpack():
+        response = Response(msgpack.packb(payload), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(payload)
+    response.status_code = status
+    response.vary.add('Accept')
+    return response
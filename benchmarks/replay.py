@@ -0,0 +1,468 @@
+"""
+Load replay harness: weighted, parameterised traffic against a local app.
+
+Builds a workload from the Postman collection (``postman.json``) or from a
+captured access log, seeds a fresh local SQLite database with ``seed.py``,
+logs in as the seeded users of each role and drives the Flask app in-process
+at a target request rate:
+
+- Workload: one template per collection request (``Login`` and ``Register
+  User`` are left out; the harness logs in itself), weighted ``--get-weight`` for
+  reads and 1 for writes unless ``--weight NAME=W`` says otherwise. A log
+  (``--log``, JSON lines with ``method``/``path`` or Common/Combined Log
+  Format) weights each endpoint by how often it was seen and replays the
+  observed paths and query strings; bodies come from the collection request
+  for the same endpoint.
+- Parameters: ``team_id`` (query, body and ``/teams/<id>`` paths) is the
+  caller's team, or any team for admins (added to their request bodies, as
+  admins must name one); ``waste_type``, ``weight`` and
+  ``period`` are drawn at random, team ``name`` values are made unique, and
+  disabled collection query parameters are sent with probability
+  ``--optional-params``.
+- Roles: requests are spread over ``--roles`` (e.g. ``admin=1,manager=3,
+  employee=6``); a role is only sent the endpoints its users may call, found
+  by probing each endpoint once per role before the run.
+- Load: open loop. Requests are scheduled ``1/--rps`` apart for
+  ``--duration`` seconds and run by ``--concurrency`` threads; latency is
+  measured from the scheduled time, so queueing behind a slow request is
+  counted rather than hidden.
+
+Latency percentiles (p50/p95/p99/max, in ms) and status counts per endpoint
+are printed, with the p95 change against the last recorded run of the same
+workload, and appended to ``benchmarks/results/replay.jsonl``.
+
+Usage:
+    python benchmarks/replay.py [--collection postman.json | --log access.log]
+        [--rps 50] [--duration 30] [--concurrency 8] [--roles admin=1,manager=3,employee=6]
+        [--weight "Get Waste Analytics=5"] [--optional-params 0.3] [--seed 42] [--no-record]
+"""
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import platform
+import queue
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'replay.jsonl')
+
+sys.path.insert(0, ROOT)
+from app import create_app, db  # noqa: E402
+from app.models import Team, User, WasteType  # noqa: E402
+from seed import seed_database  # noqa: E402
+
+# Accounts created by seed.py
+SEEDED_USERS = {
+    'admin': [('admin', 'adminpassword')],
+    'manager': [('eng_manager', 'managerpassword'), ('mkt_manager', 'managerpassword'),
+                ('ops_manager', 'managerpassword')],
+    'employee': [('eng_employee1', 'employeepassword'), ('eng_employee2', 'employeepassword'),
+                 ('mkt_employee', 'employeepassword'), ('ops_employee', 'employeepassword')],
+}
+EXCLUDED_REQUESTS = {'Login', 'Register User'}
+PERIODS = ('week', 'month', 'year')
+LOG_LINE = re.compile(r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+" (?P<status>\d{3})')
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+class Template:
+    """
+    One kind of request in the workload
+    """
+
+    def __init__(self, name, method, path, weight=1.0, query=(), body=None, paths=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.weight = weight
+        # (key, value, optional) as in the collection
+        self.query = list(query)
+        self.body = body
+        # Observed path and query strings, replayed as they are
+        self.paths = paths
+
+
+def _collection_templates(path, get_weight):
+    with open(path) as collection:
+        items = json.load(collection)['item']
+
+    templates = []
+    stack = list(reversed(items))
+    while stack:
+        item = stack.pop()
+        if 'item' in item:
+            stack.extend(reversed(item['item']))
+            continue
+        if item['name'] in EXCLUDED_REQUESTS:
+            continue
+        request = item['request']
+        url = request['url']
+        body = request.get('body', {}).get('raw')
+        templates.append(Template(
+            item['name'],
+            request['method'],
+            '/' + '/'.join(url['path']),
+            weight=get_weight if request['method'] == 'GET' else 1.0,
+            query=[(param['key'], param['value'], param.get('disabled', False))
+                   for param in url.get('query', [])],
+            body=json.loads(body) if body else None,
+        ))
+    return templates
+
+
+def _read_log(path):
+    """(method, path with query string) of every request in an access log"""
+    with open(path) as log:
+        for line in log:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                entry = json.loads(line)
+                yield entry['method'].upper(), entry['path']
+                continue
+            match = LOG_LINE.search(line)
+            if match:
+                yield match['method'], match['path']
+
+
+def _log_templates(path, bodies):
+    observed = collections.defaultdict(list)
+    for method, target in _read_log(path):
+        route = ID_SEGMENT.sub('/{id}', urlsplit(target).path)
+        if route.startswith('/api/auth/') and route != '/api/auth/profile':
+            continue
+        observed[(method, route)].append(target)
+
+    templates = []
+    for (method, route), targets in sorted(observed.items()):
+        body = bodies.get((method, route))
+        if method not in ('GET', 'DELETE') and body is None:
+            print(f"Skipping {method} {route}: no request body in the collection", file=sys.stderr)
+            continue
+        templates.append(Template(
+            f'{method} {route}', method, route, weight=len(targets), body=body, paths=targets
+        ))
+    return templates
+
+
+class Caller:
+    def __init__(self, role, username, token, user_id, team_id):
+        self.role = role
+        self.username = username
+        self.token = token
+        self.user_id = user_id
+        self.team_id = team_id
+
+
+class Parameters:
+    """
+    Fills in a template for one caller
+    """
+
+    def __init__(self, team_ids, optional_params, generator):
+        self.team_ids = team_ids
+        self.optional_params = optional_params
+        self.generator = generator
+        self.waste_types = [waste_type.value for waste_type in WasteType]
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def _unique(self):
+        with self._lock:
+            self._counter += 1
+            return self._counter
+
+    def _team(self, caller):
+        if caller.team_id is None:
+            return self.generator.choice(self.team_ids)
+        return caller.team_id
+
+    def _value(self, key, value, caller):
+        if key == 'team_id':
+            return self._team(caller)
+        if key == 'waste_type':
+            return self.generator.choice(self.waste_types)
+        if key == 'weight':
+            return round(self.generator.lognormvariate(1, 0.8), 3)
+        if key == 'period':
+            return self.generator.choice(PERIODS)
+        if key == 'name':
+            return f'{value} {self._unique()}'
+        return value
+
+    def request(self, template, caller):
+        """(path, query params, JSON body) for `caller`"""
+        if template.paths:
+            target = urlsplit(self.generator.choice(template.paths))
+            path, query = target.path, parse_qsl(target.query)
+        else:
+            path = re.sub(r'/teams/\d+', f'/teams/{self._team(caller)}', template.path)
+            query = [
+                (key, self._value(key, value, caller))
+                for key, value, optional in template.query
+                if not optional or self.generator.random() < self.optional_params
+            ]
+
+        body = None
+        if template.body is not None:
+            body = {key: self._value(key, value, caller) for key, value in template.body.items()}
+            if caller.team_id is None:
+                body.setdefault('team_id', self._team(caller))
+        return path, query, body
+
+
+def _send(client, template, caller, parameters):
+    path, query, body = parameters.request(template, caller)
+    response = client.open(
+        path,
+        method=template.method,
+        query_string=query,
+        json=body,
+        headers={'Authorization': f'Bearer {caller.token}'}
+    )
+    response.close()
+    return response.status_code
+
+
+def _log_in(app, roles):
+    client = app.test_client()
+    callers = {}
+    with app.app_context():
+        for role in roles:
+            callers[role] = []
+            for username, password in SEEDED_USERS[role]:
+                response = client.post('/api/auth/login',
+                                       json={'username': username, 'password': password})
+                if response.status_code != 200:
+                    raise SystemExit(f'Could not log in as {username}: {response.status_code}')
+                user = User.query.filter_by(username=username).one()
+                callers[role].append(Caller(
+                    role, username, response.json['access_token'], user.id,
+                    None if user.is_superuser else user.team_id
+                ))
+    return callers
+
+
+def _probe(app, templates, callers, parameters):
+    """Templates each role may call: those not answered with 401 or 403"""
+    client = app.test_client()
+    allowed = {}
+    for role, role_callers in callers.items():
+        allowed[role] = [
+            template for template in templates
+            if _send(client, template, role_callers[0], parameters) not in (401, 403)
+        ]
+    return allowed
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _run(app, schedule, concurrency, parameters):
+    """Send `schedule` ((offset seconds, template, caller), ...) open loop"""
+    pending = queue.Queue()
+    samples = collections.defaultdict(list)
+    statuses = collections.defaultdict(collections.Counter)
+    lock = threading.Lock()
+
+    def work():
+        client = app.test_client()
+        while True:
+            job = pending.get()
+            if job is None:
+                return
+            scheduled, template, caller = job
+            try:
+                status = _send(client, template, caller, parameters)
+            except Exception:
+                status = 'exception'
+            latency = time.perf_counter() - scheduled
+            with lock:
+                samples[template.name].append(latency)
+                statuses[template.name][str(status)] += 1
+
+    workers = [threading.Thread(target=work, daemon=True) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    started = time.perf_counter()
+    for offset, template, caller in schedule:
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pending.put((started + offset, template, caller))
+    for _ in workers:
+        pending.put(None)
+    for worker in workers:
+        worker.join()
+    return samples, statuses, time.perf_counter() - started
+
+
+def _report(samples, statuses):
+    endpoints = {}
+    for name in sorted(samples):
+        latencies = sorted(samples[name])
+        endpoints[name] = {
+            'requests': len(latencies),
+            'statuses': dict(statuses[name]),
+            'p50_ms': round(_percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(_percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1),
+        }
+    return endpoints
+
+
+def _previous(workload):
+    """The last recorded run of the same workload, if any"""
+    if not os.path.exists(RESULTS):
+        return None
+    previous = None
+    with open(RESULTS) as results:
+        for line in results:
+            record = json.loads(line)
+            if record.get('workload') == workload:
+                previous = record
+    return previous
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_pairs(text, value_type):
+    pairs = {}
+    for pair in filter(None, (part.strip() for part in text.split(','))):
+        key, _, value = pair.rpartition('=')
+        pairs[key.strip()] = value_type(value)
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--collection', default=os.path.join(ROOT, 'postman.json'))
+    parser.add_argument('--log', help='access log to replay instead of the collection')
+    parser.add_argument('--rps', type=float, default=50, help='target requests per second')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight at most')
+    parser.add_argument('--roles', default='admin=1,manager=3,employee=6',
+                        help='share of requests sent as each seeded role')
+    parser.add_argument('--weight', action='append', default=[],
+                        help='NAME=W weight of one request, repeatable')
+    parser.add_argument('--get-weight', type=float, default=4,
+                        help='default weight of collection GET requests (writes weigh 1)')
+    parser.add_argument('--optional-params', type=float, default=0.3,
+                        help='probability of sending each disabled collection query parameter')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-record', action='store_true',
+                        help='print results without appending them to the history')
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    role_shares = _parse_pairs(args.roles, float)
+    unknown = set(role_shares) - set(SEEDED_USERS)
+    if unknown:
+        parser.error(f"unknown roles: {', '.join(sorted(unknown))}")
+
+    templates = _collection_templates(args.collection, args.get_weight)
+    if args.log:
+        bodies = {(template.method, ID_SEGMENT.sub('/{id}', template.path)): template.body
+                  for template in templates if template.body is not None}
+        templates = _log_templates(args.log, bodies)
+    weights = _parse_pairs(','.join(args.weight), float)
+    for template in templates:
+        template.weight = weights.get(template.name, template.weight)
+    templates = [template for template in templates if template.weight > 0]
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'JWT_SECRET_KEY': 'replay',
+            'FAST_STARTUP': True,
+        })
+        with app.app_context():
+            db.create_all()
+            with contextlib.redirect_stdout(io.StringIO()):
+                random.seed(args.seed)
+                seed_database()
+            team_ids = [team_id for team_id, in db.session.query(Team.id)]
+
+        parameters = Parameters(team_ids, args.optional_params, generator)
+        callers = _log_in(app, role_shares)
+        allowed = _probe(app, templates, callers, parameters)
+
+        roles = [role for role in role_shares if allowed[role] and role_shares[role] > 0]
+        if not roles:
+            raise SystemExit('No role may call any request in the workload')
+        schedule = []
+        for index in range(int(args.rps * args.duration)):
+            role = generator.choices(roles, [role_shares[role] for role in roles])[0]
+            choices = allowed[role]
+            template = generator.choices(choices, [template.weight for template in choices])[0]
+            schedule.append((index / args.rps, template, generator.choice(callers[role])))
+
+        samples, statuses, elapsed = _run(app, schedule, args.concurrency, parameters)
+    finally:
+        os.unlink(path)
+
+    workload = {
+        'source': os.path.basename(args.log or args.collection),
+        'rps': args.rps,
+        'concurrency': args.concurrency,
+        'roles': role_shares,
+        'weights': {template.name: template.weight for template in templates},
+    }
+    record = {
+        'recorded_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'workload': workload,
+        'duration': args.duration,
+        'requests': len(schedule),
+        'achieved_rps': round(len(schedule) / elapsed, 1),
+        'endpoints': _report(samples, statuses),
+    }
+    previous = _previous(workload)
+
+    print(f"{len(schedule)} requests in {elapsed:.1f}s ({record['achieved_rps']} rps)")
+    print(f"{'endpoint':>28} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'p95 change':>11}  statuses")
+    for name, sample in record['endpoints'].items():
+        change = ''
+        before = previous and previous['endpoints'].get(name)
+        if before and before['p95_ms']:
+            change = f"{(sample['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        statuses_text = ' '.join(f'{status}:{count}' for status, count in sorted(sample['statuses'].items()))
+        print(f"{name:>28} {sample['requests']:>9} {sample['p50_ms']:>8} {sample['p95_ms']:>8} "
+              f"{sample['p99_ms']:>8} {sample['max_ms']:>8} {change:>11}  {statuses_text}")
+
+    if not args.no_record:
+        with open(RESULTS, 'a') as results:
+            results.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
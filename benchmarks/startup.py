@@ -0,0 +1,110 @@
+"""
+Startup-time benchmark for the application factory.
+
+Each sample runs in a fresh interpreter and measures:
+
+- import: ``import app`` plus ``create_app()`` (what every worker pays on spawn)
+- first_request: latency of the first request that touches the database
+
+Results are printed and appended to ``benchmarks/results/startup.jsonl`` so
+they can be compared across commits.
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--no-record]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'startup.jsonl')
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': sys.argv[1],
+    'JWT_SECRET_KEY': 'benchmark',
+    'FAST_STARTUP': sys.argv[2] == 'fast',
+})
+ready = time.perf_counter()
+response = app.test_client().post(
+    '/api/auth/login', json={'username': 'nobody', 'password': 'nothing'}
+)
+done = time.perf_counter()
+assert response.status_code == 401, response.status_code
+print(json.dumps({'import': ready - started, 'first_request': done - ready}))
+'''
+
+
+def _prepare_database(path):
+    sys.path.insert(0, ROOT)
+    from app import create_app, db
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'FAST_STARTUP': True})
+    with app.app_context():
+        db.create_all()
+
+
+def _sample(database_uri, mode):
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, database_uri, mode], cwd=ROOT
+    )
+    return json.loads(output)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--no-record', action='store_true',
+                        help='print results without appending them to the history')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        _prepare_database(path)
+        record = {
+            'recorded_at': datetime.utcnow().isoformat(),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'runs': args.runs,
+        }
+        # Interleave the modes so background noise affects both equally
+        samples = {'default': [], 'fast': []}
+        for _ in range(args.runs):
+            for mode, results in samples.items():
+                results.append(_sample(f'sqlite:///{path}', mode))
+        for mode, results in samples.items():
+            for metric in ('import', 'first_request'):
+                values = [sample[metric] for sample in results]
+                record[f'{mode}_{metric}_ms'] = round(statistics.median(values) * 1000, 1)
+    finally:
+        os.unlink(path)
+
+    for key, value in record.items():
+        print(f'{key:>26}: {value}')
+
+    if not args.no_record:
+        with open(RESULTS, 'a') as results:
+            results.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+Statement construction benchmark: per-call select() vs cached lambda statements.
+
+Runs the two queries every request makes in a fresh session against a small
+SQLite database, so Python overhead rather than the database dominates. Each
+comparison runs the same SQL both ways, so the difference is statement
+construction and cache-key work only:
+
+- permission_check: load the caller with their role and its permissions in
+  one joined select (``load_user`` behind ``permission_required``)
+- listing: one team's entries of one waste type since a date, newest first
+  (``GET /api/waste``)
+
+The permission check used to be a ``get`` plus two lazy loads, and routes
+then looked the caller up again by the JWT identity string, which misses
+the identity map. That saving comes from issuing fewer statements, not from
+caching, so it is reported separately under ``round_trips`` as
+``request_user``: the old check and lookup against the joined select built
+on every call followed by the route's lookup by int id.
+
+Each form is timed as the median of ``--runs`` rounds of ``--iterations``
+calls, with the filter values varying between calls. ``saved_core_pct`` is
+the share of one core saved at ``--rps`` requests a second. Results are
+printed and appended to ``benchmarks/results/statements.jsonl`` so they can
+be compared across commits.
+
+Usage:
+    python benchmarks/statements.py [--iterations 2000] [--runs 5] [--rps 1000] [--no-record]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'statements.jsonl')
+
+sys.path.insert(0, ROOT)
+from app import create_app, db  # noqa: E402
+from app.models import Permission, Role, Team, User, WasteEntry, WasteType  # noqa: E402
+from app.routes.waste import _listing_statement  # noqa: E402
+from app.utils.permissions import load_user  # noqa: E402
+from app.utils.statements import statement_cache_stats  # noqa: E402
+
+TEAMS = 4
+USERS = 20
+PERMISSIONS = 25
+ENTRIES_PER_TEAM = 10
+START = datetime(2024, 1, 1)
+TYPES = list(WasteType)
+
+
+def _seed():
+    permissions = [Permission(code=f'permission_{index}', name=f'Permission {index}')
+                   for index in range(PERMISSIONS)]
+    role = Role(name='Benchmark')
+    role.permissions = permissions
+    teams = [Team(name=f'Team {index}') for index in range(TEAMS)]
+    db.session.add_all([role, *teams])
+    db.session.commit()
+    users = [
+        User(username=f'user{index}', email=f'user{index}@example.com', password_hash='-',
+             role_id=role.id, team_id=teams[index % TEAMS].id)
+        for index in range(USERS)
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    db.session.add_all([
+        WasteEntry(waste_type=TYPES[index % len(TYPES)], weight=1.0, user_id=users[0].id,
+                   team_id=team.id, timestamp=START + timedelta(days=index))
+        for team in teams for index in range(ENTRIES_PER_TEAM)
+    ])
+    db.session.commit()
+    return [user.id for user in users], [team.id for team in teams]
+
+
+def _has_last_permission(user):
+    return user.has_permission(f'permission_{PERMISSIONS - 1}')
+
+
+def _request_user_lazy(user_id):
+    # Before load_user: a get, lazy loads of role and permissions, then the
+    # route's own get by the identity string
+    identity = str(user_id)
+    user = db.session.get(User, identity)
+    _has_last_permission(user)
+    return db.session.get(User, identity)
+
+
+def _select_user(user_id):
+    statement = select(User).where(User.id == user_id).options(
+        joinedload(User.role).joinedload(Role.permissions)
+    )
+    return db.session.execute(statement).unique().scalar_one_or_none()
+
+
+def _permission_check_select(user_id):
+    return _has_last_permission(_select_user(user_id))
+
+
+def _request_user_select(user_id):
+    # The decorator keeps the user referenced, so the route's get by int id
+    # is answered from the identity map
+    user = _select_user(user_id)
+    _has_last_permission(user)
+    return db.session.get(User, user_id)
+
+
+def _permission_check_lambda(user_id):
+    return _has_last_permission(load_user(user_id))
+
+
+def _listing_select(team_id, waste_type, start):
+    statement = select(WasteEntry).where(
+        WasteEntry.team_id.in_([team_id]),
+        WasteEntry.waste_type == waste_type,
+        WasteEntry.timestamp >= start
+    ).order_by(WasteEntry.timestamp.desc())
+    return db.session.scalars(statement).all()
+
+
+def _listing_lambda(team_id, waste_type, start):
+    statement = _listing_statement(team_ids=[team_id], waste_type=waste_type, start=start)
+    return db.session.scalars(statement).all()
+
+
+def _measure(fn, arguments, iterations, runs):
+    """
+    Median microseconds per call, statements executed per call and the
+    compiled cache hit rate over all runs
+    """
+    timings = []
+    before = statement_cache_stats().snapshot()
+    for _ in range(runs):
+        started = time.perf_counter()
+        for index in range(iterations):
+            fn(*arguments[index % len(arguments)])
+            # Every request starts with an empty identity map
+            db.session.expunge_all()
+        timings.append((time.perf_counter() - started) / iterations)
+    after = statement_cache_stats().snapshot()
+    hits = after['hits'] - before['hits']
+    misses = after['misses'] - before['misses']
+    executed = hits + misses + after['uncached'] - before['uncached']
+    return (
+        statistics.median(timings) * 1e6,
+        round(executed / (iterations * runs), 2),
+        round(hits / (hits + misses), 4) if hits + misses else None,
+    )
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--rps', type=int, default=1000,
+                        help='request rate the saving is reported at')
+    parser.add_argument('--no-record', action='store_true',
+                        help='print results without appending them to the history')
+    args = parser.parse_args()
+
+    record = {
+        'recorded_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'iterations': args.iterations,
+        'runs': args.runs,
+        'rps': args.rps,
+        'caching': {},
+        'round_trips': {},
+    }
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'FAST_STARTUP': True})
+        with app.app_context():
+            db.create_all()
+            user_ids, team_ids = _seed()
+            permission_arguments = [(user_id,) for user_id in user_ids]
+            listing_arguments = [
+                (team_id, waste_type, START + timedelta(days=offset))
+                for team_id in team_ids for waste_type in TYPES for offset in (0, 3)
+            ]
+            # (section, name, baseline, candidate, arguments)
+            comparisons = [
+                ('caching', 'permission_check',
+                 _permission_check_select, _permission_check_lambda, permission_arguments),
+                ('caching', 'listing', _listing_select, _listing_lambda, listing_arguments),
+                ('round_trips', 'request_user',
+                 _request_user_lazy, _request_user_select, permission_arguments),
+            ]
+            for section, name, baseline, candidate, arguments in comparisons:
+                baseline_us, baseline_statements, _ = _measure(
+                    baseline, arguments, args.iterations, args.runs)
+                candidate_us, candidate_statements, hit_rate = _measure(
+                    candidate, arguments, args.iterations, args.runs)
+                record[section][name] = {
+                    'baseline': baseline.__name__.lstrip('_'),
+                    'candidate': candidate.__name__.lstrip('_'),
+                    'baseline_us': round(baseline_us, 1),
+                    'candidate_us': round(candidate_us, 1),
+                    'saved_us': round(baseline_us - candidate_us, 1),
+                    'saved_core_pct': round((baseline_us - candidate_us) * args.rps / 1e4, 1),
+                    'baseline_statements': baseline_statements,
+                    'candidate_statements': candidate_statements,
+                    'hit_rate': hit_rate,
+                }
+    finally:
+        os.unlink(path)
+
+    for section, title in (('caching', 'Per-call select() vs lambda statement (same SQL)'),
+                           ('round_trips', 'Lazy loads and string lookup vs one joined select (fewer statements)')):
+        print(title)
+        print(f"{'query':>18} {'baseline us':>12} {'candidate us':>13} {'saved us':>10} "
+              f"{'core % @ ' + str(args.rps):>14} {'statements':>11} {'hit rate':>9}")
+        for name, sample in record[section].items():
+            statements = f"{sample['baseline_statements']}->{sample['candidate_statements']}"
+            print(f"{name:>18} {sample['baseline_us']:>12} {sample['candidate_us']:>13} "
+                  f"{sample['saved_us']:>10} {sample['saved_core_pct']:>14} {statements:>11} "
+                  f"{sample['hit_rate']:>9}")
+
+    if not args.no_record:
+        with open(RESULTS, 'a') as results:
+            results.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Storage-layout benchmark for waste_entries.
+
+Builds the same synthetic entries in the default and the compact layout
+(``COMPACT_WASTE_STORAGE``), each in a fresh interpreter and SQLite database,
+and measures:
+
+- entries_bytes: size of the waste_entries table (the one analytics scan)
+- total_bytes: waste_entries plus waste_entry_audit in the compact layout
+- scan: median time of the per-type totals query analytics runs
+
+Results are printed and appended to ``benchmarks/results/storage.jsonl`` so
+they can be compared across commits.
+
+Usage:
+    python benchmarks/storage.py [--rows 100000] [--runs 5] [--no-record]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'storage.jsonl')
+
+CHILD = '''
+import json, os, random, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+from sqlalchemy import func, text
+from app import create_app, db
+from app.models import Role, Team, User, WasteEntry, WasteType
+
+rows, runs = int(sys.argv[1]), int(sys.argv[2])
+fd, path = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+try:
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'FAST_STARTUP': True})
+    with app.app_context():
+        db.create_all()
+        role = Role(name='Employee')
+        team = Team(name='Benchmark')
+        db.session.add_all([role, team])
+        db.session.commit()
+        user = User(username='benchmark', email='benchmark@example.com',
+                    password_hash='-', role_id=role.id, team_id=team.id)
+        db.session.add(user)
+        db.session.commit()
+
+        generator = random.Random(42)
+        start = datetime(2024, 1, 1)
+        types = list(WasteType)
+        for offset in range(0, rows, 5000):
+            db.session.add_all([
+                WasteEntry(
+                    waste_type=generator.choice(types),
+                    weight=round(generator.lognormvariate(1, 0.8), 3),
+                    user_id=user.id,
+                    team_id=team.id,
+                    timestamp=start + timedelta(minutes=index)
+                )
+                for index in range(offset, min(offset + 5000, rows))
+            ])
+            db.session.commit()
+        db.session.execute(text('VACUUM'))
+
+        sizes = dict(db.session.execute(text(
+            "SELECT name, SUM(pgsize) FROM dbstat "
+            "WHERE name IN ('waste_entries', 'waste_entry_audit') GROUP BY name"
+        )).all())
+
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            db.session.query(
+                WasteEntry.waste_type,
+                func.sum(WasteEntry.weight),
+                func.count(WasteEntry.id)
+            ).filter(WasteEntry.timestamp >= start).group_by(WasteEntry.waste_type).all()
+            timings.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        'entries_bytes': sizes.get('waste_entries', 0),
+        'total_bytes': sum(sizes.values()),
+        'scan': statistics.median(timings),
+    }))
+finally:
+    os.unlink(path)
+'''
+
+
+def _sample(layout, rows, runs):
+    env = dict(os.environ, COMPACT_WASTE_STORAGE='true' if layout == 'compact' else 'false')
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, str(rows), str(runs)], cwd=ROOT, env=env
+    )
+    return json.loads(output)
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--no-record', action='store_true',
+                        help='print results without appending them to the history')
+    args = parser.parse_args()
+
+    record = {
+        'recorded_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'rows': args.rows,
+        'runs': args.runs,
+    }
+    for layout in ('default', 'compact'):
+        sample = _sample(layout, args.rows, args.runs)
+        record[f'{layout}_entries_bytes'] = sample['entries_bytes']
+        record[f'{layout}_total_bytes'] = sample['total_bytes']
+        record[f'{layout}_scan_ms'] = round(sample['scan'] * 1000, 1)
+
+    for key, value in record.items():
+        print(f'{key:>26}: {value}')
+
+    if not args.no_record:
+        with open(RESULTS, 'a') as results:
+            results.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
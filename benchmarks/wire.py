@@ -0,0 +1,149 @@
+"""
+Wire format benchmark: JSON vs MessagePack for waste endpoint payloads.
+
+Builds listing responses (``{"waste_entries": [...]}`` with entries shaped
+like ``WasteEntry.to_dict()``) at several batch sizes, plus a single
+``POST /api/waste`` body, and measures for each encoding:
+
+- bytes: encoded size, and gzip_bytes for links that compress
+- encode / decode: median time over ``--runs`` repetitions
+
+JSON is encoded the way Flask does outside debug mode (compact separators).
+Results are printed and appended to ``benchmarks/results/wire.jsonl`` so
+they can be compared across commits.
+
+Usage:
+    python benchmarks/wire.py [--batches 1,50,500,5000] [--runs 20] [--no-record]
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import msgpack
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results', 'wire.jsonl')
+
+sys.path.insert(0, ROOT)
+from app.models.waste_entry import WasteType  # noqa: E402
+
+DESCRIPTIONS = [
+    None,
+    'Sample paper waste entry',
+    'Broken monitors from floor 3',
+    'Kitchen compost bin, emptied twice',
+    'Shrink wrap from the delivery pallets',
+]
+
+
+def _entries(count, seed=42):
+    generator = random.Random(seed)
+    start = datetime(2024, 1, 1, 8)
+    types = [waste_type.value for waste_type in WasteType]
+    entries = []
+    for index in range(count):
+        timestamp = (start + timedelta(minutes=7 * index)).isoformat()
+        entries.append({
+            'id': 100000 + index,
+            'waste_type': generator.choice(types),
+            'weight': round(generator.lognormvariate(1, 0.8), 3),
+            'description': generator.choice(DESCRIPTIONS),
+            'timestamp': timestamp,
+            'user_id': generator.randint(1, 400),
+            'team_id': generator.randint(1, 40),
+            'created_at': timestamp,
+            'updated_at': timestamp,
+        })
+    return entries
+
+
+def _json_encode(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _json_decode(data):
+    return json.loads(data)
+
+
+ENCODINGS = {
+    'json': (_json_encode, _json_decode),
+    'msgpack': (msgpack.packb, msgpack.unpackb),
+}
+
+
+def _median_seconds(fn, argument, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(argument)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def _measure(payload, runs):
+    sample = {}
+    for name, (encode, decode) in ENCODINGS.items():
+        data = encode(payload)
+        sample[f'{name}_bytes'] = len(data)
+        sample[f'{name}_gzip_bytes'] = len(gzip.compress(data))
+        sample[f'{name}_encode_us'] = round(_median_seconds(encode, payload, runs) * 1e6, 1)
+        sample[f'{name}_decode_us'] = round(_median_seconds(decode, data, runs) * 1e6, 1)
+    return sample
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--batches', default='1,50,500,5000',
+                        help='comma-separated listing sizes')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--no-record', action='store_true',
+                        help='print results without appending them to the history')
+    args = parser.parse_args()
+
+    record = {
+        'recorded_at': datetime.utcnow().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'msgpack': '.'.join(map(str, msgpack.version)),
+        'runs': args.runs,
+        'ingest': _measure({'waste_type': 'plastic', 'weight': 1.25,
+                            'description': 'Bottles from the break room'}, args.runs),
+        'listings': {},
+    }
+    for size in (int(batch) for batch in args.batches.split(',')):
+        record['listings'][size] = _measure({'waste_entries': _entries(size)}, args.runs)
+
+    print(f"{'payload':>10} {'encoding':>8} {'bytes':>10} {'gzip':>10} {'encode us':>11} {'decode us':>11}")
+    rows = [('ingest', record['ingest'])] + [
+        (f'list {size}', sample) for size, sample in record['listings'].items()
+    ]
+    for label, sample in rows:
+        for name in ENCODINGS:
+            print(f"{label:>10} {name:>8} {sample[f'{name}_bytes']:>10} "
+                  f"{sample[f'{name}_gzip_bytes']:>10} {sample[f'{name}_encode_us']:>11} "
+                  f"{sample[f'{name}_decode_us']:>11}")
+
+    if not args.no_record:
+        with open(RESULTS, 'a') as results:
+            results.write(json.dumps(record) + '\n')
+
+
+if __name__ == '__main__':
+    main()
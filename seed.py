@@ -5,6 +5,12 @@ Run this script after setting up the database to create initial users, teams, an
 
 from app import create_app, db
 from app.models import User, Team, WasteEntry, WasteType, Permission, Role
+from app.services.anomalies import rebuild_weight_stats
+from app.services.distribution import rebuild_weight_sketches
+from app.services.rollups import rebuild_user_rollups
+from app.services.sync import backfill_changes
+from app.utils.sharding import commit_shard_sessions, fan_out, session_for_team
+from collections import defaultdict
 from datetime import datetime, timedelta
 import random
 
@@ -53,6 +59,9 @@ def create_core_data():
         # Permission management
         ('view_permissions', 'Can view permissions'),
         ('assign_permissions', 'Can assign permissions to roles'),
+
+        # Auditing
+        ('view_audit_log', 'Can view the audit log'),
     ]
     
     # Create or get permissions
@@ -226,7 +235,7 @@ def seed_database():
     waste_types = list(WasteType)
     
     # Check if we already have waste entries
-    existing_entries = WasteEntry.query.count()
+    existing_entries = sum(fan_out(lambda session: session.query(WasteEntry).count()))
     if existing_entries > 0:
         print(f"Found {existing_entries} existing waste entries, skipping waste entry creation")
     else:
@@ -251,9 +260,27 @@ def seed_database():
                     )
                     waste_entries.append(waste_entry)
                     
-        db.session.add_all(waste_entries)
+        # Each team's entries go to its shard, where reads look for them
+        entries_by_team = defaultdict(list)
+        for waste_entry in waste_entries:
+            entries_by_team[waste_entry.team_id].append(waste_entry)
+        for team_id, team_entries in entries_by_team.items():
+            session_for_team(team_id).add_all(team_entries)
+        commit_shard_sessions()
         db.session.commit()
         print(f"Created {len(waste_entries)} waste entries")
+
+        rebuild_weight_sketches()
+        print("Built weight distribution sketches")
+
+        backfill_changes()
+        print("Logged waste entries for delta sync")
+
+        rebuild_weight_stats()
+        print("Computed weight statistics for anomaly detection")
+
+        rebuild_user_rollups()
+        print("Built per-user rollups")
     
     print("Database seeding completed successfully!")
 
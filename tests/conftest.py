@@ -9,7 +9,13 @@ from app.models import User, Team, WasteEntry, WasteType, Role, Permission
 
 
 @pytest.fixture
-def app():
+def app_config():
+    """Extra app configuration; override in a test module to change it."""
+    return {}
+
+
+@pytest.fixture
+def app(app_config):
     """Create and configure a Flask app for testing."""
     # Create a temporary file to isolate the database for each test
     db_fd, db_path = tempfile.mkstemp()
@@ -22,7 +28,9 @@ def app():
         'JWT_TOKEN_LOCATION': ['headers'],
         'JWT_HEADER_NAME': 'Authorization',
         'JWT_HEADER_TYPE': 'Bearer',
-        'JWT_ACCESS_TOKEN_EXPIRES': False  # Tokens never expire in testing
+        'JWT_ACCESS_TOKEN_EXPIRES': False,  # Tokens never expire in testing
+        'FAST_STARTUP': True,  # Tests never run migrations
+        **app_config
     })
 
     # Create the database and load test data
@@ -0,0 +1,57 @@
+"""
+Tests for admission control.
+"""
+import pytest
+from app.utils.admission import AdmissionController, Rejected
+
+
+@pytest.fixture
+def app_config():
+    return {'ADMISSION_LIMITS': {'analytics': 0}, 'ADMISSION_RETRY_AFTER': 2}
+
+
+def test_low_priority_requests_are_shed(client, auth_tokens):
+    """Test that a saturated class is rejected while ingestion still runs."""
+    headers = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+
+    response = client.get('/api/waste/analytics', headers=headers)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '2'
+
+    # Other analytics work is shed with it
+    for path in ('/api/waste/analytics/me', '/api/waste/forecast', '/api/waste/anomalies',
+                 '/api/waste/analytics/stream'):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 429, path
+
+    response = client.post('/api/waste', headers=headers, json={
+        'waste_type': 'plastic',
+        'weight': 1.0
+    })
+    assert response.status_code == 201
+
+    response = client.get('/api/metrics/admission')
+    assert response.status_code == 200
+    assert response.json['in_flight'] == 0
+    assert response.json['classes']['analytics']['rejected'] == 5
+    assert response.json['classes']['ingest']['admitted'] == 1
+
+
+def test_admission_priority_shares():
+    """Test that lower priority classes are shed first as a worker fills up."""
+    controller = AdmissionController(max_in_flight=4, limits={'analytics': None})
+
+    controller.acquire('analytics')
+    controller.acquire('analytics')
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire('analytics')
+    assert rejected.value.status == 503
+
+    controller.acquire('default')
+    controller.acquire('ingest')
+    with pytest.raises(Rejected):
+        controller.acquire('default')
+
+    controller.release('analytics')
+    controller.acquire('default')
+    assert controller.snapshot()['in_flight'] == 4
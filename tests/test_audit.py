@@ -0,0 +1,129 @@
+"""
+Tests for the audit log.
+"""
+import os
+from app.services.audit import audit_writer
+
+
+def _audit_log(app, client, token, query=''):
+    with app.app_context():
+        audit_writer().flush()
+    return client.get(f'/api/audit{query}', headers={'Authorization': f'Bearer {token}'})
+
+
+def test_changes_are_audited(app, client, auth_tokens):
+    """Test that committed changes are logged with their diffs and actor."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+
+    response = client.put('/api/users/3', headers=admin, json={
+        'team_id': 2,
+        'password': 'newpassword'
+    })
+    assert response.status_code == 200
+
+    response = _audit_log(app, client, auth_tokens['admin'], '?entity_type=users&entity_id=3')
+    assert response.status_code == 200
+    record = response.json['audit_log'][0]
+    assert record['action'] == 'update'
+    assert record['actor_id'] == 1
+    assert record['source'] == 'users.update_user'
+    assert record['changes']['team_id'] == {'old': 1, 'new': 2}
+    # Secrets are recorded as changed, never by value
+    assert record['changes']['password_hash'] == {'old': '[redacted]', 'new': '[redacted]'}
+
+    # Role permission changes are recorded as ids
+    response = client.put('/api/roles/3', headers=admin, json={'permission_ids': [4]})
+    assert response.status_code == 200
+    response = _audit_log(app, client, auth_tokens['admin'], '?entity_type=roles&action=update')
+    changes = response.json['audit_log'][0]['changes']['permissions']
+    assert changes == {'added': [], 'removed': [1]}
+
+    # Creates are logged under the new record's id
+    response = client.post('/api/teams', headers=admin, json={'name': 'Audited'})
+    assert response.status_code == 201
+    team_id = response.json['team']['id']
+    response = _audit_log(app, client, auth_tokens['admin'],
+                          f'?entity_type=teams&entity_id={team_id}')
+    record = response.json['audit_log'][0]
+    assert (record['action'], record['entity_id']) == ('create', team_id)
+    assert record['changes']['name'] == 'Audited'
+
+    # Deletes keep the record's last values
+    response = client.delete('/api/users/3', headers=admin)
+    assert response.status_code == 200
+    response = _audit_log(app, client, auth_tokens['admin'], '?entity_type=users&action=delete')
+    record = response.json['audit_log'][0]
+    assert record['entity_id'] == 3
+    assert record['changes']['username'] == 'employee'
+
+
+def test_failed_changes_are_not_audited(app, client, auth_tokens):
+    """Test that rolled back changes leave no audit records."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+
+    # Duplicate email: rejected before commit
+    response = client.put('/api/users/3', headers=admin, json={'email': 'manager@test.com'})
+    assert response.status_code == 409
+
+    response = _audit_log(app, client, auth_tokens['admin'], '?entity_type=users&action=update')
+    assert response.json['audit_log'] == []
+
+
+def test_audit_log_pagination(app, client, auth_tokens):
+    """Test paging through the audit log and its permission."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    for name in ['Ops', 'Sales', 'Legal']:
+        client.post('/api/teams', headers=admin, json={'name': name})
+
+    query = '?entity_type=teams&action=create&limit=2'
+    response = _audit_log(app, client, auth_tokens['admin'], query)
+    names = [record['changes']['name'] for record in response.json['audit_log']]
+    assert names == ['Legal', 'Sales']
+
+    before_id = response.json['next_before_id']
+    response = _audit_log(app, client, auth_tokens['admin'], f'{query}&before_id={before_id}')
+    names = [record['changes']['name'] for record in response.json['audit_log']]
+    # The fixture teams were created (and audited) too
+    assert names[0] == 'Ops'
+
+    response = _audit_log(app, client, auth_tokens['admin'], '?limit=0')
+    assert response.status_code == 400
+
+    response = _audit_log(app, client, auth_tokens['manager'])
+    assert response.status_code == 403
+
+
+CHILD = '''
+import os, signal, sys
+from app import create_app, db
+from app.models import Team
+
+app = create_app({
+    'SQLALCHEMY_DATABASE_URI': f'sqlite:///{sys.argv[1]}',
+    'FAST_STARTUP': True,
+    'AUDIT_FLUSH_INTERVAL': 60,
+})
+with app.app_context():
+    db.create_all()
+    db.session.add(Team(name='Queued'))
+    db.session.commit()
+    os.kill(os.getpid(), signal.SIGTERM)
+    signal.pause()
+'''
+
+
+def test_queued_records_are_written_on_sigterm(tmp_path):
+    """Test that SIGTERM writes queued records before the process dies."""
+    import signal
+    import sqlite3
+    import subprocess
+    import sys
+
+    path = tmp_path / 'audit.db'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    child = subprocess.run([sys.executable, '-c', CHILD, str(path)], cwd=root, timeout=60)
+    assert child.returncode == -signal.SIGTERM
+
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute('SELECT action, entity_type, entity_id FROM audit_log').fetchall()
+    assert rows == [('create', 'teams', 1)]
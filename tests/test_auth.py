@@ -101,4 +101,150 @@ def test_profile(client, auth_tokens):
     response = client.get('/api/auth/profile', headers={
         'Authorization': 'Bearer invalid-token'
     })
-    assert response.status_code == 422  # JWT decode error 
\ No newline at end of file
+    assert response.status_code == 422  # JWT decode error 
+
+def test_refresh_token_rotation(client):
+    """Test refresh token rotation and reuse detection."""
+    response = client.post('/api/auth/login', json={
+        'username': 'employee',
+        'password': 'employeepass'
+    })
+    assert response.status_code == 200
+    access_token = response.json['access_token']
+    refresh_token = response.json['refresh_token']
+
+    # Exchange the refresh token for a new pair
+    response = client.post('/api/auth/refresh', headers={
+        'Authorization': f'Bearer {refresh_token}'
+    })
+    assert response.status_code == 200
+    rotated = response.json['refresh_token']
+    assert rotated != refresh_token
+    rotated_access_token = response.json['access_token']
+
+    response = client.get('/api/auth/profile', headers={
+        'Authorization': f'Bearer {rotated_access_token}'
+    })
+    assert response.status_code == 200
+    assert response.json['username'] == 'employee'
+
+    # Access tokens cannot be used to refresh
+    response = client.post('/api/auth/refresh', headers={
+        'Authorization': f'Bearer {access_token}'
+    })
+    assert response.status_code == 422
+
+    # Replaying the old token revokes the whole family
+    response = client.post('/api/auth/refresh', headers={
+        'Authorization': f'Bearer {refresh_token}'
+    })
+    assert response.status_code == 401
+    assert response.json['message'] == 'Refresh token reuse detected, please log in again'
+
+    response = client.post('/api/auth/refresh', headers={
+        'Authorization': f'Bearer {rotated}'
+    })
+    assert response.status_code == 401
+
+    # Access tokens issued from the family are revoked with it
+    for token in (access_token, rotated_access_token):
+        response = client.get('/api/auth/profile', headers={
+            'Authorization': f'Bearer {token}'
+        })
+        assert response.status_code == 401
+
+
+def test_logout_revokes_tokens(client):
+    """Test that logging out revokes the access and refresh tokens."""
+    response = client.post('/api/auth/login', json={
+        'username': 'manager',
+        'password': 'managerpass'
+    })
+    access_token = response.json['access_token']
+    refresh_token = response.json['refresh_token']
+
+    response = client.post('/api/auth/logout', headers={
+        'Authorization': f'Bearer {access_token}'
+    })
+    assert response.status_code == 200
+    assert response.json['message'] == 'Successfully logged out'
+
+    response = client.get('/api/auth/profile', headers={
+        'Authorization': f'Bearer {access_token}'
+    })
+    assert response.status_code == 401
+
+    response = client.post('/api/auth/logout', headers={
+        'Authorization': f'Bearer {refresh_token}'
+    })
+    assert response.status_code == 200
+
+    response = client.post('/api/auth/refresh', headers={
+        'Authorization': f'Bearer {refresh_token}'
+    })
+    assert response.status_code == 401
+
+
+def test_revocation_list_refresh(app, runner):
+    """Test incremental refresh and compaction of the revocation list."""
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models import RevokedToken
+    from app.services.revocation import RevocationList
+
+    with app.app_context():
+        revocations = RevocationList(refresh_interval=3600)
+        assert not revocations.contains('live')
+
+        # Other workers' revocations are picked up on the next refresh
+        db.session.add_all([
+            RevokedToken(jti='live', token_type='access',
+                         expires_at=datetime.utcnow() + timedelta(hours=1)),
+            RevokedToken(jti='expired', token_type='access',
+                         expires_at=datetime.utcnow() - timedelta(hours=1)),
+        ])
+        db.session.commit()
+        assert not revocations.contains('live')
+
+        revocations.refresh()
+        assert revocations.contains('live')
+        assert not revocations.contains('expired')
+
+    result = runner.invoke(args=['tokens', 'compact'])
+    assert 'Removed 1 expired token records' in result.output
+
+    with app.app_context():
+        assert [token.jti for token in RevokedToken.query.all()] == ['live']
+
+
+def test_revocation_list_out_of_order_commits(app):
+    """Test that a revocation committed after a higher id is still picked up."""
+    from app import db
+    from app.models import RevokedToken
+    from app.services.revocation import RevocationList
+
+    def revoke(jti, token_id):
+        token = RevokedToken(jti=jti, token_type='access')
+        token.id = token_id
+        db.session.add(token)
+        db.session.commit()
+
+    with app.app_context():
+        revocations = RevocationList(refresh_interval=3600, id_window=10,
+                                     full_reload_interval=3600)
+        revoke('later', 20)
+        revocations.refresh()
+        assert revocations.contains('later')
+
+        # A lower id committed late, within the re-read window
+        revoke('lagging', 15)
+        revocations.refresh()
+        assert revocations.contains('lagging')
+
+        # Further behind than the window: found by the next full reload
+        revoke('stalled', 3)
+        revocations.refresh()
+        assert not revocations.contains('stalled')
+        revocations._next_full_reload = 0.0
+        revocations.refresh()
+        assert revocations.contains('stalled')
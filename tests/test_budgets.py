@@ -0,0 +1,53 @@
+"""
+Tests for per-endpoint query budgets.
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.utils.budgets import QueryBudgetExceeded, query_budget
+
+
+@pytest.fixture
+def app_config():
+    return {'QUERY_BUDGETS': {'waste.get_waste_entries': {'max_rows': 0}}}
+
+
+def test_row_budget(client, auth_tokens):
+    """Test that a listing over its row budget fails with a hint."""
+    response = client.get('/api/waste', headers={
+        'Authorization': f'Bearer {auth_tokens["admin"]}'
+    })
+    assert response.status_code == 422
+    assert response.json['message'] == 'Query budget exceeded: more than 0 rows'
+    assert 'start_date' in response.json['hint']
+
+    # Endpoints without a budget are unaffected
+    response = client.get('/api/waste/analytics', headers={
+        'Authorization': f'Bearer {auth_tokens["admin"]}'
+    })
+    assert response.status_code == 200
+
+
+def test_query_and_timeout_budgets(app):
+    """Test query count limits and the SQLite statement deadline."""
+    with app.app_context():
+        with query_budget(max_queries=1):
+            db.session.execute(text('SELECT 1'))
+            with pytest.raises(QueryBudgetExceeded):
+                db.session.execute(text('SELECT 2'))
+        db.session.rollback()
+
+        slow = text(
+            'WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) '
+            'SELECT count(*) FROM c'
+        )
+        with query_budget(timeout_ms=50) as budget:
+            with pytest.raises(OperationalError):
+                db.session.execute(slow)
+            assert budget.expired()
+        db.session.rollback()
+
+        # The handler is cleared once the connection goes back to the pool
+        db.session.close()
+        assert db.session.execute(text('SELECT 1')).scalar() == 1
@@ -0,0 +1,59 @@
+"""
+Tests for coalescing of concurrent read requests.
+"""
+import threading
+import time
+import app.routes.waste as waste_routes
+
+
+def _get_concurrently(app, requests):
+    responses = [None] * len(requests)
+
+    def get(index, url, headers):
+        responses[index] = app.test_client().get(url, headers=headers)
+
+    threads = [
+        threading.Thread(target=get, args=(index, url, headers))
+        for index, (url, headers) in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_identical_requests_share_one_execution(app, auth_tokens, monkeypatch):
+    """Test that concurrent identical requests run the view once per scope."""
+    compute = waste_routes.compute_waste_analytics
+    calls = []
+
+    def slow_compute(*args, **kwargs):
+        calls.append(kwargs.get('team_id'))
+        time.sleep(0.3)
+        return compute(*args, **kwargs)
+
+    monkeypatch.setattr(waste_routes, 'compute_waste_analytics', slow_compute)
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    url = '/api/waste/analytics?waste_type=plastic'
+
+    responses = _get_concurrently(app, [(url, manager)] * 4 + [(url, admin)] * 2)
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.get_data() for response in responses[:4]}) == 1
+    # One execution for the manager's team and one for the admin's view
+    assert len(calls) == 2
+    assert None in calls
+
+    # Nothing is cached once the execution finishes
+    response = app.test_client().get(url, headers=manager)
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+    response = app.test_client().get('/api/metrics/coalescing')
+    assert response.status_code == 200
+    assert response.json['endpoints']['waste.get_waste_analytics'] == {
+        'executions': 3,
+        'coalesced': 4
+    }
@@ -0,0 +1,83 @@
+"""
+Tests for precomputed analytics reports.
+"""
+import threading
+import time
+from datetime import datetime
+from app.models import ReportSnapshot
+from app.utils.scheduler import CronSchedule
+from app.utils.singleflight import SingleFlight
+
+
+def test_analytics_served_from_snapshot(client, auth_tokens, app):
+    """Test that team analytics are served from a fresh snapshot."""
+    headers = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+
+    response = client.get('/api/waste/analytics', headers=headers)
+    assert response.status_code == 200
+    assert response.json['total_entries'] == 1
+
+    # A new entry is not visible while the snapshot is fresh
+    client.post(
+        '/api/waste',
+        headers={'Authorization': f'Bearer {auth_tokens["employee"]}'},
+        json={'waste_type': 'glass', 'weight': 3.0}
+    )
+    response = client.get('/api/waste/analytics', headers=headers)
+    assert response.json['total_entries'] == 1
+
+    # Filtered requests are always computed live
+    response = client.get('/api/waste/analytics?waste_type=glass', headers=headers)
+    assert response.json['total_entries'] == 1
+    assert response.json['waste_by_type'] == {'glass': 3.0}
+
+    # Stale snapshots are recomputed
+    app.config['REPORT_SNAPSHOT_MAX_AGE'] = 0
+    response = client.get('/api/waste/analytics', headers=headers)
+    assert response.json['total_entries'] == 2
+
+
+def test_refresh_reports_command(runner, app):
+    """Test precomputing every team's reports from the CLI."""
+    result = runner.invoke(args=['reports', 'refresh'])
+    assert 'Refreshed 6 report snapshots' in result.output
+
+    with app.app_context():
+        assert ReportSnapshot.query.count() == 6
+
+
+def test_cron_schedule():
+    """Test cron expression matching."""
+    schedule = CronSchedule('30 9 * * 1')  # Mondays at 09:30
+    assert schedule.next_after(datetime(2024, 1, 1, 9, 0)) == datetime(2024, 1, 1, 9, 30)
+    assert schedule.next_after(datetime(2024, 1, 1, 9, 30)) == datetime(2024, 1, 8, 9, 30)
+
+    schedule = CronSchedule('*/15 * * * *')
+    assert schedule.next_after(datetime(2024, 1, 1, 9, 50)) == datetime(2024, 1, 1, 10, 0)
+
+    schedule = CronSchedule('0 0 1 */3 *')
+    assert schedule.next_after(datetime(2024, 2, 10)) == datetime(2024, 4, 1)
+
+
+def test_single_flight_shares_concurrent_calls():
+    """Test that concurrent calls for the same key run once."""
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'report'
+
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do('key', compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['report'] * 5
@@ -0,0 +1,70 @@
+"""
+Tests for team-keyed sharding of waste data.
+"""
+import pytest
+from app import db
+from app.models import WasteEntry
+from app.utils.sharding import create_shard_tables, session_for_shard
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    """Store the Marketing team's (id 2) waste data on its own SQLite shard."""
+    yield {
+        'SQLALCHEMY_BINDS': {'marketing': f'sqlite:///{tmp_path / "marketing.db"}'},
+        'WASTE_SHARDS': {'marketing': [2]}
+    }
+    # Flask-SQLAlchemy keeps one metadata per bind key on the shared `db`
+    db.metadatas.pop('marketing', None)
+
+
+@pytest.fixture
+def shards(app):
+    with app.app_context():
+        create_shard_tables()
+
+
+def test_entries_routed_to_team_shard(client, auth_tokens, app, shards):
+    """Test that entries are written to and read from their team's shard."""
+    headers = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    response = client.post(
+        '/api/waste',
+        headers=headers,
+        json={'waste_type': 'glass', 'weight': 4.0, 'team_id': 2}
+    )
+    assert response.status_code == 201
+
+    with app.app_context():
+        assert db.session.query(WasteEntry).filter_by(team_id=2).count() == 0
+        assert session_for_shard('marketing').query(WasteEntry).count() == 1
+
+    response = client.get('/api/waste?team_id=2', headers=headers)
+    assert [entry['weight'] for entry in response.json['waste_entries']] == [4.0]
+
+    # Engineering's entries stay on the default database
+    response = client.get(
+        '/api/waste',
+        headers={'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    )
+    assert [entry['weight'] for entry in response.json['waste_entries']] == [2.5]
+
+
+def test_cross_team_analytics_merges_shards(client, auth_tokens, shards):
+    """Test that admin analytics fan out to every shard and merge results."""
+    headers = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    client.post(
+        '/api/waste',
+        headers=headers,
+        json={'waste_type': 'paper', 'weight': 1.5, 'team_id': 2}
+    )
+
+    response = client.get('/api/waste/analytics', headers=headers)
+    assert response.status_code == 200
+    assert response.json['total_entries'] == 2
+    assert response.json['waste_by_type'] == {'paper': 4.0}
+
+    response = client.get('/api/waste/analytics/distribution', headers=headers)
+    assert response.json['waste_by_type']['paper']['count'] == 1
+
+    response = client.get('/api/waste/analytics?team_id=2', headers=headers)
+    assert response.json['total_entries'] == 1
@@ -0,0 +1,39 @@
+"""
+Tests for the quantile sketches.
+"""
+import bisect
+import random
+from app.utils.sketches import KLLSketch, DEFAULT_RANK_ERROR
+
+
+def test_small_sketch_is_exact():
+    """Test that a sketch below capacity reports exact quantiles."""
+    sketch = KLLSketch()
+    for value in range(1, 101):
+        sketch.update(value)
+
+    assert sketch.n == 100
+    assert sketch.quantile(0.5) == 50
+    assert sketch.quantile(0.9) == 90
+    assert sketch.quantile(0) == 1
+    assert sketch.quantile(1) == 100
+
+
+def test_merged_sketches_stay_within_error_bound():
+    """Test merging daily sketches keeps quantiles within the rank error."""
+    random.seed(42)
+    values = [random.lognormvariate(1, 1) for _ in range(50000)]
+
+    daily = [KLLSketch() for _ in range(365)]
+    for i, value in enumerate(values):
+        daily[i % len(daily)].update(value)
+
+    merged = KLLSketch()
+    for sketch in daily:
+        merged = merged.merge(KLLSketch.from_dict(sketch.to_dict()))
+
+    assert merged.n == len(values)
+    ordered = sorted(values)
+    for fraction in (0.5, 0.9, 0.99):
+        rank = bisect.bisect_left(ordered, merged.quantile(fraction)) / len(values)
+        assert abs(rank - fraction) <= DEFAULT_RANK_ERROR
@@ -0,0 +1,81 @@
+"""
+Tests for the compact waste entry storage layout.
+
+The layout is fixed when the models are imported, so each step runs in a
+fresh interpreter against the same database file.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CREATE_DEFAULT = '''
+import sys
+from app import create_app, db
+from app.models import Role, Team, User, WasteEntry, WasteType
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'FAST_STARTUP': True})
+with app.app_context():
+    db.create_all()
+    role, team = Role(name='Employee'), Team(name='Engineering')
+    db.session.add_all([role, team])
+    db.session.commit()
+    user = User(username='employee', email='employee@test.com', password='employeepass',
+                role_id=role.id, team_id=team.id)
+    db.session.add(user)
+    db.session.commit()
+    db.session.add_all([
+        WasteEntry(waste_type=WasteType.GLASS, weight=1.25, user_id=user.id,
+                   team_id=team.id, description='Jars'),
+        WasteEntry(waste_type=WasteType.OTHER, weight=7.0, user_id=user.id, team_id=team.id),
+    ])
+    db.session.commit()
+'''
+
+MIGRATE_AND_READ = '''
+import json, sys
+from app import create_app, db
+from app.models import WasteEntry, WasteType
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'FAST_STARTUP': True})
+result = app.test_cli_runner().invoke(args=['storage', 'compact'])
+with app.app_context():
+    entries = [entry.to_dict() for entry in WasteEntry.query.order_by(WasteEntry.id)]
+    glass = WasteEntry.query.filter(
+        WasteEntry.waste_type == WasteType.GLASS, WasteEntry.weight > 1
+    ).count()
+print(json.dumps({'output': result.output, 'entries': entries, 'glass': glass}))
+'''
+
+
+def _run(script, database_uri, compact):
+    env = dict(os.environ, COMPACT_WASTE_STORAGE='true' if compact else 'false')
+    return subprocess.check_output(
+        [sys.executable, '-c', script, database_uri], cwd=ROOT, env=env, text=True
+    )
+
+
+def test_migrate_to_compact_storage():
+    """Test migrating existing entries without changing their API shape."""
+    db_fd, db_path = tempfile.mkstemp()
+    os.close(db_fd)
+    database_uri = f'sqlite:///{db_path}'
+    try:
+        _run(CREATE_DEFAULT, database_uri, compact=False)
+        result = json.loads(_run(MIGRATE_AND_READ, database_uri, compact=True))
+    finally:
+        os.unlink(db_path)
+
+    assert 'Migrated 2 waste entries' in result['output']
+    assert result['glass'] == 1
+    glass, other = result['entries']
+    assert glass['waste_type'] == 'glass'
+    assert glass['weight'] == 1.25
+    assert glass['description'] == 'Jars'
+    assert other['waste_type'] == 'other'
+    assert other['weight'] == 7.0
+    assert set(glass) == {
+        'id', 'waste_type', 'weight', 'description', 'timestamp', 'user_id', 'team_id',
+        'created_at', 'updated_at'
+    }
@@ -172,4 +172,68 @@ def test_get_team_members(client, auth_tokens, app):
         
         # Test without authentication
         response = client.get(f'/api/teams/{team_id}/members')
-        assert response.status_code == 401 
\ No newline at end of file
+        assert response.status_code == 401 
+
+def test_team_hierarchy(client, auth_tokens):
+    """Test subtree listings, analytics and moves in the team hierarchy."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+
+    # Engineering (id 1) > Platform > Storage
+    response = client.post('/api/teams', headers=admin, json={
+        'name': 'Platform', 'parent_id': 1
+    })
+    assert response.status_code == 201
+    platform_id = response.json['team']['id']
+    assert response.json['team']['parent_id'] == 1
+    response = client.post('/api/teams', headers=admin, json={
+        'name': 'Storage', 'parent_id': platform_id
+    })
+    storage_id = response.json['team']['id']
+
+    response = client.post('/api/waste', headers=admin, json={
+        'waste_type': 'metal', 'weight': 4.0, 'team_id': storage_id
+    })
+    assert response.status_code == 201
+
+    # The Engineering manager sees the teams below Engineering
+    response = client.get('/api/teams', headers=manager)
+    assert {team['name'] for team in response.json['teams']} == {
+        'Engineering', 'Platform', 'Storage'
+    }
+    response = client.get(f'/api/teams/{storage_id}', headers=manager)
+    assert response.status_code == 200
+
+    response = client.get('/api/waste/analytics?period=week&include_subteams=true',
+                          headers=manager)
+    assert response.status_code == 200
+    assert response.json['waste_by_type'] == {'paper': 2.5, 'metal': 4.0}
+
+    response = client.get('/api/waste/analytics/distribution?include_subteams=true',
+                          headers=manager)
+    assert response.status_code == 200
+    assert response.json['waste_by_type']['metal']['count'] == 1
+    response = client.get('/api/waste/analytics/distribution', headers=manager)
+    assert 'metal' not in response.json['waste_by_type']
+
+    response = client.get('/api/waste?include_subteams=true', headers=manager)
+    assert len(response.json['waste_entries']) == 2
+    response = client.get('/api/waste', headers=manager)
+    assert len(response.json['waste_entries']) == 1
+
+    # Cycles are rejected
+    response = client.put('/api/teams/1', headers=admin, json={'parent_id': storage_id})
+    assert response.status_code == 400
+
+    # Moving Platform under Marketing takes Storage with it
+    response = client.put(f'/api/teams/{platform_id}', headers=admin, json={'parent_id': 2})
+    assert response.status_code == 200
+    response = client.get(f'/api/teams/{storage_id}', headers=manager)
+    assert response.status_code == 403
+    response = client.get('/api/waste/analytics?period=week&team_id=2&include_subteams=true',
+                          headers=admin)
+    assert response.json['waste_by_type'] == {'metal': 4.0}
+
+    # Teams with child teams cannot be deleted
+    response = client.delete(f'/api/teams/{platform_id}', headers=admin)
+    assert response.status_code == 400
@@ -227,4 +227,148 @@ def test_delete_user(client, auth_tokens, app):
             f'/api/users/{admin.id}',
             headers={'Authorization': f'Bearer {auth_tokens["admin"]}'}
         )
-        assert response.status_code == 400 
\ No newline at end of file
+        assert response.status_code == 400 
+
+def test_bulk_create_users(client, auth_tokens, app):
+    """Test provisioning users in bulk."""
+    response = client.post(
+        '/api/users/bulk',
+        headers={'Authorization': f'Bearer {auth_tokens["admin"]}'},
+        json={'users': [
+            {'username': 'bulk1', 'email': 'bulk1@test.com', 'password': 'pass1',
+             'team_id': 1},
+            {'username': 'bulk2', 'email': 'bulk2@test.com', 'password': 'pass2',
+             'role': 'manager'},
+            {'username': 'employee', 'email': 'taken@test.com', 'password': 'pass'},
+            {'username': 'bulk1', 'email': 'other@test.com', 'password': 'pass'},
+            {'username': 'bulk3', 'email': 'bulk3@test.com', 'password': 'pass',
+             'team_id': 999},
+            {'username': 'bulk4', 'email': 'bulk4@test.com'},
+            {'username': ['bulk5'], 'email': 'bulk5@test.com', 'password': 'pass'},
+            {'username': 'bulk6', 'email': {'address': 'bulk6@test.com'}, 'password': 'pass'},
+            {'username': 'bulk7', 'email': 'bulk7@test.com', 'password': 'pass', 'role': 7}
+        ]}
+    )
+    assert response.status_code == 201
+    assert [user['username'] for user in response.json['users']] == ['bulk1', 'bulk2']
+    assert [(error['row'], error['message']) for error in response.json['errors']] == [
+        (2, 'Username already exists'),
+        (3, 'Duplicate username in batch'),
+        (4, 'Invalid team'),
+        (5, 'Missing required fields'),
+        (6, 'username, email and password must be strings'),
+        (7, 'username, email and password must be strings'),
+        (8, 'role must be a string')
+    ]
+
+    with app.app_context():
+        bulk1 = User.query.filter_by(username='bulk1').first()
+        assert bulk1.role.name == 'Employee'
+        assert bulk1.team_id == 1
+        assert bulk1.check_password('pass1')
+        assert User.query.filter_by(username='bulk2').first().role.name == 'Manager'
+
+    # Test CSV upload
+    response = client.post(
+        '/api/users/bulk',
+        headers={'Authorization': f'Bearer {auth_tokens["admin"]}'},
+        data='username,email,password,role_id\ncsv1,csv1@test.com,pass,3\n',
+        content_type='text/csv'
+    )
+    assert response.status_code == 201
+    assert response.json['users'][0]['role_id'] == 3
+
+    # Test as manager (should be denied)
+    response = client.post(
+        '/api/users/bulk',
+        headers={'Authorization': f'Bearer {auth_tokens["manager"]}'},
+        json=[{'username': 'x', 'email': 'x@test.com', 'password': 'x'}]
+    )
+    assert response.status_code == 403
+
+
+def test_user_directory(client, auth_tokens):
+    """Test cursor pagination, prefix search and the summary projection."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    client.post('/api/users/bulk', headers=admin, json=[
+        {'username': name, 'email': f'{name.lower()}@corp.example', 'password': 'pass',
+         'role_id': 3, 'team_id': 1}
+        for name in ['Alice', 'alfred', 'Bob', 'ALBERT', 'carol']
+    ])
+
+    # Pages follow each other without gaps or repeats
+    usernames = []
+    cursor = ''
+    while cursor is not None:
+        response = client.get(f'/api/users?limit=3&cursor={cursor}', headers=admin)
+        assert response.status_code == 200
+        assert len(response.json['users']) <= 3
+        usernames += [user['username'] for user in response.json['users']]
+        cursor = response.json['next_cursor'] or None
+    assert usernames == ['admin', 'ALBERT', 'alfred', 'Alice', 'Bob', 'carol',
+                         'employee', 'manager']
+
+    # Case-insensitive prefix of the username or email
+    response = client.get('/api/users?q=AL&fields=summary', headers=admin)
+    assert [user['username'] for user in response.json['users']] == ['ALBERT', 'alfred', 'Alice']
+    assert set(response.json['users'][0]) == {'id', 'username', 'email', 'team_id', 'role_id'}
+    response = client.get('/api/users?q=bob@corp', headers=admin)
+    assert [user['username'] for user in response.json['users']] == ['Bob']
+
+    # The term is lowercased like the stored keys (ASCII only under SQLite)
+    client.post('/api/users/bulk', headers=admin, json=[
+        {'username': 'Émile', 'email': 'emile@corp.example', 'password': 'pass',
+         'role_id': 3, 'team_id': 2}
+    ])
+    response = client.get('/api/users?q=ÉM', headers=admin)
+    assert [user['username'] for user in response.json['users']] == ['Émile']
+
+    # Team member listings page the same way
+    response = client.get('/api/teams/1/members?q=c&limit=1', headers=admin)
+    assert [user['username'] for user in response.json['members']] == ['carol']
+    assert response.json['next_cursor'] is None
+
+    response = client.get('/api/users?cursor=not-a-cursor', headers=admin)
+    assert response.status_code == 400
+    response = client.get('/api/users?limit=0', headers=admin)
+    assert response.status_code == 400
+
+
+def test_reassign_team(app, client, auth_tokens):
+    """Test moving users between teams in bulk."""
+    from app.services.audit import audit_writer
+
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+
+    response = client.post('/api/users/reassign-team', headers=admin, json={
+        'team_id': 2, 'user_ids': [3, 999]
+    })
+    assert response.status_code == 200
+    assert response.json['moved'] == [3]
+    assert response.json['not_found'] == [999]
+    assert client.get('/api/users/3', headers=admin).json['team_id'] == 2
+
+    # Every member of a team
+    response = client.post('/api/users/reassign-team', headers=admin, json={
+        'team_id': 2, 'from_team_id': 1
+    })
+    assert response.json['moved'] == [2]
+    response = client.get('/api/teams/1/members', headers=admin)
+    assert response.json['members'] == []
+
+    # The set-based update is audited like single edits
+    with app.app_context():
+        audit_writer().flush()
+    response = client.get('/api/audit?entity_type=users&entity_id=2', headers=admin)
+    assert response.json['audit_log'][0]['changes'] == {'team_id': {'old': 1, 'new': 2}}
+
+    response = client.post('/api/users/reassign-team', headers=admin, json={
+        'team_id': 999, 'from_team_id': 2
+    })
+    assert response.status_code == 404
+    response = client.post('/api/users/reassign-team', headers=admin, json={'team_id': 1})
+    assert response.status_code == 400
+    response = client.post('/api/users/reassign-team', headers={
+        'Authorization': f'Bearer {auth_tokens["manager"]}'
+    }, json={'team_id': 1, 'user_ids': [3]})
+    assert response.status_code == 403
@@ -76,7 +76,17 @@ def test_create_waste_entry(client, auth_tokens):
     )
     assert response.status_code == 400
     assert response.json['message'] == 'Missing required fields'
-    
+
+    # Test with weights that are not positive numbers
+    for weight in ('5', True, -1.5, [2]):
+        response = client.post(
+            '/api/waste',
+            headers={'Authorization': f'Bearer {auth_tokens["employee"]}'},
+            json={'waste_type': 'paper', 'weight': weight}
+        )
+        assert response.status_code == 400
+        assert response.json['message'] == 'weight must be a positive number'
+
     # Test without authentication
     response = client.post(
         '/api/waste',
@@ -90,7 +100,7 @@ def test_create_waste_entry(client, auth_tokens):
 
 
 def test_get_waste_entries(client, auth_tokens, app):
-    """Test getting waste entries."""s
+    """Test getting waste entries."""
     client.post(
         '/api/waste',
         headers={'Authorization': f'Bearer {auth_tokens["admin"]}'},
@@ -185,4 +195,711 @@ def test_get_waste_analytics(client, auth_tokens):
     
     # Test without authentication
     response = client.get('/api/waste/analytics')
-    assert response.status_code == 401 
\ No newline at end of file
+    assert response.status_code == 401 
+
+def test_get_weight_distribution(client, auth_tokens):
+    """Test getting weight percentiles and histograms."""
+    for weight in [1.0, 2.0, 3.0, 4.0, 100.0]:
+        client.post(
+            '/api/waste',
+            headers={'Authorization': f'Bearer {auth_tokens["employee"]}'},
+            json={
+                'waste_type': 'metal',
+                'weight': weight,
+                'description': 'Scale reading'
+            }
+        )
+
+    # Test as manager (should see their team's readings)
+    response = client.get(
+        '/api/waste/analytics/distribution',
+        headers={'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    )
+    assert response.status_code == 200
+    assert response.json['rank_error'] > 0
+    metal = response.json['waste_by_type']['metal']
+    assert metal['count'] == 5
+    assert metal['median'] == 3.0
+    assert metal['max'] == 100.0
+    assert sum(bucket['count'] for bucket in metal['histogram']) == 5
+
+    # Test with waste type and bins parameters
+    response = client.get(
+        '/api/waste/analytics/distribution?waste_type=paper&bins=4',
+        headers={'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    )
+    assert response.status_code == 200
+    assert 'metal' not in response.json['waste_by_type']
+
+    # Test with invalid period
+    response = client.get(
+        '/api/waste/analytics/distribution?period=decade',
+        headers={'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    )
+    assert response.status_code == 400
+
+    # Test as employee (should be denied)
+    response = client.get(
+        '/api/waste/analytics/distribution',
+        headers={'Authorization': f'Bearer {auth_tokens["employee"]}'}
+    )
+    assert response.status_code == 403
+
+
+def test_get_waste_changes(client, auth_tokens, app):
+    """Test delta sync of waste entries."""
+    headers = {'Authorization': f'Bearer {auth_tokens["employee"]}'}
+    for weight in [1.0, 2.0, 3.0]:
+        client.post(
+            '/api/waste',
+            headers=headers,
+            json={'waste_type': 'paper', 'weight': weight}
+        )
+
+    # First sync pages through the history
+    response = client.get('/api/waste/changes?limit=2', headers=headers)
+    assert response.status_code == 200
+    assert [entry['weight'] for entry in response.json['upserts']] == [1.0, 2.0]
+    assert response.json['has_more'] is True
+
+    cursor = response.json['next_cursor']
+    response = client.get(f'/api/waste/changes?since={cursor}&limit=2', headers=headers)
+    assert [entry['weight'] for entry in response.json['upserts']] == [3.0]
+    assert response.json['has_more'] is False
+
+    # Nothing changed since the last sync
+    cursor = response.json['next_cursor']
+    response = client.get(f'/api/waste/changes?since={cursor}', headers=headers)
+    assert response.json['upserts'] == []
+    assert response.json['deletes'] == []
+    assert response.json['next_cursor'] == cursor
+
+    # Other users' entries are not visible to an employee
+    client.post(
+        '/api/waste',
+        headers={'Authorization': f'Bearer {auth_tokens["manager"]}'},
+        json={'waste_type': 'metal', 'weight': 9.0}
+    )
+    response = client.get(f'/api/waste/changes?since={cursor}', headers=headers)
+    assert response.json['upserts'] == []
+
+    # Deleted entries come back as tombstones
+    with app.app_context():
+        from app.models import User
+        employee_id = User.query.filter_by(username='employee').first().id
+    response = client.delete(
+        f'/api/users/{employee_id}',
+        headers={'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    )
+    assert response.status_code == 200
+    response = client.get(
+        f'/api/waste/changes?since={cursor}',
+        headers={'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    )
+    assert len(response.json['deletes']) == 4
+    assert [entry['weight'] for entry in response.json['upserts']] == [9.0]
+
+    # Test with an invalid cursor
+    response = client.get(
+        '/api/waste/changes?since=not-a-cursor',
+        headers={'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    )
+    assert response.status_code == 400
+
+
+def test_changes_committed_out_of_order(app):
+    """Test that a change committed after a higher id still reaches clients."""
+    from datetime import datetime, timedelta
+    from app.models import WasteChange
+    from app import db
+    from app.services.sync import changes_since, decode_cursor
+
+    def commit_change(change_id, entry_id, created_at=None):
+        change = WasteChange(entry_id=entry_id, team_id=1, user_id=3,
+                             operation=WasteChange.DELETE)
+        change.id = change_id
+        change.created_at = created_at or datetime.utcnow()
+        db.session.add(change)
+        db.session.commit()
+
+    with app.app_context():
+        scope = [WasteChange.user_id == 3]
+        commit_change(100, 1000, created_at=datetime.utcnow() - timedelta(minutes=5))
+        commit_change(102, 1002)
+        changes = changes_since(None, scope, commit_lag=60)
+        assert changes['deletes'] == [1000, 1002]
+        # 101 may still be in flight: it is remembered as a gap
+        delivered, gaps = decode_cursor(changes['next_cursor'])[None]
+        assert (delivered, set(gaps)) == (102, {101})
+
+        # 101 commits late and is delivered with the next sync
+        commit_change(101, 1001)
+        changes = changes_since(changes['next_cursor'], scope, commit_lag=60)
+        assert changes['deletes'] == [1001]
+        assert decode_cursor(changes['next_cursor']) == {None: (102, {})}
+        changes = changes_since(changes['next_cursor'], scope, commit_lag=60)
+        assert changes['deletes'] == []
+
+        # A gap that never fills is forgotten once past the lag
+        commit_change(104, 1004)
+        changes = changes_since(changes['next_cursor'], scope, commit_lag=60)
+        assert set(decode_cursor(changes['next_cursor'])[None][1]) == {103}
+        changes = changes_since(changes['next_cursor'], scope, commit_lag=0)
+        assert decode_cursor(changes['next_cursor']) == {None: (104, {})}
+
+
+def test_change_pages_stay_within_limit(app):
+    """Test that paging a burst of recent changes never exceeds the page size."""
+    from app import db
+    from app.models import WasteChange
+    from app.services.sync import changes_since
+
+    with app.app_context():
+        scope = [WasteChange.user_id == 3]
+        # One id left unused for now, as if its transaction were still open
+        for change_id in [change_id for change_id in range(200, 240) if change_id != 210]:
+            change = WasteChange(entry_id=change_id, team_id=1, user_id=3,
+                                 operation=WasteChange.DELETE)
+            change.id = change_id
+            db.session.add(change)
+        db.session.commit()
+
+        delivered, sizes, cursor = [], [], None
+        while True:
+            changes = changes_since(cursor, scope, limit=5, commit_lag=30)
+            sizes.append(len(changes['deletes']))
+            delivered += changes['deletes']
+            cursor = changes['next_cursor']
+            if not changes['has_more']:
+                break
+        assert max(sizes) <= 5
+
+        change = WasteChange(entry_id=210, team_id=1, user_id=3, operation=WasteChange.DELETE)
+        change.id = 210
+        db.session.add(change)
+        db.session.commit()
+        changes = changes_since(cursor, scope, limit=5, commit_lag=30)
+        assert changes['deletes'] == [210]
+        assert sorted(delivered + changes['deletes']) == list(range(200, 240))
+
+
+def test_bulk_update_waste_entries(client, auth_tokens):
+    """Test set-based bulk edits of waste entries."""
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    for weight in [10.0, 20.0]:
+        client.post(
+            '/api/waste',
+            headers={'Authorization': f'Bearer {auth_tokens["employee"]}'},
+            json={'waste_type': 'metal', 'weight': weight}
+        )
+
+    # Dry run only counts
+    response = client.patch('/api/waste', headers=manager, json={
+        'filters': {'waste_type': 'metal'},
+        'set': {'weight_factor': 0.5},
+        'dry_run': True
+    })
+    assert response.status_code == 200
+    assert response.json['affected'] == 2
+    response = client.get('/api/waste?waste_type=metal', headers=manager)
+    assert sorted(e['weight'] for e in response.json['waste_entries']) == [10.0, 20.0]
+
+    # Rescale a mis-calibrated scale's readings
+    response = client.patch('/api/waste', headers=manager, json={
+        'filters': {'waste_type': 'metal'},
+        'set': {'weight_factor': 0.5}
+    })
+    assert response.status_code == 200
+    assert response.json['affected'] == 2
+    response = client.get('/api/waste?waste_type=metal', headers=manager)
+    assert sorted(e['weight'] for e in response.json['waste_entries']) == [5.0, 10.0]
+
+    # Derived distributions follow the edit, including a change of type
+    response = client.patch('/api/waste', headers=manager, json={
+        'filters': {'waste_type': 'metal'},
+        'set': {'waste_type': 'glass'}
+    })
+    assert response.json['affected'] == 2
+    response = client.get('/api/waste/analytics/distribution', headers=manager)
+    assert 'metal' not in response.json['waste_by_type']
+    assert response.json['waste_by_type']['glass']['max'] == 10.0
+
+    # Test without filters
+    response = client.patch('/api/waste', headers=manager, json={
+        'set': {'weight': 1.0}
+    })
+    assert response.status_code == 400
+
+    # Test a manager targeting another team
+    response = client.patch('/api/waste', headers=manager, json={
+        'filters': {'team_id': 2},
+        'set': {'weight': 1.0}
+    })
+    assert response.status_code == 403
+
+    # Test as employee (should be denied)
+    response = client.patch(
+        '/api/waste',
+        headers={'Authorization': f'Bearer {auth_tokens["employee"]}'},
+        json={'filters': {'waste_type': 'glass'}, 'set': {'weight': 1.0}}
+    )
+    assert response.status_code == 403
+
+
+def test_bulk_delete_waste_entries(client, auth_tokens):
+    """Test set-based bulk deletes of waste entries."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    for team_id in [1, 2]:
+        client.post(
+            '/api/waste',
+            headers=admin,
+            json={'waste_type': 'organic', 'weight': 3.0, 'team_id': team_id}
+        )
+
+    response = client.get('/api/waste/analytics?team_id=1', headers=admin)
+    assert response.json['total_entries'] == 2
+
+    response = client.delete('/api/waste', headers=admin, json={
+        'filters': {'waste_type': 'organic'},
+        'dry_run': True
+    })
+    assert response.json['affected'] == 2
+
+    response = client.delete('/api/waste', headers=admin, json={
+        'filters': {'team_id': 1, 'waste_type': 'organic'}
+    })
+    assert response.status_code == 200
+    assert response.json['affected'] == 1
+
+    # The team's report snapshot was invalidated
+    response = client.get('/api/waste/analytics?team_id=1', headers=admin)
+    assert response.json['total_entries'] == 1
+
+    # Test with an invalid date filter
+    response = client.delete('/api/waste', headers=admin, json={
+        'filters': {'start_date': 'yesterday'}
+    })
+    assert response.status_code == 400
+
+
+def test_anomaly_detection(app, client, auth_tokens):
+    """Test that outlier weights are flagged at insert time and listed."""
+    from app.models import WasteType, WeightStats
+    from app.services.anomalies import AnomalyDetector
+    app.extensions['anomaly_detector'] = AnomalyDetector(min_samples=5, persist_every=3)
+
+    headers = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    for weight in [2.0, 2.5, 3.0, 2.2, 2.8, 2.4]:
+        response = client.post('/api/waste', headers=headers, json={
+            'waste_type': 'paper',
+            'weight': weight
+        })
+        assert response.status_code == 201
+        assert response.json['flagged'] is False
+
+    response = client.post('/api/waste', headers=headers, json={
+        'waste_type': 'paper',
+        'weight': 10000
+    })
+    assert response.status_code == 201
+    assert response.json['flagged'] is True
+    outlier_id = response.json['waste_entry']['id']
+
+    # Other waste types keep their own baseline
+    response = client.post('/api/waste', headers=headers, json={
+        'waste_type': 'metal',
+        'weight': 10000
+    })
+    assert response.json['flagged'] is False
+
+    response = client.get('/api/waste/anomalies', headers=headers)
+    assert response.status_code == 200
+    assert len(response.json['anomalies']) == 1
+    anomaly = response.json['anomalies'][0]
+    assert anomaly['entry_id'] == outlier_id
+    assert anomaly['waste_entry']['weight'] == 10000
+    assert anomaly['z_score'] > 4
+    for limit in (0, -1):
+        response = client.get(f'/api/waste/anomalies?limit={limit}', headers=headers)
+        assert response.status_code == 400
+
+    # Statistics were persisted without the outlier
+    with app.app_context():
+        stats = WeightStats.query.filter_by(waste_type=WasteType.PAPER).one()
+        assert stats.count == 6
+        assert abs(stats.mean - 2.483) < 0.01
+
+    # Employees cannot list anomalies
+    response = client.get('/api/waste/anomalies', headers={
+        'Authorization': f'Bearer {auth_tokens["employee"]}'
+    })
+    assert response.status_code == 403
+
+
+def test_bulk_delete_refreshes_anomaly_baseline(app, client, auth_tokens):
+    """Test that deleting a bad reading takes it out of the anomaly baseline."""
+    from app.models import WasteType, WeightStats
+    from app.services.anomalies import AnomalyDetector
+    app.extensions['anomaly_detector'] = AnomalyDetector(min_samples=5, persist_every=1)
+
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    employee = {'Authorization': f'Bearer {auth_tokens["employee"]}'}
+    # Too early to be flagged, so the bad reading enters the baseline
+    for headers, weight in [(manager, 2.0), (manager, 2.5), (employee, 5000.0),
+                            (manager, 3.0), (manager, 2.2), (manager, 2.8)]:
+        response = client.post('/api/waste', headers=headers,
+                               json={'waste_type': 'paper', 'weight': weight})
+        assert response.json['flagged'] is False
+
+    response = client.delete('/api/waste', headers=manager, json={
+        'filters': {'user_id': 3, 'waste_type': 'paper'}
+    })
+    assert response.status_code == 200
+
+    with app.app_context():
+        stats = WeightStats.query.filter_by(team_id=1, waste_type=WasteType.PAPER).one()
+        assert stats.mean < 10
+
+    # Scored against the rebuilt baseline rather than the cached one
+    response = client.post('/api/waste', headers=manager,
+                           json={'waste_type': 'paper', 'weight': 100.0})
+    assert response.json['flagged'] is True
+
+
+def test_rebuild_weight_stats(app):
+    """Test recomputing the stored statistics from history."""
+    import statistics
+    from app import db
+    from app.models import WasteAnomaly, WasteEntry, WasteType, WeightStats
+    from app.services.anomalies import rebuild_weight_stats
+
+    # A small spread around a large mean, where sum(x^2) - n * mean^2 cancels
+    weights = [1e9 + offset for offset in (0.1, 0.2, 0.4, 0.3, 0.25)]
+    with app.app_context():
+        entries = [WasteEntry(waste_type=WasteType.METAL, weight=weight, user_id=1, team_id=2)
+                   for weight in weights + [5e9]]
+        db.session.add_all(entries)
+        db.session.flush()
+        db.session.add(WasteAnomaly(entry_id=entries[-1].id, team_id=2,
+                                    waste_type=WasteType.METAL, weight=5e9,
+                                    mean=1e9, stddev=0.1, z_score=4e10))
+        db.session.commit()
+
+        rebuild_weight_stats()
+
+        stats = WeightStats.query.filter_by(team_id=2, waste_type=WasteType.METAL).one()
+        assert stats.count == 5
+        assert abs(stats.mean - statistics.fmean(weights)) < 1e-3
+        expected_m2 = statistics.pvariance(weights) * len(weights)
+        assert abs(stats.m2 - expected_m2) < 1e-3 * expected_m2
+
+
+def test_running_stats_merge():
+    """Test that merged running statistics match a single pass."""
+    import math
+    import random
+    import statistics
+    from app.utils.stats import RunningStats
+
+    values = [random.gauss(5, 2) for _ in range(1000)]
+    whole = RunningStats()
+    left, right = RunningStats(), RunningStats()
+    for index, value in enumerate(values):
+        whole.update(value)
+        (left if index % 3 else right).update(value)
+
+    merged = left.merge(right)
+    assert merged.count == whole.count == 1000
+    assert math.isclose(merged.mean, statistics.mean(values))
+    assert math.isclose(merged.variance, statistics.variance(values))
+    assert math.isclose(whole.variance, statistics.variance(values))
+
+
+def test_waste_forecast(app, client, auth_tokens):
+    """Test projecting waste per type from the daily history."""
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models import WasteEntry, WasteType
+    from app.services.sync import backfill_changes
+
+    # Eight weeks of paper: 10 kg on weekdays, 2 kg at weekends
+    with app.app_context():
+        today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+        db.session.add_all([
+            WasteEntry(
+                waste_type=WasteType.PAPER,
+                weight=2.0 if (today - timedelta(days=day)).weekday() >= 5 else 10.0,
+                user_id=3,
+                team_id=1,
+                timestamp=today - timedelta(days=day)
+            )
+            for day in range(1, 57)
+        ])
+        db.session.commit()
+        backfill_changes()
+
+    headers = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    response = client.get('/api/waste/forecast?days=7', headers=headers)
+    assert response.status_code == 200
+    assert response.json['horizon_days'] == 7
+    paper = next(row for row in response.json['by_type'] if row['waste_type'] == 'paper')
+    assert len(paper['daily']) == 7
+    assert abs(paper['total_weight'] - 54.0) < 1.0
+    fitted_at = response.json['fitted_at']
+
+    # Served from the cached fit until new data lands
+    response = client.get('/api/waste/forecast?days=14', headers=headers)
+    assert response.json['fitted_at'] == fitted_at
+
+    client.post('/api/waste', headers=headers, json={'waste_type': 'glass', 'weight': 1.0})
+    response = client.get('/api/waste/forecast', headers=headers)
+    assert response.json['fitted_at'] != fitted_at
+
+    # Admins must pick a team
+    response = client.get('/api/waste/forecast', headers={
+        'Authorization': f'Bearer {auth_tokens["admin"]}'
+    })
+    assert response.status_code == 400
+
+
+def test_my_waste_analytics(app, client, auth_tokens):
+    """Test personal analytics served from per-user rollups."""
+    from app.services.rollups import rebuild_user_rollups
+
+    employee = {'Authorization': f'Bearer {auth_tokens["employee"]}'}
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+
+    # The fixture entry was inserted directly, without a rollup
+    with app.app_context():
+        rebuild_user_rollups()
+
+    response = client.get('/api/waste/analytics/me', headers=employee)
+    assert response.status_code == 200
+    assert response.json['total_entries'] == 1
+    assert response.json['waste_by_type'] == {'paper': 2.5}
+
+    for waste_type, weight in [('metal', 4.0), ('metal', 6.0), ('plastic', 1.0)]:
+        client.post(
+            '/api/waste',
+            headers=employee,
+            json={'waste_type': waste_type, 'weight': weight}
+        )
+    # Other users' entries are not included
+    client.post('/api/waste', headers=manager, json={'waste_type': 'metal', 'weight': 50.0})
+
+    response = client.get('/api/waste/analytics/me?period=month', headers=employee)
+    assert response.json['total_entries'] == 4
+    assert response.json['total_weight'] == 13.5
+    assert response.json['waste_by_type'] == {'paper': 2.5, 'metal': 10.0, 'plastic': 1.0}
+
+    response = client.get('/api/waste/analytics/me?waste_type=metal', headers=employee)
+    assert response.json['total_entries'] == 2
+
+    # Bulk edits and deletes recompute the affected rollups
+    client.patch('/api/waste', headers=manager, json={
+        'filters': {'waste_type': 'plastic'},
+        'set': {'waste_type': 'metal'}
+    })
+    client.delete('/api/waste', headers=manager, json={
+        'filters': {'waste_type': 'paper'}
+    })
+    response = client.get('/api/waste/analytics/me', headers=employee)
+    assert response.json['total_entries'] == 3
+    assert response.json['waste_by_type'] == {'metal': 11.0}
+
+    response = client.get('/api/waste/analytics/me?period=decade', headers=employee)
+    assert response.status_code == 400
+
+
+def test_stream_waste_analytics(app, client, auth_tokens):
+    """Test live analytics deltas over Server-Sent Events."""
+    import json
+
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    employee = {'Authorization': f'Bearer {auth_tokens["employee"]}'}
+
+    def read_event(events):
+        frame = next(events).decode()
+        event, data = frame.strip().split('\n')
+        return event[len('event: '):], json.loads(data[len('data: '):])
+
+    response = client.get('/api/waste/analytics/stream', headers=manager, buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+
+    event, data = read_event(events)
+    assert event == 'snapshot'
+    assert data['total_entries'] == 1
+
+    client.post('/api/waste', headers=employee, json={'waste_type': 'glass', 'weight': 4.5})
+    event, data = read_event(events)
+    assert event == 'delta'
+    assert (data['waste_type'], data['weight'], data['count']) == ('glass', 4.5, 1)
+
+    # Bulk edits ask dashboards to refetch
+    client.patch('/api/waste', headers=manager, json={
+        'filters': {'waste_type': 'glass'},
+        'set': {'waste_type': 'metal'}
+    })
+    event, data = read_event(events)
+    assert event == 'resync'
+
+    response.close()
+    with app.app_context():
+        from app.utils.events import event_hub
+        assert event_hub().subscriber_count() == 0
+
+    # Employees cannot subscribe
+    response = client.get('/api/waste/analytics/stream', headers=employee)
+    assert response.status_code == 403
+
+
+def test_search_waste_entries(client, auth_tokens):
+    """Test ranked full-text search over entry descriptions."""
+    employee = {'Authorization': f'Bearer {auth_tokens["employee"]}'}
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+
+    for description in [
+        'Broken monitors from floor 3',
+        'Old monitor stand',
+        'Monitor, monitor cables and another monitor',
+        'Coffee grounds'
+    ]:
+        client.post('/api/waste', headers=employee, json={
+            'waste_type': 'electronic', 'weight': 1.0, 'description': description
+        })
+    # Outside the employee's scope
+    client.post('/api/waste', headers=admin, json={
+        'waste_type': 'electronic', 'weight': 1.0, 'team_id': 2,
+        'description': 'Monitors from the marketing office'
+    })
+
+    # Stemmed, scoped and best match first
+    response = client.get('/api/waste?q=monitors', headers=employee)
+    assert response.status_code == 200
+    descriptions = [entry['description'] for entry in response.json['waste_entries']]
+    assert len(descriptions) == 3
+    assert descriptions[0] == 'Monitor, monitor cables and another monitor'
+    assert response.json['has_more'] is False
+
+    # Every word must match; the last one as a prefix
+    response = client.get('/api/waste?q=broken%20mon', headers=employee)
+    assert [entry['description'] for entry in response.json['waste_entries']] == [
+        'Broken monitors from floor 3'
+    ]
+
+    # Pagination
+    response = client.get('/api/waste?q=monitor&per_page=2', headers=employee)
+    assert len(response.json['waste_entries']) == 2
+    assert response.json['has_more'] is True
+    response = client.get('/api/waste?q=monitor&per_page=2&page=2', headers=employee)
+    assert len(response.json['waste_entries']) == 1
+    assert response.json['has_more'] is False
+
+    # Admins choose the team
+    response = client.get('/api/waste?q=monitor&team_id=2', headers=admin)
+    assert [entry['team_id'] for entry in response.json['waste_entries']] == [2]
+
+    # Queries without words are rejected rather than matching everything
+    response = client.get('/api/waste?q=%22*', headers=employee)
+    assert response.status_code == 400
+
+    # Edited descriptions are reindexed
+    client.patch('/api/waste', headers=admin, json={
+        'filters': {'team_id': 1, 'waste_type': 'electronic'},
+        'set': {'description': 'Tea leaves'}
+    })
+    assert client.get('/api/waste?q=monitor', headers=employee).json['waste_entries'] == []
+    assert len(client.get('/api/waste?q=tea', headers=employee).json['waste_entries']) == 4
+
+
+def test_msgpack_negotiation(client, auth_tokens):
+    """Test MessagePack request bodies and responses alongside JSON."""
+    import msgpack
+
+    employee = {'Authorization': f'Bearer {auth_tokens["employee"]}'}
+
+    response = client.post(
+        '/api/waste',
+        headers={**employee, 'Accept': 'application/msgpack'},
+        data=msgpack.packb({'waste_type': 'plastic', 'weight': 0.75, 'description': 'Bottles'}),
+        content_type='application/msgpack'
+    )
+    assert response.status_code == 201
+    assert response.mimetype == 'application/msgpack'
+    assert 'Accept' in response.vary
+    entry = msgpack.unpackb(response.data)['waste_entry']
+    assert (entry['waste_type'], entry['weight']) == ('plastic', 0.75)
+
+    # Listings in either encoding carry the same document
+    response = client.get('/api/waste', headers={**employee, 'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    entries = msgpack.unpackb(response.data)['waste_entries']
+    response = client.get('/api/waste', headers=employee)
+    assert response.mimetype == 'application/json'
+    assert response.json['waste_entries'] == entries
+
+    # Errors follow the negotiated format too
+    response = client.post(
+        '/api/waste',
+        headers={**employee, 'Accept': 'application/msgpack'},
+        data=msgpack.packb({'weight': 1.0}),
+        content_type='application/msgpack'
+    )
+    assert response.status_code == 400
+    assert msgpack.unpackb(response.data) == {'message': 'Missing required fields'}
+
+    response = client.post('/api/waste', headers=employee, data=b'\xc1',
+                           content_type='application/msgpack')
+    assert response.status_code == 400
+
+
+def test_listing_statements_are_cached(client, auth_tokens):
+    """Test that repeated listings reuse compiled statements with fresh parameters."""
+    admin = {'Authorization': f'Bearer {auth_tokens["admin"]}'}
+    for waste_type in ('paper', 'plastic', 'plastic'):
+        client.post('/api/waste', headers=admin,
+                    json={'waste_type': waste_type, 'weight': 1.0, 'team_id': 1})
+
+    response = client.get('/api/waste?team_id=1&waste_type=paper', headers=admin)
+    assert {entry['waste_type'] for entry in response.json['waste_entries']} == {'paper'}
+
+    before = client.get('/api/metrics/statements').json
+    response = client.get('/api/waste?team_id=1&waste_type=plastic', headers=admin)
+    assert {entry['waste_type'] for entry in response.json['waste_entries']} == {'plastic'}
+    assert {entry['team_id'] for entry in response.json['waste_entries']} == {1}
+    response = client.get('/api/waste?team_id=2&waste_type=plastic', headers=admin)
+    assert {entry['team_id'] for entry in response.json['waste_entries']} <= {2}
+    after = client.get('/api/metrics/statements').json
+
+    # Same shapes as the first listing: the user load and the listing both hit
+    assert after['hits'] - before['hits'] >= 4
+    assert after['misses'] == before['misses']
+    assert 0 < after['hit_rate'] <= 1
+
+
+def test_request_loads_the_caller_once(app, client, auth_tokens):
+    """Test that routes reuse the user the permission check loaded."""
+    from sqlalchemy import event
+    from app import db
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    manager = {'Authorization': f'Bearer {auth_tokens["manager"]}'}
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        for path in ('/api/waste', '/api/waste/analytics', '/api/teams'):
+            statements.clear()
+            response = client.get(path, headers=manager)
+            assert response.status_code == 200
+            user_loads = [statement for statement in statements
+                          if 'FROM users' in statement and 'WHERE users.id =' in statement]
+            assert len(user_loads) == 1, path
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)